@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
@@ -46,7 +47,40 @@ class Settings(BaseSettings):
     # Sandbox Configuration
     sandbox_base_path: str = "/tmp/sandbox"
     max_concurrent_sandboxes: int = 5
-    
+    dependency_cache_path: str = Field("/tmp/sandbox-cache/deps", env="DEPENDENCY_CACHE_PATH")
+    dependency_cache_max_entries: int = Field(20, env="DEPENDENCY_CACHE_MAX_ENTRIES")
+    test_max_workers: Optional[int] = Field(None, env="TEST_MAX_WORKERS")
+    test_shard_timeout: int = Field(600, env="TEST_SHARD_TIMEOUT")
+    test_impact_coverage_map: bool = Field(False, env="TEST_IMPACT_COVERAGE_MAP")
+    fix_candidates: int = Field(1, env="FIX_CANDIDATES")
+    fix_max_attempts: int = Field(3, env="FIX_MAX_ATTEMPTS")
+    fix_time_budget: int = Field(900, env="FIX_TIME_BUDGET")
+    cache_path: str = Field("/tmp/sandbox-cache", env="CACHE_PATH")
+    sandbox_orphan_max_age: int = Field(6 * 3600, env="SANDBOX_ORPHAN_MAX_AGE")
+    sandbox_cgroup_path: Optional[str] = Field(None, env="SANDBOX_CGROUP_PATH")
+    sandbox_cpu_limit: Optional[float] = Field(None, env="SANDBOX_CPU_LIMIT")
+    sandbox_memory_limit_mb: Optional[int] = Field(None, env="SANDBOX_MEMORY_LIMIT_MB")
+    sandbox_pids_limit: Optional[int] = Field(None, env="SANDBOX_PIDS_LIMIT")
+    symbol_context_max_tokens: int = Field(2000, env="SYMBOL_CONTEXT_MAX_TOKENS")
+    code_index_enabled: bool = Field(False, env="CODE_INDEX_ENABLED")
+    code_embedding_model_name: str = Field("sentence-transformers/all-mpnet-base-v2", env="CODE_EMBEDDING_MODEL_NAME")
+    code_index_max_new_chunks: int = Field(2000, env="CODE_INDEX_MAX_NEW_CHUNKS")
+    code_retrieval_top_k: int = Field(8, env="CODE_RETRIEVAL_TOP_K")
+    review_stage_timeout: int = Field(300, env="REVIEW_STAGE_TIMEOUT")
+    review_large_diff_chars: int = Field(80000, env="REVIEW_LARGE_DIFF_CHARS")
+    review_large_diff_timeout: int = Field(1200, env="REVIEW_LARGE_DIFF_TIMEOUT")
+    review_chunk_chars: int = Field(12000, env="REVIEW_CHUNK_CHARS")
+    review_max_workers: int = Field(6, env="REVIEW_MAX_WORKERS")
+    review_chunked_min_files: int = Field(8, env="REVIEW_CHUNKED_MIN_FILES")
+    github_repo_concurrency: int = Field(3, env="GITHUB_REPO_CONCURRENCY")
+    github_write_concurrency: int = Field(3, env="GITHUB_WRITE_CONCURRENCY")
+    bulk_review_workers: int = Field(4, env="BULK_REVIEW_WORKERS")
+    bulk_review_max_prs: int = Field(50, env="BULK_REVIEW_MAX_PRS")
+    comment_handler_workers: int = Field(6, env="COMMENT_HANDLER_WORKERS")
+    local_diff_enabled: bool = Field(True, env="LOCAL_DIFF_ENABLED")
+    repo_mirror_path: str = Field("/tmp/sandbox-cache/mirrors", env="REPO_MIRROR_PATH")
+    local_diff_timeout: int = Field(120, env="LOCAL_DIFF_TIMEOUT")
+
     # Database Configuration
     database_url: str = Field(..., env="DATABASE_URL")
     slack_port: int = Field(5000, env="SLACK_PORT")
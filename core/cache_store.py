@@ -0,0 +1,85 @@
+# core/cache_store.py
+"""Small persistent JSON cache shared by services that memoize per-repo work.
+
+Entries live as individual JSON files under ``<cache_path>/<namespace>`` and
+are evicted least-recently-used once ``max_entries`` is exceeded. Eviction
+lists the whole namespace, so it runs every ``max_entries // 20`` writes rather
+than on each one; a namespace may briefly hold that many extra entries.
+"""
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JsonCache:
+    """Key/value store of JSON documents on disk"""
+
+    def __init__(self, namespace: str, base_path: Optional[str] = None, max_entries: int = 200):
+        from config.settings import settings
+
+        self.path = Path(base_path or settings.cache_path) / namespace
+        self.max_entries = max_entries
+        self.evict_interval = max(1, max_entries // 20)
+        self._writes = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._entry(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._entry(key)
+        # Write then rename so concurrent readers never see a partial document
+        tmp_path = path.with_name(f"{path.name}.tmp-{uuid.uuid4().hex[:6]}")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._writes += 1
+        if self._writes >= self.evict_interval:
+            self._writes = 0
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        self._entry(key).unlink(missing_ok=True)
+
+    def _entry(self, key: str) -> Path:
+        return self.path / f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json"
+
+    def _evict(self) -> None:
+        entries = list(self.path.glob("*.json"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=self._mtime)
+        for stale in entries[:len(entries) - self.max_entries]:
+            stale.unlink(missing_ok=True)
+
+    def _mtime(self, path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return 0.0
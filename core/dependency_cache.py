@@ -0,0 +1,294 @@
+# core/dependency_cache.py
+"""Content-hash keyed cache of prebuilt dependency environments for sandboxes.
+
+Python virtualenvs and ``node_modules`` trees are built once per unique set of
+lockfiles and then reflinked (or copied) into each sandbox, so a sandbox
+only pays for a fresh install when the lockfiles actually change. Entries are
+never hardlinked: installs and tools writing into a sandbox's environment
+must not change the shared copy.
+"""
+import fcntl
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+PYTHON_LOCKFILES = ["uv.lock", "poetry.lock", "requirements.txt"]
+NODE_LOCKFILES = ["package-lock.json"]
+
+# Tried in order; the first command that succeeds wins
+REFLINK_COMMANDS = [
+    ["cp", "-a", "--reflink=always"],  # Linux CoW filesystems (btrfs, xfs)
+    ["cp", "-c", "-R"],                # macOS APFS clonefile
+]
+
+
+def copy_tree(source: Path, destination: Path, commands: List[List[str]]) -> bool:
+    """Copy a tree with the first working command; returns False if none worked"""
+    for command in commands:
+        result = subprocess.run(command + [str(source), str(destination)],
+                                capture_output=True, text=True)
+        if result.returncode == 0:
+            return True
+        if Path(destination).exists():
+            shutil.rmtree(destination, ignore_errors=True)
+    return False
+
+
+def reflink_copy(source: Path, destination: Path) -> bool:
+    """Copy-on-write clone of a tree; False when the filesystem can't reflink"""
+    return copy_tree(source, destination, REFLINK_COMMANDS)
+
+
+class DependencyCache:
+    """LRU cache of dependency environments keyed by a hash of the lockfiles"""
+
+    def __init__(self, base_path: Optional[str] = None, max_entries: Optional[int] = None,
+                 build_timeout: int = 1800):
+        from config.settings import settings
+
+        self.base_path = Path(base_path or settings.dependency_cache_path)
+        self.max_entries = max_entries or settings.dependency_cache_max_entries
+        self.build_timeout = build_timeout
+        self.base_path.mkdir(parents=True, exist_ok=True)
+
+    def compute_key(self, repo_path: str, lockfiles: List[str]) -> Optional[str]:
+        """Hash the names and contents of the lockfiles present in the repo"""
+        digest = hashlib.sha256()
+        found = False
+        for name in lockfiles:
+            path = Path(repo_path) / name
+            if not path.is_file():
+                continue
+            found = True
+            digest.update(name.encode())
+            digest.update(b"\0")
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()[:24] if found else None
+
+    def prepare(self, sandbox, repo_path: str) -> Dict[str, Any]:
+        """Attach cached (or freshly built) environments to the sandbox"""
+        info: Dict[str, Any] = {}
+
+        python_info = self._prepare_python(sandbox, repo_path)
+        if python_info:
+            info["python"] = python_info
+
+        node_info = self._prepare_node(sandbox, repo_path)
+        if node_info:
+            info["node"] = node_info
+
+        sandbox.dependency_env = info
+        self._evict()
+        return info
+
+    def _prepare_python(self, sandbox, repo_path: str) -> Optional[Dict[str, Any]]:
+        key = self.compute_key(repo_path, PYTHON_LOCKFILES)
+        if not key:
+            return None
+
+        installer = self._python_installer(repo_path)
+        if not installer:
+            logger.info("No usable Python installer for lockfiles, skipping dependency cache")
+            return None
+
+        entry = self.base_path / f"python-{key}"
+        with self._entry_lock(entry):
+            hit = entry.exists()
+            if not hit and not self._build(entry, "venv",
+                                           lambda target: self._build_python(target, repo_path, installer)):
+                return None
+
+            cached_venv = entry / "venv"
+            venv_path = Path(sandbox.sandbox_path) / "env" / "venv"
+            venv_path.parent.mkdir(parents=True, exist_ok=True)
+            self._link_tree(cached_venv, venv_path)
+            self._rewrite_shebangs(venv_path, self._build_path(entry, cached_venv))
+            self._touch(entry)
+
+        sandbox.use_environment({"VIRTUAL_ENV": str(venv_path)}, [venv_path / "bin"])
+        logger.info(f"Python environment {'cache hit' if hit else 'built'}: {entry.name} ({installer})")
+        return {"key": key, "cache_hit": hit, "installer": installer, "path": str(venv_path)}
+
+    def _prepare_node(self, sandbox, repo_path: str) -> Optional[Dict[str, Any]]:
+        key = self.compute_key(repo_path, NODE_LOCKFILES)
+        if not key or not shutil.which("npm"):
+            return None
+
+        entry = self.base_path / f"node-{key}"
+        modules_path = Path(repo_path) / "node_modules"
+        with self._entry_lock(entry):
+            hit = entry.exists()
+            if not hit and not self._build(entry, "node_modules", lambda target: self._build_node(target, repo_path)):
+                return None
+
+            if modules_path.exists():
+                shutil.rmtree(modules_path)
+            self._link_tree(entry / "node_modules", modules_path)
+            self._touch(entry)
+        self._exclude_from_git(repo_path, "node_modules/")
+
+        sandbox.use_environment({}, [modules_path / ".bin"])
+        logger.info(f"Node environment {'cache hit' if hit else 'built'}: {entry.name}")
+        return {"key": key, "cache_hit": hit, "installer": "npm", "path": str(modules_path)}
+
+    def _python_installer(self, repo_path: str) -> Optional[str]:
+        """Pick the installer matching the lockfile, preferring uv"""
+        repo = Path(repo_path)
+        has_uv = shutil.which("uv") is not None
+        if (repo / "uv.lock").exists() and has_uv:
+            return "uv"
+        if (repo / "poetry.lock").exists() and shutil.which("poetry"):
+            return "poetry"
+        if (repo / "requirements.txt").exists():
+            return "uv" if has_uv else "pip"
+        return None
+
+    def _build(self, entry: Path, name: str, builder) -> bool:
+        """Build into a temp directory and atomically publish it as a cache entry"""
+        staging = self.base_path / f"{entry.name}.tmp-{uuid.uuid4().hex[:8]}"
+        staging.mkdir(parents=True)
+        try:
+            builder(staging / name)
+            # Scripts inside the tree embed the absolute build path; remember it for relinking
+            (staging / ".build_path").write_text(str(staging / name))
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Another sandbox published the same key first; keep theirs
+                logger.info(f"Dependency cache entry {entry.name} already published")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to build dependency environment {entry.name}: {e}")
+            return False
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _build_python(self, target: Path, repo_path: str, installer: str) -> None:
+        python = target / "bin" / "python"
+        if installer == "uv" and (Path(repo_path) / "uv.lock").exists():
+            self._run(["uv", "sync", "--frozen", "--no-install-project"], repo_path,
+                      {"UV_PROJECT_ENVIRONMENT": str(target)})
+        elif installer == "uv":
+            self._run(["uv", "venv", str(target)], repo_path)
+            self._run(["uv", "pip", "install", "--python", str(python), "-r", "requirements.txt"], repo_path)
+        elif installer == "poetry":
+            self._run([sys.executable, "-m", "venv", str(target)], repo_path)
+            self._run(["poetry", "install", "--no-root", "--no-interaction"], repo_path,
+                      {"VIRTUAL_ENV": str(target), "POETRY_VIRTUALENVS_CREATE": "false"})
+        else:
+            self._run([sys.executable, "-m", "venv", str(target)], repo_path)
+            self._run([str(python), "-m", "pip", "install", "-r", "requirements.txt"], repo_path)
+
+    def _build_node(self, target: Path, repo_path: str) -> None:
+        # npm ci only needs the manifests, so build next to the target rather than in the repo
+        build_dir = target.parent
+        for name in ["package.json", "package-lock.json", ".npmrc"]:
+            source = Path(repo_path) / name
+            if source.exists():
+                shutil.copy2(source, build_dir / name)
+        self._run(["npm", "ci", "--no-audit", "--no-fund"], str(build_dir))
+
+    def _run(self, command: List[str], cwd: str, extra_env: Optional[Dict[str, str]] = None) -> None:
+        env = {**os.environ, **(extra_env or {})}
+        result = subprocess.run(command, cwd=cwd, env=env, capture_output=True,
+                                text=True, timeout=self.build_timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(command)} failed: {result.stderr[-2000:]}")
+
+    def _link_tree(self, source: Path, destination: Path) -> None:
+        """Materialize a cached tree using reflinks, or a plain copy where unsupported"""
+        if not reflink_copy(source, destination):
+            shutil.copytree(source, destination, symlinks=True)
+
+    @contextmanager
+    def _entry_lock(self, entry: Path, exclusive: bool = False, blocking: bool = True):
+        """flock on a per-entry lock file; yields False when a non-blocking lock is busy.
+
+        Sandboxes hold it shared while they copy from an entry, eviction takes it
+        exclusively. Lock files are kept so every process locks the same inode.
+        """
+        lock_dir = self.base_path / ".locks"
+        lock_dir.mkdir(exist_ok=True)
+        with open(lock_dir / f"{entry.name}.lock", "a") as lock_file:
+            flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+            try:
+                fcntl.flock(lock_file, flags)
+                locked = True
+            except BlockingIOError:
+                locked = False
+            try:
+                yield locked
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _build_path(self, entry: Path, default: Path) -> Path:
+        marker = entry / ".build_path"
+        return Path(marker.read_text().strip()) if marker.exists() else default
+
+    def _rewrite_shebangs(self, venv_path: Path, built_venv: Path) -> None:
+        """Point console scripts at the sandbox venv instead of the build location"""
+        old, new = str(built_venv).encode(), str(venv_path).encode()
+        bin_dir = venv_path / "bin"
+        if not bin_dir.exists():
+            return
+        for script in bin_dir.iterdir():
+            if script.is_symlink() or not script.is_file():
+                continue
+            with open(script, "rb") as f:
+                head = f.read(2)
+                if head != b"#!":
+                    continue
+                content = head + f.read()
+            if old not in content:
+                continue
+            # Replace the script rather than rewriting it in place
+            mode = script.stat().st_mode
+            tmp = script.with_name(f".{script.name}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(content.replace(old, new))
+            os.chmod(tmp, mode)
+            os.replace(tmp, script)
+
+    def _exclude_from_git(self, repo_path: str, pattern: str) -> None:
+        """Keep linked dependency trees out of sandbox commits"""
+        exclude_file = Path(repo_path) / ".git" / "info" / "exclude"
+        if not exclude_file.parent.exists():
+            return
+        existing = exclude_file.read_text() if exclude_file.exists() else ""
+        if pattern not in existing.splitlines():
+            with open(exclude_file, "a") as f:
+                f.write(f"\n{pattern}\n")
+
+    def _touch(self, entry: Path) -> None:
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Drop least recently used entries beyond max_entries"""
+        entries = [p for p in self.base_path.iterdir()
+                   if p.is_dir() and ".tmp-" not in p.name and not p.name.startswith(".")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        for stale in entries[:len(entries) - self.max_entries]:
+            with self._entry_lock(stale, exclusive=True, blocking=False) as locked:
+                if not locked:
+                    logger.info(f"Dependency cache entry {stale.name} is in use, not evicting")
+                    continue
+                logger.info(f"Evicting dependency cache entry: {stale.name}")
+                shutil.rmtree(stale, ignore_errors=True)
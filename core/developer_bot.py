@@ -12,9 +12,11 @@ from slack_sdk.errors import SlackApiError
 
 from core.workflows import PRWorkflows
 from services.developer.approval_system import ApprovalService
-from models.schemas import PRReviewRequest, PRCreationRequest, PRCommentHandlingRequest
+from models.schemas import PRReviewRequest, PRCreationRequest, PRCommentHandlingRequest, BulkReviewRequest
 from utils.slack_response_helpers import (
     send_review_results,
+    send_bulk_review_results,
+    format_bulk_review_result,
     send_creation_results, 
     send_comment_handling_results
 )
@@ -38,7 +40,57 @@ class DeveloperBotHandler:
     def _register_handlers(self):
         """Register all Developer-specific Slack event handlers"""
    
-        @self.app.message("review pr")
+        @self.app.message(re.compile(r"review prs\b", re.IGNORECASE))
+        async def handle_bulk_pr_review(message, say, context):
+            """Review every PR of a repo matching a filter"""
+            trace("slack.bulk_review_request", {
+                "user_id": message['user'],
+                "text": message['text'][:200]
+            })
+            try:
+                thread_ts = message.get('thread_ts', message['ts'])
+                match = re.search(r'review prs\s+(\S+)\s*(.*)', message['text'], re.IGNORECASE)
+                if not match:
+                    await say("""
+📚 **Bulk Review Command Format:**
+
+```
+review prs owner/repo [filter]
+```
+
+Filters: `open` (default), `last day`, `24h`, `3d`, `author:<login>`, `label:<name>`, `base:<branch>`, `drafts`, `limit:<n>`
+                    """)
+                    return
+
+                bulk_request = BulkReviewRequest(
+                    repo_url=match.group(1).strip('<>'),
+                    pr_filter=match.group(2).strip() or "open",
+                    thread_id=thread_ts,
+                    user_id=message['user'],
+                    channel_id=message['channel']
+                )
+                await say(text=f"📚 Reviewing PRs in {bulk_request.repo_url} ({bulk_request.pr_filter})...",
+                          thread_ts=thread_ts)
+
+                async def post_result(result, done, total):
+                    await say(text=format_bulk_review_result(result, done, total), thread_ts=thread_ts)
+
+                result = await self.workflows.bulk_review_workflow(bulk_request, on_result=post_result)
+                await send_bulk_review_results(say, result, self.workflows.bulk_reviewer.format_table(result),
+                                               thread_ts)
+
+                trace("slack.bulk_review_complete", {
+                    "repo": result.repo,
+                    "reviewed": result.reviewed,
+                    "prs_per_hour": result.prs_per_hour
+                })
+
+            except Exception as e:
+                logger.error(f"Error in bulk PR review: {e}")
+                trace("slack.bulk_review_error", {"error": str(e)})
+                await say(f"❌ Error reviewing PRs: {str(e)}")
+
+        @self.app.message(re.compile(r"review pr\b", re.IGNORECASE))
         async def handle_pr_review(message, say, context):
             """Handle PR review requests"""
             trace("slack.pr_review_request", {
@@ -64,7 +116,8 @@ class DeveloperBotHandler:
                     pr_url=pr_url,
                     thread_id=thread_ts,
                     user_id=user_id,
-                    linear_issue_id=linear_issue_id
+                    linear_issue_id=linear_issue_id,
+                    channel_id=message.get('channel')
                 )
                 
                 await say("🔍 Starting PR review... This may take a moment.")
@@ -0,0 +1,115 @@
+# core/integrations/github_batch.py
+import asyncio
+from typing import Dict, List, Optional, Any
+from config.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Thread replies sent per GraphQL mutation
+REPLY_BATCH_SIZE = 20
+
+
+class GitHubCommentBatch:
+    """Collects the comments one PR operation posts and sends them in as few calls as possible.
+
+    Inline comments go out as a single pull request review, replies to review
+    comments as batched GraphQL ``addPullRequestReviewThreadReply`` mutations.
+    Issue-level comments, and anything GitHub rejects in batch form, fall back
+    to individual REST calls run concurrently up to ``github_write_concurrency``
+    and paced by the shared rate governor.
+    """
+
+    def __init__(self, github_client, owner: str, repo: str, pr_number: int):
+        self.github_client = github_client
+        self.owner = owner
+        self.repo = repo
+        self.pr_number = pr_number
+        self.inline: List[Dict[str, Any]] = []
+        self.replies: List[tuple] = []
+        self.comments: List[tuple] = []
+        self.writes = asyncio.Semaphore(settings.github_write_concurrency)
+        self.stats = {"api_calls": 0, "individual_calls": 0}
+
+    def add_inline(self, path: str, line: int, body: str) -> None:
+        self.inline.append({"path": path, "line": line, "body": body})
+
+    def add_reply(self, key: Any, comment_id: int, body: str) -> None:
+        self.replies.append((key, comment_id, body))
+
+    def add_comment(self, key: Any, body: str) -> None:
+        self.comments.append((key, body))
+
+    async def submit(self, review_body: Optional[str] = None,
+                     commit_id: Optional[str] = None) -> Dict[Any, Optional[Dict[str, Any]]]:
+        """Send everything collected; returns what GitHub created per key (None when it failed)"""
+        posted: Dict[Any, Optional[Dict[str, Any]]] = {}
+        tasks = [self._send_replies(posted), self._send_comments(self.comments, posted)]
+        if review_body is not None or self.inline:
+            tasks.append(self._send_review(review_body or "", commit_id, posted))
+        await asyncio.gather(*tasks)
+        logger.info(f"Posted {len(posted)} items to {self.owner}/{self.repo}#{self.pr_number} "
+                    f"in {self.stats['api_calls']} calls ({self.stats['individual_calls']} individual)")
+        return posted
+
+    async def _send_review(self, body: str, commit_id: Optional[str], posted: Dict) -> None:
+        if not self.inline:
+            await self._send_comments([("review", body)], posted)
+            return
+        try:
+            self.stats["api_calls"] += 1
+            posted["review"] = await self.github_client.create_review(
+                self.owner, self.repo, self.pr_number, body, self.inline, commit_id=commit_id
+            )
+        except Exception as e:
+            # One line outside the diff rejects the whole review; keep the findings in a plain comment
+            logger.warning(f"Review with {len(self.inline)} inline comments rejected, posting a comment instead: {e}")
+            inline_text = "\n".join(f"- `{c['path']}:{c['line']}` {c['body']}" for c in self.inline)
+            await self._send_comments([("review", f"{body}\n\n### Inline Findings\n{inline_text}")], posted)
+
+    async def _send_replies(self, posted: Dict) -> None:
+        if not self.replies:
+            return
+        try:
+            self.stats["api_calls"] += 1
+            threads = await self.github_client.get_review_thread_ids(self.owner, self.repo, self.pr_number)
+        except Exception as e:
+            logger.warning(f"Failed to look up review threads, replying individually: {e}")
+            threads = {}
+
+        unbatched = [reply for reply in self.replies if reply[1] not in threads]
+        batchable = [reply for reply in self.replies if reply[1] in threads]
+        for start in range(0, len(batchable), REPLY_BATCH_SIZE):
+            batch = batchable[start:start + REPLY_BATCH_SIZE]
+            try:
+                self.stats["api_calls"] += 1
+                results = await self.github_client.reply_to_review_threads(
+                    [(threads[comment_id], body) for _, comment_id, body in batch]
+                )
+            except Exception as e:
+                logger.warning(f"Batched thread replies failed, replying individually: {e}")
+                results = [None] * len(batch)
+            for reply, result in zip(batch, results):
+                if result:
+                    posted[reply[0]] = result
+                else:
+                    unbatched.append(reply)
+
+        await asyncio.gather(*[self._send_one(key, posted, self.github_client.reply_to_review_comment,
+                                              self.owner, self.repo, self.pr_number, comment_id, body)
+                                for key, comment_id, body in unbatched])
+
+    async def _send_comments(self, comments: List[tuple], posted: Dict) -> None:
+        await asyncio.gather(*[self._send_one(key, posted, self.github_client.add_pr_comment,
+                                              self.owner, self.repo, self.pr_number, body)
+                               for key, body in comments])
+
+    async def _send_one(self, key: Any, posted: Dict, send, *args) -> None:
+        async with self.writes:
+            self.stats["api_calls"] += 1
+            self.stats["individual_calls"] += 1
+            try:
+                posted[key] = await send(*args)
+            except Exception as e:
+                logger.warning(f"Failed to post GitHub comment {key}: {e}")
+                posted[key] = None
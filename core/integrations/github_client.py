@@ -1,11 +1,64 @@
 # core/integrations/github_client.py
+import asyncio
+import time
 import httpx
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from config.settings import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Pause when the primary rate limit is nearly spent rather than failing mid-review
+RATE_LIMIT_RESERVE = 50
+
+
+class GitHubRateGovernor:
+    """Process-wide GitHub request pacing shared by every GitHubClient.
+
+    Honors ``Retry-After`` from secondary rate limits and pauses all requests
+    when the primary limit is nearly spent. ``repo_slot`` caps how many units of
+    work (e.g. whole PR reviews) run against one repository at a time.
+    """
+
+    def __init__(self, per_repo_limit: int):
+        self.per_repo_limit = per_repo_limit
+        self._repo_slots: Dict[str, asyncio.Semaphore] = {}
+        self._resume_at = 0.0
+        self.metrics = {"requests": 0, "throttled": 0, "paused_seconds": 0.0, "remaining": None}
+
+    def repo_slot(self, owner: str, repo: str) -> asyncio.Semaphore:
+        key = f"{owner}/{repo}".lower()
+        if key not in self._repo_slots:
+            self._repo_slots[key] = asyncio.Semaphore(self.per_repo_limit)
+        return self._repo_slots[key]
+
+    async def before_request(self, request: httpx.Request) -> None:
+        delay = self._resume_at - time.time()
+        if delay > 0:
+            self.metrics["paused_seconds"] += delay
+            await asyncio.sleep(delay)
+        self.metrics["requests"] += 1
+
+    async def observe(self, response: httpx.Response) -> None:
+        headers = response.headers
+        if "x-ratelimit-remaining" in headers:
+            self.metrics["remaining"] = int(headers["x-ratelimit-remaining"])
+        if response.status_code in (403, 429) and "retry-after" in headers:
+            self._pause_until(time.time() + int(headers["retry-after"]))
+        elif self.metrics["remaining"] is not None and self.metrics["remaining"] <= RATE_LIMIT_RESERVE \
+                and "x-ratelimit-reset" in headers:
+            self._pause_until(int(headers["x-ratelimit-reset"]))
+
+    def _pause_until(self, resume_at: float) -> None:
+        if resume_at > self._resume_at:
+            self.metrics["throttled"] += 1
+            logger.warning(f"GitHub rate limit reached, pausing requests for {resume_at - time.time():.0f}s")
+            self._resume_at = resume_at
+
+
+governor = GitHubRateGovernor(settings.github_repo_concurrency)
+
+
 class GitHubClient:
     def __init__(self):
         self.base_url = "https://api.github.com"
@@ -13,12 +66,46 @@ class GitHubClient:
             "Authorization": f"token {settings.github_token}",
             "Accept": "application/vnd.github.v3+json"
         }
+        self.governor = governor
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(event_hooks={
+            "request": [self.governor.before_request],
+            "response": [self.governor.observe],
+        })
+
+    async def list_pull_requests(self, owner: str, repo: str, state: str = "open",
+                                 created_since: Optional[str] = None, max_prs: int = 100,
+                                 predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """List PRs, newest first, optionally only those created after an ISO timestamp.
+
+        ``predicate`` filters while paging, so ``max_prs`` counts matching PRs.
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls"
+        pulls: List[Dict[str, Any]] = []
+        page = 1
+
+        async with self._client() as client:
+            while len(pulls) < max_prs:
+                params = {"state": state, "sort": "created", "direction": "desc", "per_page": 100, "page": page}
+                response = await client.get(url, headers=self.headers, params=params)
+                response.raise_for_status()
+                batch = response.json()
+                for pr in batch:
+                    if created_since and pr["created_at"] < created_since:
+                        return pulls[:max_prs]
+                    if predicate is None or predicate(pr):
+                        pulls.append(pr)
+                if len(batch) < 100:
+                    break
+                page += 1
+        return pulls[:max_prs]
         
     async def get_pr_diff(self, owner: str, repo: str, pr_number: int) -> str:
         """Get PR diff content"""
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(
                 url,
                 headers={**self.headers, "Accept": "application/vnd.github.v3.diff"}
@@ -30,7 +117,7 @@ class GitHubClient:
         """Get PR details"""
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
@@ -39,16 +126,37 @@ class GitHubClient:
         """Get files changed in PR"""
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/files"
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
             
+    async def compare_commits(self, owner: str, repo: str, base: str, head: str) -> Dict[str, Any]:
+        """Compare two commits (status, commits and changed files)"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/compare/{base}...{head}"
+
+        async with self._client() as client:
+            response = await client.get(url, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+
+    async def get_compare_diff(self, owner: str, repo: str, base: str, head: str) -> str:
+        """Get the diff between two commits"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/compare/{base}...{head}"
+
+        async with self._client() as client:
+            response = await client.get(
+                url,
+                headers={**self.headers, "Accept": "application/vnd.github.v3.diff"}
+            )
+            response.raise_for_status()
+            return response.text
+
     async def get_ci_status(self, owner: str, repo: str, sha: str) -> Dict[str, Any]:
         """Get CI/CD status for commit"""
         url = f"{self.base_url}/repos/{owner}/{repo}/commits/{sha}/status"
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
@@ -68,7 +176,7 @@ class GitHubClient:
         
         logger.info(f"Creating PR: {title} from {head} to {base}")
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.post(url, headers=self.headers, json=data)
             
             if response.status_code == 422:
@@ -96,7 +204,7 @@ class GitHubClient:
         
         data = {"body": body}
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.post(url, headers=self.headers, json=data)
             response.raise_for_status()
             return response.json()
@@ -105,7 +213,7 @@ class GitHubClient:
         """Get review comments (line-specific comments) for a PR"""
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/comments"
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
@@ -114,7 +222,7 @@ class GitHubClient:
         """Get general issue comments for a PR"""
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{pr_number}/comments"
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
@@ -129,7 +237,7 @@ class GitHubClient:
             "in_reply_to": comment_id
         }
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.post(url, headers=self.headers, json=data)
             response.raise_for_status()
             return response.json()
@@ -141,7 +249,7 @@ class GitHubClient:
         
         data = {"body": body}
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.post(url, headers=self.headers, json=data)
             response.raise_for_status()
             return response.json()
@@ -152,18 +260,97 @@ class GitHubClient:
         
         data = {"resolved": True}
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.patch(url, headers=self.headers, json=data)
             response.raise_for_status()
             return response.json()
             
+    async def create_review(self, owner: str, repo: str, pr_number: int, body: str,
+                            comments: List[Dict[str, Any]], commit_id: Optional[str] = None,
+                            event: str = "COMMENT") -> Dict[str, Any]:
+        """Submit a pull request review with inline comments ({path, line, body}) in one call"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
+        
+        data = {
+            "body": body,
+            "event": event,
+            "comments": [{"side": "RIGHT", **comment} for comment in comments]
+        }
+        if commit_id:
+            data["commit_id"] = commit_id
+        
+        async with self._client() as client:
+            response = await client.post(url, headers=self.headers, json=data)
+            response.raise_for_status()
+            return response.json()
+            
+    async def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run a GraphQL query; partial errors are logged and the data returned"""
+        url = f"{self.base_url}/graphql"
+        
+        async with self._client() as client:
+            response = await client.post(url, headers=self.headers, json={"query": query, "variables": variables or {}})
+            response.raise_for_status()
+            result = response.json()
+        if result.get("errors"):
+            if not result.get("data"):
+                raise Exception(f"GitHub GraphQL error: {result['errors'][0].get('message')}")
+            logger.warning(f"GitHub GraphQL partial errors: {[e.get('message') for e in result['errors']]}")
+        return result["data"]
+        
+    async def get_review_thread_ids(self, owner: str, repo: str, pr_number: int) -> Dict[int, str]:
+        """Map each review comment's database ID to the node ID of its thread"""
+        query = """
+        query($owner: String!, $repo: String!, $number: Int!, $cursor: String) {
+          repository(owner: $owner, name: $repo) {
+            pullRequest(number: $number) {
+              reviewThreads(first: 100, after: $cursor) {
+                pageInfo { hasNextPage endCursor }
+                nodes { id comments(first: 100) { nodes { databaseId } } }
+              }
+            }
+          }
+        }
+        """
+        threads: Dict[int, str] = {}
+        cursor = None
+        while True:
+            data = await self.graphql(query, {"owner": owner, "repo": repo, "number": pr_number, "cursor": cursor})
+            page = data["repository"]["pullRequest"]["reviewThreads"]
+            for thread in page["nodes"]:
+                for comment in thread["comments"]["nodes"]:
+                    threads[comment["databaseId"]] = thread["id"]
+            if not page["pageInfo"]["hasNextPage"]:
+                return threads
+            cursor = page["pageInfo"]["endCursor"]
+            
+    async def reply_to_review_threads(self, replies: List[tuple]) -> List[Optional[Dict[str, Any]]]:
+        """Reply to several review threads ((thread_id, body) pairs) in one GraphQL mutation"""
+        params = ", ".join(f"$t{i}: ID!, $b{i}: String!" for i in range(len(replies)))
+        fields = "\n".join(
+            f"r{i}: addPullRequestReviewThreadReply(input: {{pullRequestReviewThreadId: $t{i}, body: $b{i}}}) "
+            f"{{ comment {{ databaseId }} }}"
+            for i in range(len(replies))
+        )
+        variables = {}
+        for i, (thread_id, body) in enumerate(replies):
+            variables[f"t{i}"] = thread_id
+            variables[f"b{i}"] = body
+        
+        data = await self.graphql(f"mutation({params}) {{\n{fields}\n}}", variables)
+        posted = []
+        for i in range(len(replies)):
+            reply = data.get(f"r{i}")
+            posted.append({"id": reply["comment"]["databaseId"]} if reply and reply.get("comment") else None)
+        return posted
+            
     async def get_file_content(self, owner: str, repo: str, file_path: str, ref: str = "main") -> str:
         """Get content of a specific file"""
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{file_path}"
         
         params = {"ref": ref}
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.get(url, headers=self.headers, params=params)
             response.raise_for_status()
             data = response.json()
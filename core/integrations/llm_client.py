@@ -123,7 +123,8 @@ Your response must be valid JSON that can be parsed."""},
                 
 IMPORTANT:
 1. Only suggest fixes for files that actually exist or were mentioned as changed
-2. Provide complete file content, not just snippets
+2. Return search/replace edits instead of the whole file; each "search" must be copied exactly from the current file,
+   include enough lines to be unique, and edits must be listed in file order
 3. Use the correct file paths relative to repository root
 4. Return valid JSON format
 5. If no fixes are needed, return empty fixes array
@@ -133,7 +134,9 @@ Return JSON in this format:
     "fixes": [
         {
             "file": "relative/path/to/file",
-            "content": "complete file content",
+            "edits": [
+                {"search": "exact lines from the current file", "replace": "replacement lines"}
+            ],
             "reasoning": "explanation of the fix"
         }
     ]
@@ -156,6 +159,163 @@ Return JSON in this format:
             logger.error(f"Response content: {content}")
             return {"fixes": []}
         
+    async def describe_repository(self, prompt: str) -> Dict[str, Any]:
+        """Summarize repository architecture, modules and conventions"""
+        trace("llm.describe_repository", {"prompt_length": len(prompt)})
+        
+        response = await self.client.chat.completions.create(
+            model=settings.io_model,
+            messages=[
+                {"role": "system", "content": """You are a senior engineer writing onboarding notes for a codebase.
+Be concise and concrete: name real directories, patterns and tools, never generic advice.
+
+Return JSON in this format (omit keys you were not asked for):
+{
+    "architecture": "2-4 sentence architecture summary",
+    "conventions": ["short convention", "..."],
+    "modules": {"path/to/dir": "one-line description of what lives there"}
+}"""},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+        
+        content = response.choices[0].message.content
+        trace("llm.repository_described", {"response_length": len(content)})
+        
+        try:
+            import json
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse repository description JSON: {e}")
+            return {}
+
+    async def review_diff_chunk(self, prompt: str) -> Dict[str, Any]:
+        """Review one chunk of a large diff for bugs and quality issues"""
+        response = await self.client.chat.completions.create(
+            model=settings.io_model,
+            messages=[
+                {"role": "system", "content": """You are a senior code reviewer looking at one part of a large pull request.
+Only report concrete problems visible in this part of the diff; do not comment on code you cannot see.
+
+Return JSON in this format:
+{
+    "score": 1-10 quality score for this part,
+    "findings": [
+        {
+            "file": "path/to/file",
+            "line": line number in the new file or null,
+            "severity": "high|medium|low",
+            "category": "bug|security|performance|complexity|style|quality",
+            "message": "one-sentence description of the problem"
+        }
+    ]
+}"""},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+
+        content = response.choices[0].message.content
+
+        try:
+            import json
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse diff chunk review JSON: {e}")
+            return {"findings": []}
+
+    async def rank_review_findings(self, prompt: str) -> Dict[str, Any]:
+        """Rank deduplicated review findings and summarize them"""
+        trace("llm.rank_review_findings", {"prompt_length": len(prompt)})
+
+        response = await self.client.chat.completions.create(
+            model=settings.io_model,
+            messages=[
+                {"role": "system", "content": """You are a lead reviewer consolidating findings from several reviewers of one pull request.
+Merge findings that describe the same underlying problem and order them by how much they matter to the author.
+
+Return JSON in this format:
+{
+    "summary": "3-5 sentence summary of the most important problems",
+    "ranked": [finding numbers, most important first, duplicates omitted]
+}"""},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+
+        content = response.choices[0].message.content
+
+        try:
+            import json
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse findings ranking JSON: {e}")
+            return {}
+
+    async def reconcile_review_findings(self, prompt: str) -> Dict[str, Any]:
+        """Decide which earlier review findings new commits resolved"""
+        trace("llm.reconcile_review_findings", {"prompt_length": len(prompt)})
+
+        response = await self.client.chat.completions.create(
+            model=settings.io_model,
+            messages=[
+                {"role": "system", "content": """You are a code reviewer checking whether follow-up commits addressed earlier review findings.
+A finding is resolved only if the new diff clearly fixes it or removes the code it refers to.
+
+Return JSON in this format:
+{
+    "resolved": [finding numbers that the diff resolves]
+}"""},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+
+        content = response.choices[0].message.content
+
+        try:
+            import json
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse findings reconciliation JSON: {e}")
+            return {"resolved": []}
+
+    async def rewrite_file(self, prompt: str) -> Dict[str, Any]:
+        """Return a complete file when edits couldn't be applied"""
+        trace("llm.rewrite_file", {"prompt_length": len(prompt)})
+
+        response = await self.client.chat.completions.create(
+            model=settings.io_model,
+            messages=[
+                {"role": "system", "content": """You are a senior software engineer applying a change to a file.
+Keep everything unrelated to the change exactly as it is.
+
+Return JSON in this format:
+{
+    "content": "complete updated file content"
+}"""},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+
+        content = response.choices[0].message.content
+        trace("llm.file_rewritten", {"response_length": len(content)})
+
+        try:
+            import json
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse file rewrite JSON: {e}")
+            return {}
+
     def _parse_code_analysis(self, content: str) -> Dict[str, Any]:
         """Parse code analysis response"""
         # Simple parsing - in production, use more robust parsing
@@ -295,12 +455,15 @@ INSTRUCTIONS:
 2. Address each comment by modifying the code appropriately
 3. Maintain existing code style and structure
 4. Only make necessary changes to address the feedback
-5. Return valid JSON with the modified file content
+5. Return search/replace edits, not the whole file; each "search" must be copied exactly from the current file,
+   include enough lines to be unique, and edits must be listed in file order
 
 Return JSON in this format:
 {
     "modified": true/false,
-    "new_content": "complete modified file content",
+    "edits": [
+        {"search": "exact lines from the current file", "replace": "replacement lines"}
+    ],
     "handled_comments": [
         {
             "id": "comment_id",
@@ -352,6 +515,7 @@ Return JSON in this format:
     ],
     "handled_comments": [
         {
+            "id": "comment_id",
             "summary": "brief description of how this comment was addressed"
         }
     ]
@@ -147,6 +147,7 @@ class MainDispatcherBotHandler:
 
 👨‍💻 **Developer Agent** - Code reviews, PR management
 • `review pr <github_url>` - Review pull requests
+• `review prs <owner/repo> [filter]` - Review all matching PRs of a repo
 • `create pr` - Create new pull requests
 • `handle comments <pr_url>` - Address PR feedback
 
@@ -0,0 +1,78 @@
+# core/repo_mirror.py
+"""Bare per-repository mirrors used to compute PR diffs locally.
+
+The GitHub diff media type is slow for large pull requests and refuses very
+large ones. A mirror fetches the base branch and ``refs/pull/N/head`` in one
+``git fetch`` (only new objects after the first time) and diffs them with
+``git diff base...head``, so the diff is complete whatever its size.
+"""
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Shared by every RepoMirror in the process; fetches into one mirror must not overlap
+# or git's ref locks fail them
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+class RepoMirror:
+    """Bare mirrors under ``<base_path>/<owner>/<repo>.git``"""
+
+    def __init__(self, base_path: Optional[str] = None, fetch_timeout: int = 600):
+        from config.settings import settings
+
+        self.base_path = Path(base_path or settings.repo_mirror_path)
+        self.fetch_timeout = fetch_timeout
+
+    def pr_diff(self, owner: str, repo: str, pr_number: int, base_ref: str, clone_url: str) -> str:
+        """Unified diff of the PR against its base branch, with rename detection"""
+        path = self.base_path / owner.lower() / f"{repo.lower()}.git"
+        base = f"refs/heads/{base_ref}"
+        head = f"refs/pull/{pr_number}/head"
+        with self._lock(path):
+            if not (path / "HEAD").exists():
+                path.mkdir(parents=True, exist_ok=True)
+                self._git(path, "init", "--bare", "--quiet")
+            self._git(path, "fetch", "--quiet", "--no-tags", "--force", self._authenticated(clone_url),
+                      f"{base}:{base}", f"{head}:{head}", timeout=self.fetch_timeout)
+            return self._git(path, "diff", "--find-renames", "--no-color", "--no-ext-diff", f"{base}...{head}")
+
+    def _lock(self, path: Path) -> threading.Lock:
+        with _locks_guard:
+            return _locks.setdefault(str(path.resolve()), threading.Lock())
+
+    def _authenticated(self, clone_url: str) -> str:
+        # Passed on the command line only, so the token never lands in the mirror's config
+        from urllib.parse import urlparse, urlunparse
+        from config.settings import settings
+
+        parsed = urlparse(clone_url)
+        if not settings.github_token or parsed.scheme != "https" or "@" in parsed.netloc:
+            return clone_url
+        return urlunparse(parsed._replace(netloc=f"{settings.github_token}@{parsed.netloc}"))
+
+    def _git(self, path: Path, *args: str, timeout: int = 300) -> str:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=path,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+            capture_output=True,
+            text=True,
+            errors="replace",
+            timeout=timeout,
+        )
+        if result.returncode != 0:
+            from config.settings import settings
+
+            error = result.stderr.strip()
+            if settings.github_token:
+                # Keep the token out of logs and exceptions
+                error = error.replace(settings.github_token, "***")
+            raise RuntimeError(f"git {args[0]} failed in {path}: {error[-500:]}")
+        return result.stdout
@@ -0,0 +1,218 @@
+# core/resource_limits.py
+"""Resource limits and accounting for sandbox commands.
+
+Each command runs in its own cgroup v2 group when a delegated cgroup is
+configured, which enforces CPU/memory/pids limits and measures the whole process
+tree. Otherwise limits fall back to ``ulimit`` and usage comes from the
+rusage of the command's process tree. Both are applied by a shell wrapper
+rather than ``preexec_fn``, which is unsafe in a process running threads.
+"""
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CONTROLLERS = ["cpu", "memory", "pids", "io"]
+CPU_PERIOD_USEC = 100000
+CGROUP_JOIN_FAILED = "sandbox: could not join cgroup, running without limits"
+
+
+class ResourceLimiter:
+    """Runs shell commands with resource limits and reports what they consumed"""
+
+    def __init__(self, cpu_limit: Optional[float] = None, memory_limit_mb: Optional[int] = None,
+                 pids_limit: Optional[int] = None, cgroup_path: Optional[str] = None):
+        from config.settings import settings
+
+        self.cpu_limit = cpu_limit if cpu_limit is not None else settings.sandbox_cpu_limit
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else settings.sandbox_memory_limit_mb
+        self.pids_limit = pids_limit if pids_limit is not None else settings.sandbox_pids_limit
+        self.cgroup_root = self._init_cgroup_root(cgroup_path or settings.sandbox_cgroup_path)
+
+    @property
+    def mode(self) -> str:
+        return "cgroup" if self.cgroup_root else "rlimit"
+
+    def run(self, command: str, cwd: str, env: Optional[Dict[str, str]],
+            timeout: int) -> Tuple[subprocess.CompletedProcess, Dict[str, Any]]:
+        """Run ``command`` in a shell, returning its result and resource usage.
+
+        Raises ``subprocess.TimeoutExpired`` like ``subprocess.run`` after killing
+        the whole process group.
+        """
+        cgroup = self._create_cgroup() if self.cgroup_root else None
+        started = time.monotonic()
+        try:
+            process = subprocess.Popen(
+                self._wrap(command, cgroup),
+                shell=True,
+                cwd=cwd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=True,
+            )
+            stdout, stderr, timed_out = self._communicate(process, timeout)
+            # Reap the shell ourselves so its rusage (including waited-for children) is available
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            usage = self._usage(rusage, cgroup, time.monotonic() - started)
+        finally:
+            if cgroup:
+                self._remove_cgroup(cgroup)
+
+        usage["limits"] = self.mode
+        if cgroup and CGROUP_JOIN_FAILED in (stderr or ""):
+            logger.warning(f"Command ran outside cgroup {cgroup} without limits: {command[:200]}")
+            usage["limits"] = "none"
+        if timed_out:
+            raise subprocess.TimeoutExpired(command, timeout, output=stdout, stderr=stderr)
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr), usage
+
+    def _communicate(self, process: subprocess.Popen, timeout: int) -> Tuple[str, str, bool]:
+        output: Dict[str, str] = {}
+
+        def drain(name, stream):
+            output[name] = stream.read()
+            stream.close()
+
+        readers = [
+            threading.Thread(target=drain, args=("stdout", process.stdout), daemon=True),
+            threading.Thread(target=drain, args=("stderr", process.stderr), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + timeout
+        timed_out = False
+        for reader in readers:
+            reader.join(max(0, deadline - time.monotonic()))
+            if reader.is_alive():
+                timed_out = True
+                break
+
+        if timed_out:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            for reader in readers:
+                reader.join(5)
+        return output.get("stdout", ""), output.get("stderr", ""), timed_out
+
+    def _wrap(self, command: str, cgroup: Optional[Path]) -> str:
+        """``command`` prefixed with joining its cgroup or setting the rlimit, then exec'd"""
+        if cgroup:
+            # The shell joins before exec so every descendant is accounted for; a failed join is
+            # reported on stderr so run() can flag the unlimited run
+            procs = shlex.quote(str(cgroup / "cgroup.procs"))
+            prefix = f"{{ echo $$ > {procs}; }} 2>/dev/null || echo {shlex.quote(CGROUP_JOIN_FAILED)} >&2"
+        elif self.memory_limit_mb:
+            # RLIMIT_DATA rather than RLIMIT_AS: V8 and other JITs reserve far more address space than they use
+            prefix = f"ulimit -d {self.memory_limit_mb * 1024} 2>/dev/null"
+        else:
+            return command
+        return f"{prefix}; exec /bin/sh -c {shlex.quote(command)}"
+
+    def _usage(self, rusage, cgroup: Optional[Path], wall_seconds: float) -> Dict[str, Any]:
+        usage = {
+            "wall_seconds": round(wall_seconds, 3),
+            "cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 3),
+            "peak_rss_mb": round(rusage.ru_maxrss / 1024, 1),  # ru_maxrss is KiB on Linux
+            "io_read_bytes": rusage.ru_inblock * 512,
+            "io_write_bytes": rusage.ru_oublock * 512,
+        }
+        if not cgroup:
+            return usage
+
+        cpu_stat = self._read_keyed(cgroup / "cpu.stat")
+        if "usage_usec" in cpu_stat:
+            usage["cpu_seconds"] = round(cpu_stat["usage_usec"] / 1e6, 3)
+        peak = self._read_int(cgroup / "memory.peak")
+        if peak is not None:
+            usage["peak_rss_mb"] = round(peak / (1024 * 1024), 1)
+        io_read = io_write = 0
+        try:
+            for line in (cgroup / "io.stat").read_text().splitlines():
+                fields = dict(f.split("=", 1) for f in line.split()[1:] if "=" in f)
+                io_read += int(fields.get("rbytes", 0))
+                io_write += int(fields.get("wbytes", 0))
+            usage["io_read_bytes"], usage["io_write_bytes"] = io_read, io_write
+        except OSError:
+            pass
+        memory_events = self._read_keyed(cgroup / "memory.events")
+        usage["oom_killed"] = memory_events.get("oom_kill", 0) > 0
+        return usage
+
+    # cgroup v2 management
+
+    def _init_cgroup_root(self, cgroup_path: Optional[str]) -> Optional[Path]:
+        """Validate a delegated cgroup and enable controllers for child groups"""
+        if not cgroup_path:
+            return None
+
+        root = Path(cgroup_path)
+        try:
+            available = (root / "cgroup.controllers").read_text().split()
+            wanted = [c for c in CGROUP_CONTROLLERS if c in available]
+            (root / "cgroup.subtree_control").write_text(" ".join(f"+{c}" for c in wanted))
+        except OSError as e:
+            logger.warning(f"cgroup {root} is not usable ({e}), falling back to rlimits")
+            return None
+
+        logger.info(f"Sandbox commands will run in cgroups under {root} ({', '.join(wanted)})")
+        return root
+
+    def _create_cgroup(self) -> Optional[Path]:
+        cgroup = self.cgroup_root / f"cmd-{uuid.uuid4().hex[:12]}"
+        try:
+            cgroup.mkdir()
+            if self.cpu_limit:
+                (cgroup / "cpu.max").write_text(f"{int(self.cpu_limit * CPU_PERIOD_USEC)} {CPU_PERIOD_USEC}")
+            if self.memory_limit_mb:
+                (cgroup / "memory.max").write_text(str(self.memory_limit_mb * 1024 * 1024))
+                if (cgroup / "memory.swap.max").exists():
+                    (cgroup / "memory.swap.max").write_text("0")
+            if self.pids_limit:
+                (cgroup / "pids.max").write_text(str(self.pids_limit))
+        except OSError as e:
+            logger.warning(f"Failed to set up cgroup {cgroup}: {e}")
+            self._remove_cgroup(cgroup)
+            return None
+        return cgroup
+
+    def _remove_cgroup(self, cgroup: Path) -> None:
+        try:
+            # Processes that outlived the shell (daemons, stray children) must go first
+            if (cgroup / "cgroup.kill").exists():
+                (cgroup / "cgroup.kill").write_text("1")
+            for _ in range(50):
+                try:
+                    cgroup.rmdir()
+                    return
+                except OSError:
+                    time.sleep(0.02)
+            logger.warning(f"Could not remove cgroup {cgroup}")
+        except OSError as e:
+            logger.debug(f"cgroup cleanup for {cgroup} failed: {e}")
+
+    def _read_keyed(self, path: Path) -> Dict[str, int]:
+        try:
+            return {k: int(v) for k, v in (line.split() for line in path.read_text().splitlines())}
+        except (OSError, ValueError):
+            return {}
+
+    def _read_int(self, path: Path) -> Optional[int]:
+        try:
+            return int(path.read_text().strip())
+        except (OSError, ValueError):
+            return None
@@ -1,13 +1,19 @@
 # core/sandbox.py
+import fcntl
 import os
 import shutil
 import tempfile
 import subprocess
+import uuid
 from pathlib import Path
 from git import Repo
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from contextlib import contextmanager
 import logging
+from core.test_runner import TestRunner, ShardedTestExecutor
+from core.dependency_cache import reflink_copy
+from core.sandbox_reaper import LOCK_FILE, SandboxReaper, get_reaper
+from core.resource_limits import ResourceLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +23,22 @@ class SandboxEnvironment:
         self.base_path = Path(base_path)
         self.sandbox_path = self.base_path / sandbox_id
         self.repo: Optional[Repo] = None
-        
+        self.env: Dict[str, str] = {}
+        self.dependency_env: Dict[str, Any] = {}
+        self.test_runner: Optional[TestRunner] = None
+        self.snapshots: Dict[str, Dict[str, Any]] = {}
+        self.fork_strategy: Optional[str] = None
+        self.reaper: Optional[SandboxReaper] = None
+        self.limiter: Optional[ResourceLimiter] = None
+        self.resource_usage: List[Dict[str, Any]] = []
+        self._lock_file = None
+
     def create(self) -> None:
         """Create sandbox directory"""
         self.sandbox_path.mkdir(parents=True, exist_ok=True)
+        # Held until cleanup so no reaper sweep (in any process) trashes a live sandbox
+        self._lock_file = open(self.sandbox_path / LOCK_FILE, "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
         logger.info(f"Created sandbox: {self.sandbox_path}")
         
     def _inject_token(self, repo_url: str) -> str:
@@ -87,60 +105,73 @@ class SandboxEnvironment:
         new_branch.checkout()
         logger.info(f"Created and checked out branch: {branch_name}")
         
-    def run_command(self, command: str, cwd: Optional[str] = None) -> subprocess.CompletedProcess:
-        """Run shell command in sandbox"""
+    def use_environment(self, env_vars: Dict[str, str], path_entries: Optional[list] = None) -> None:
+        """Apply environment variables (and PATH prefixes) to every sandbox command"""
+        self.env.update(env_vars)
+        if path_entries:
+            current_path = self.env.get("PATH", os.environ.get("PATH", ""))
+            self.env["PATH"] = os.pathsep.join([str(p) for p in path_entries] + [current_path])
+
+    def run_command(self, command: str, cwd: Optional[str] = None, timeout: int = 300) -> subprocess.CompletedProcess:
+        """Run shell command in sandbox under the configured resource limits"""
         if cwd is None:
             cwd = self.sandbox_path / "repo"
-            
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minutes timeout
-        )
+        if self.limiter is None:
+            self.limiter = ResourceLimiter()
+
+        try:
+            result, usage = self.limiter.run(
+                command,
+                cwd=cwd,
+                env={**os.environ, **self.env} if self.env else None,
+                timeout=timeout  # 5 minutes by default
+            )
+        except subprocess.TimeoutExpired:
+            self.resource_usage.append({"command": command, "exit_code": None, "timed_out": True,
+                                        "wall_seconds": timeout})
+            raise
         
-        logger.info(f"Command: {command}, Exit code: {result.returncode}")
+        self.resource_usage.append({"command": command, "exit_code": result.returncode, **usage})
+        logger.info(f"Command: {command}, Exit code: {result.returncode}, "
+                    f"CPU: {usage['cpu_seconds']}s, Peak RSS: {usage['peak_rss_mb']}MB, Wall: {usage['wall_seconds']}s")
         if result.returncode != 0:
             logger.error(f"Command failed: {result.stderr}")
             
         return result
+
+    def usage_summary(self) -> Dict[str, Any]:
+        """Resource usage totals for every command run in this sandbox"""
+        records = list(self.resource_usage)
+        return {
+            "commands": len(records),
+            "timed_out": sum(1 for r in records if r.get("timed_out")),
+            "wall_seconds": round(sum(r.get("wall_seconds", 0) for r in records), 3),
+            "cpu_seconds": round(sum(r.get("cpu_seconds", 0) for r in records), 3),
+            "peak_rss_mb": max((r.get("peak_rss_mb", 0) for r in records), default=0),
+            "io_read_bytes": sum(r.get("io_read_bytes", 0) for r in records),
+            "io_write_bytes": sum(r.get("io_write_bytes", 0) for r in records),
+            "oom_killed": sum(1 for r in records if r.get("oom_killed")),
+            "heaviest_commands": [
+                {k: r.get(k) for k in ("command", "cpu_seconds", "peak_rss_mb", "wall_seconds")}
+                for r in sorted(records, key=lambda r: r.get("cpu_seconds", 0), reverse=True)[:5]
+            ],
+        }
         
-    def run_tests(self) -> Dict[str, Any]:
-        """Run test suite in sandbox"""
-        repo_path = self.sandbox_path / "repo"
-        
-        # Try different test runners
-        test_commands = [
-            "python -m pytest --tb=short",
-            "python -m unittest discover",
-            "npm test",
-            "make test"
-        ]
-        
-        results = {}
-        for cmd in test_commands:
-            try:
-                result = self.run_command(cmd)
-                if result.returncode == 0:
-                    results[cmd] = {
-                        "status": "passed",
-                        "output": result.stdout
-                    }
-                    break
-                else:
-                    results[cmd] = {
-                        "status": "failed",
-                        "output": result.stderr
-                    }
-            except Exception as e:
-                results[cmd] = {
-                    "status": "error",
-                    "output": str(e)
-                }
-                
-        return results
+    def detect_test_runner(self, test_frameworks: Optional[list] = None) -> Optional[TestRunner]:
+        """Detect the repo's test runner once per sandbox"""
+        if self.test_runner is None:
+            self.test_runner = TestRunner.detect(str(self.sandbox_path / "repo"), test_frameworks)
+            logger.info(f"Detected test runner: {self.test_runner}")
+        return self.test_runner
+
+    def run_tests(self, test_frameworks: Optional[list] = None,
+                  targets: Optional[list] = None) -> Dict[str, Any]:
+        """Run test suite (or just ``targets``) in sandbox with the detected runner"""
+        # Detect the runner once per sandbox instead of probing every runner on each run
+        if self.detect_test_runner(test_frameworks) is None:
+            return {"no test runner detected": {"status": "skipped", "output": ""}}
+
+        return ShardedTestExecutor().run(self, self.test_runner, targets)
         
     def commit_changes(self, message: str) -> str:
         """Commit changes to repository"""
@@ -164,17 +195,196 @@ class SandboxEnvironment:
         origin.push(branch_name)
         logger.info(f"Pushed branch: {branch_name}")
         
+    def _git(self, *args: str, env: Optional[Dict[str, str]] = None) -> str:
+        """Run a git command in the sandbox repo and return stdout"""
+        result = subprocess.run(
+            ["git", *args],
+            cwd=self.sandbox_path / "repo",
+            env={**os.environ, **(env or {})},
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout
+
+    def snapshot(self, label: str = "snapshot") -> Dict[str, Any]:
+        """Capture the working tree so it can be restored or forked later.
+
+        Uses a reflink copy of the repo when the filesystem supports it, otherwise
+        records the worktree (including untracked files) as a dangling git commit.
+        """
+        if not self.repo:
+            raise ValueError("Repository not cloned")
+
+        snapshot_id = f"{label}-{uuid.uuid4().hex[:6]}"
+        target = self.sandbox_path / "snapshots" / snapshot_id
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        if reflink_copy(self.sandbox_path / "repo", target):
+            snapshot = {"id": snapshot_id, "strategy": "reflink", "path": str(target)}
+        else:
+            snapshot = {
+                "id": snapshot_id,
+                "strategy": "git",
+                "head": self.repo.head.commit.hexsha,
+                "commit": self._commit_worktree(),
+            }
+
+        self.snapshots[snapshot_id] = snapshot
+        logger.info(f"Created {snapshot['strategy']} snapshot {snapshot_id}")
+        return snapshot
+
+    def _commit_worktree(self) -> str:
+        """Write the full worktree to a commit object without touching HEAD or the index"""
+        git_dir = Path(self._git("rev-parse", "--git-dir").strip())
+        if not git_dir.is_absolute():
+            git_dir = self.sandbox_path / "repo" / git_dir
+        index_file = git_dir / f"index.snapshot-{uuid.uuid4().hex[:6]}"
+        try:
+            # Start from the real index so unchanged files aren't re-hashed
+            if (git_dir / "index").exists():
+                shutil.copy2(git_dir / "index", index_file)
+            env = {"GIT_INDEX_FILE": str(index_file)}
+            self._git("add", "-A", env=env)
+            tree = self._git("write-tree", env=env).strip()
+            return self._git("commit-tree", tree, "-p", "HEAD", "-m", "sandbox snapshot").strip()
+        finally:
+            if index_file.exists():
+                index_file.unlink()
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Reset the working tree to a snapshot taken earlier"""
+        repo_path = self.sandbox_path / "repo"
+
+        if snapshot["strategy"] == "reflink":
+            discarded = self.sandbox_path / f"repo.discarded-{uuid.uuid4().hex[:6]}"
+            os.rename(repo_path, discarded)
+            if not reflink_copy(Path(snapshot["path"]), repo_path):
+                os.rename(discarded, repo_path)
+                raise RuntimeError(f"Failed to restore snapshot {snapshot['id']}")
+            self._remove_tree(discarded)
+            self.repo = Repo(repo_path)
+        else:
+            head, commit = snapshot["head"], snapshot["commit"]
+            self._git("reset", "-q", "--hard", head)
+            self._git("clean", "-fdq")
+            self._git("checkout", commit, "--", ".")
+            for deleted in self._git("diff", "--name-only", "--diff-filter=D", head, commit).splitlines():
+                (repo_path / deleted).unlink(missing_ok=True)
+            # Leave snapshot-only files untracked, as they were when the snapshot was taken
+            self._git("reset", "-q")
+
+        logger.info(f"Restored snapshot {snapshot['id']}")
+
+    def discard_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """Drop a snapshot that is no longer needed"""
+        self.snapshots.pop(snapshot["id"], None)
+        if snapshot["strategy"] == "reflink":
+            self._remove_tree(Path(snapshot["path"]))
+
+    def fork(self, fork_id: str) -> "SandboxEnvironment":
+        """Create a child sandbox sharing this sandbox's current state and environment.
+
+        Forks let several candidate changes be tried in parallel; the winner is
+        brought back with ``adopt``.
+        """
+        if not self.repo:
+            raise ValueError("Repository not cloned")
+
+        repo_path = self.sandbox_path / "repo"
+        child = SandboxEnvironment(fork_id, str(self.sandbox_path / "forks"))
+        child.create()
+        child.env = dict(self.env)
+        child.dependency_env = self.dependency_env
+        child.test_runner = self.test_runner
+        child.reaper = self.reaper
+        child.limiter = self.limiter
+        child_repo = child.sandbox_path / "repo"
+
+        if reflink_copy(repo_path, child_repo):
+            child.fork_strategy = "reflink"
+        else:
+            snapshot = self.snapshot(f"fork-{fork_id}")
+            self._git("worktree", "add", "--detach", str(child_repo), snapshot["commit"])
+            child.fork_strategy = "worktree"
+            # Ignored dependency trees aren't part of the worktree; share the parent's
+            if (repo_path / "node_modules").exists():
+                os.symlink(repo_path / "node_modules", child_repo / "node_modules")
+
+        child.repo = Repo(child_repo)
+        logger.info(f"Forked sandbox {self.sandbox_id} -> {fork_id} ({child.fork_strategy})")
+        return child
+
+    def adopt(self, child: "SandboxEnvironment") -> list:
+        """Copy a fork's working tree changes back into this sandbox"""
+        repo_path = self.sandbox_path / "repo"
+        child_repo = child.sandbox_path / "repo"
+        entries = child._git("status", "--porcelain", "-z", "--untracked-files=all").split("\0")
+
+        adopted = []
+        index = 0
+        while index < len(entries):
+            entry = entries[index]
+            index += 1
+            if len(entry) < 4:
+                continue
+            status, path = entry[:2], entry[3:]
+            if "R" in status or "C" in status:
+                index += 1  # skip the rename source
+            if path == "node_modules" or path.startswith("node_modules/"):
+                continue
+
+            if "D" in status:
+                (repo_path / path).unlink(missing_ok=True)
+            else:
+                (repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(child_repo / path, repo_path / path)
+            adopted.append(path)
+
+        logger.info(f"Adopted {len(adopted)} files from fork {child.sandbox_id}")
+        return adopted
+
+    def discard_fork(self, child: "SandboxEnvironment") -> None:
+        """Remove a fork created with ``fork``"""
+        if child.fork_strategy == "worktree":
+            try:
+                self._git("worktree", "remove", "--force", str(child.sandbox_path / "repo"))
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Failed to remove worktree for {child.sandbox_id}: {e.stderr}")
+        # Fork commands count towards this sandbox's workflow usage
+        self.resource_usage.extend(child.resource_usage)
+        child.cleanup()
+
+    def _remove_tree(self, path: Path) -> None:
+        if self.reaper:
+            self.reaper.discard(path)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
     def cleanup(self) -> None:
-        """Clean up sandbox directory"""
+        """Clean up sandbox directory (in the background when a reaper is attached)"""
         if self.sandbox_path.exists():
-            shutil.rmtree(self.sandbox_path)
+            self._remove_tree(self.sandbox_path)
             logger.info(f"Cleaned up sandbox: {self.sandbox_path}")
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
 
 class SandboxManager:
-    def __init__(self, base_path: str = "/tmp/sandbox", max_concurrent: int = 5):
+    def __init__(self, base_path: str = "/tmp/sandbox", max_concurrent: int = 5,
+                 orphan_max_age: Optional[int] = None):
+        from config.settings import settings
+
         self.base_path = base_path
         self.max_concurrent = max_concurrent
         self.active_sandboxes: Dict[str, SandboxEnvironment] = {}
+        self.reaper = get_reaper(base_path)
+        self.limiter = ResourceLimiter()
+        max_age = orphan_max_age if orphan_max_age is not None else settings.sandbox_orphan_max_age
+        try:
+            self.reaper.sweep(max_age)
+        except OSError as e:
+            logger.warning(f"Sandbox orphan sweep failed: {e}")
         
     @contextmanager
     def get_sandbox(self, sandbox_id: str):
@@ -183,6 +393,8 @@ class SandboxManager:
             raise RuntimeError("Maximum concurrent sandboxes reached")
             
         sandbox = SandboxEnvironment(sandbox_id, self.base_path)
+        sandbox.reaper = self.reaper
+        sandbox.limiter = self.limiter
         sandbox.create()
         
         self.active_sandboxes[sandbox_id] = sandbox
@@ -191,4 +403,8 @@ class SandboxManager:
             yield sandbox
         finally:
             sandbox.cleanup()
-            self.active_sandboxes.pop(sandbox_id, None)
\ No newline at end of file
+            self.active_sandboxes.pop(sandbox_id, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Active sandboxes and background teardown/disk usage metrics"""
+        return dict(self.reaper.get_metrics(), active=len(self.active_sandboxes))
@@ -0,0 +1,201 @@
+# core/sandbox_reaper.py
+"""Background deletion of sandbox directories.
+
+Tearing down a sandbox only renames its directory into a trash area on the same
+filesystem, which is instant; a low-priority daemon thread deletes the trash
+afterwards. A startup sweep reclaims sandboxes leaked by crashed processes;
+live sandboxes hold an flock on their ``LOCK_FILE`` and are never swept, whichever
+process or manager owns them.
+"""
+import fcntl
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRASH_DIR = ".trash"
+LOCK_FILE = ".sandbox.lock"
+MAX_RECENT_SANDBOXES = 100
+
+_reapers: Dict[str, "SandboxReaper"] = {}
+_reapers_lock = threading.Lock()
+
+
+def get_reaper(base_path: str) -> "SandboxReaper":
+    """Return the shared reaper for a sandbox base path"""
+    key = os.path.abspath(base_path)
+    with _reapers_lock:
+        if key not in _reapers:
+            _reapers[key] = SandboxReaper(key)
+        return _reapers[key]
+
+
+def disk_usage(path: Path) -> int:
+    """Bytes allocated on disk by a tree (hardlinked files counted once)"""
+    total = 0
+    seen: Set[tuple] = set()
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if stat.st_nlink > 1 and not os.path.isdir(os.path.join(root, name)):
+                inode = (stat.st_dev, stat.st_ino)
+                if inode in seen:
+                    continue
+                seen.add(inode)
+            total += stat.st_blocks * 512
+    return total
+
+
+class SandboxReaper:
+    """Moves sandbox directories to trash and deletes them on a background thread"""
+
+    def __init__(self, base_path: str):
+        self.base_path = Path(base_path)
+        self.trash_path = self.base_path / TRASH_DIR
+        self._queue: "queue.Queue[Path]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, Any] = {
+            "sandboxes_reaped": 0,
+            "bytes_reclaimed": 0,
+            "orphans_swept": 0,
+            "failures": 0,
+            "sandboxes": {},  # most recent teardowns: name -> bytes on disk
+        }
+
+    def discard(self, path: Path) -> None:
+        """Remove a directory without waiting for the deletion"""
+        path = Path(path)
+        if not path.exists():
+            return
+
+        self.trash_path.mkdir(parents=True, exist_ok=True)
+        target = self.trash_path / f"{path.name}-{uuid.uuid4().hex[:6]}"
+        try:
+            os.rename(path, target)
+        except OSError as e:
+            # Different filesystem or busy directory; delete in place
+            logger.warning(f"Could not move {path} to trash ({e}), deleting synchronously")
+            shutil.rmtree(path, ignore_errors=True)
+            return
+
+        self._enqueue(target)
+
+    def sweep(self, max_age_seconds: float) -> int:
+        """Trash unlocked sandbox directories untouched for longer than ``max_age_seconds``.
+
+        Also resumes deleting anything already in the trash.
+        """
+        if not self.base_path.exists():
+            return 0
+
+        # Resume deletions a previous process left in the trash
+        if self.trash_path.exists():
+            for leftover in self.trash_path.iterdir():
+                self._enqueue(leftover)
+
+        cutoff = time.time() - max_age_seconds
+        swept = 0
+        for entry in self.base_path.iterdir():
+            if entry.name == TRASH_DIR or not entry.is_dir():
+                continue
+            try:
+                last_used = max(entry.stat().st_mtime, (entry / "repo").stat().st_mtime
+                                if (entry / "repo").exists() else 0)
+            except OSError:
+                continue
+            if last_used < cutoff and self._discard_unlocked(entry):
+                swept += 1
+
+        self.metrics["orphans_swept"] += swept
+        return swept
+
+    def _discard_unlocked(self, entry: Path) -> bool:
+        """Trash ``entry`` unless a live sandbox holds its lock"""
+        try:
+            lock_file = open(entry / LOCK_FILE, "a")
+        except OSError:
+            return False
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.debug(f"Sandbox {entry.name} is in use, not sweeping it")
+                return False
+            logger.info(f"Sweeping orphaned sandbox: {entry.name}")
+            self.discard(entry)
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the trash queue is drained; returns False on timeout"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Reaper counters plus current disk usage of the sandbox filesystem"""
+        metrics = dict(self.metrics, pending=self._queue.unfinished_tasks)
+        if self.base_path.exists():
+            usage = shutil.disk_usage(self.base_path)
+            metrics["disk"] = {"total": usage.total, "used": usage.used, "free": usage.free}
+        return metrics
+
+    def _enqueue(self, path: Path) -> None:
+        self._queue.put(path)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sandbox-reaper", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        self._lower_priority()
+        while True:
+            path = self._queue.get()
+            try:
+                self._delete(path)
+            except Exception as e:
+                self.metrics["failures"] += 1
+                logger.error(f"Failed to delete {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _delete(self, path: Path) -> None:
+        if not path.exists():
+            return
+        size = disk_usage(path)
+        name = path.name.rsplit("-", 1)[0]
+        if shutil.which("ionice"):
+            # Idle I/O class so deletion never competes with active sandboxes
+            subprocess.run(["ionice", "-c", "3", "rm", "-rf", str(path)], capture_output=True)
+        shutil.rmtree(path, ignore_errors=True)
+        if path.exists():
+            raise RuntimeError("directory still present after delete")
+
+        self.metrics["sandboxes_reaped"] += 1
+        self.metrics["bytes_reclaimed"] += size
+        recent = self.metrics["sandboxes"]
+        recent[name] = size
+        if len(recent) > MAX_RECENT_SANDBOXES:
+            recent.pop(next(iter(recent)))
+        logger.info(f"Reclaimed {size / (1024 * 1024):.1f} MiB from sandbox {name}")
+
+    def _lower_priority(self) -> None:
+        """Drop this thread's CPU priority (Linux threads have their own nice value)"""
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Could not lower reaper priority: {e}")
@@ -0,0 +1,106 @@
+# core/stage_graph.py
+"""Small async dependency-graph executor for multi-stage pipelines.
+
+Each stage is an async callable that receives the results of the stages it
+depends on as keyword arguments. A stage starts as soon as all of its
+dependencies have finished, so independent stages run concurrently.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED = object()
+
+
+class StageGraph:
+    """Runs async stages as soon as the stages they depend on have finished.
+
+    A stage that fails or times out either resolves to its ``fallback`` (so its
+    dependents still run) or, without one, causes its dependents to be skipped.
+    ``run`` always returns whatever finished, never raising for a stage error.
+    """
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], deps: Sequence[str] = (),
+            timeout: Optional[float] = None, fallback: Any = _REQUIRED) -> "StageGraph":
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self.stages[name] = {"name": name, "func": func, "deps": list(deps),
+                             "timeout": timeout, "fallback": fallback}
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every stage, returning results, errors, skipped stages and timings"""
+        self._validate()
+        report: Dict[str, Any] = {"results": {}, "errors": {}, "skipped": [], "timings": {}}
+        started = time.monotonic()
+
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self.stages:
+            tasks[name] = asyncio.create_task(self._run_stage(self.stages[name], tasks, report))
+        await asyncio.gather(*tasks.values())
+
+        report["timings"]["total"] = round(time.monotonic() - started, 3)
+        return report
+
+    async def _run_stage(self, stage: Dict[str, Any], tasks: Dict[str, asyncio.Task],
+                         report: Dict[str, Any]) -> Tuple[bool, Any]:
+        name = stage["name"]
+        kwargs = {}
+        for dep in stage["deps"]:
+            ok, value = await tasks[dep]
+            if not ok:
+                report["skipped"].append(name)
+                logger.info(f"Skipping stage {name}: dependency {dep} did not complete")
+                return False, None
+            kwargs[dep] = value
+
+        timeout = stage["timeout"] if stage["timeout"] is not None else self.default_timeout
+        started = time.monotonic()
+        try:
+            value = await asyncio.wait_for(stage["func"](**kwargs), timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        else:
+            report["timings"][name] = round(time.monotonic() - started, 3)
+            report["results"][name] = value
+            return True, value
+
+        report["timings"][name] = round(time.monotonic() - started, 3)
+        report["errors"][name] = error
+        logger.warning(f"Stage {name} failed: {error}")
+        if stage["fallback"] is _REQUIRED:
+            return False, None
+        report["results"][name] = stage["fallback"]
+        return True, stage["fallback"]
+
+    def _validate(self) -> None:
+        """Reject unknown dependencies and cycles, which would otherwise deadlock"""
+        for stage in self.stages.values():
+            missing = [d for d in stage["deps"] if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage['name']} depends on unknown stages: {missing}")
+
+        visiting, done = set(), set()
+
+        def visit(name: str, path: List[str]) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name]["deps"]:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name, [])
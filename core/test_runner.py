@@ -0,0 +1,318 @@
+# core/test_runner.py
+"""Test runner detection and sharded, parallel test execution for sandboxes."""
+import json
+import os
+import re
+import shlex
+import subprocess
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+SKIP_DIRS = {'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist', 'target', 'site-packages'}
+MAX_OUTPUT_CHARS = 20000
+
+
+class TestRunner:
+    """A detected test runner and how to run (a shard of) its suite"""
+
+    def __init__(self, name: str, command: str, shardable: bool = False):
+        self.name = name
+        self.command = command
+        self.shardable = shardable
+
+    def __repr__(self) -> str:
+        return f"TestRunner({self.name!r}, {self.command!r})"
+
+    @classmethod
+    def detect(cls, repo_path: str, test_frameworks: Optional[List[str]] = None) -> Optional["TestRunner"]:
+        """Pick the single runner for a repo from its metadata.
+
+        ``test_frameworks`` is the ``CodeAnalyzer`` detection result and is used as
+        a hint; each candidate is confirmed against the repo's own config files.
+        """
+        repo = Path(repo_path)
+        hints = set(test_frameworks or [])
+        package_json = cls._load_package_json(repo)
+        test_script = package_json.get("scripts", {}).get("test", "")
+        js_deps = {**package_json.get("dependencies", {}), **package_json.get("devDependencies", {})}
+
+        if cls._uses_pytest(repo, hints):
+            return cls("pytest", "python -m pytest -q --tb=short -p no:cacheprovider", shardable=True)
+
+        if "jest" in js_deps and ("jest" in hints or "jest" in test_script):
+            return cls("jest", "npx jest --ci", shardable=True)
+
+        if test_script and "no test specified" not in test_script:
+            return cls("npm", "npm test")
+
+        if cls._has_make_target(repo, "test"):
+            return cls("make", "make test")
+
+        if "unittest" in hints or cls._find_python_tests(repo):
+            return cls("unittest", "python -m unittest discover")
+
+        return None
+
+    @staticmethod
+    def _load_package_json(repo: Path) -> Dict[str, Any]:
+        try:
+            with open(repo / "package.json", "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    @classmethod
+    def _uses_pytest(cls, repo: Path, hints: set) -> bool:
+        if (repo / "pytest.ini").exists() or (repo / "conftest.py").exists():
+            return True
+        for config_name, marker in [("pyproject.toml", "[tool.pytest"), ("setup.cfg", "[tool:pytest]"), ("tox.ini", "[pytest]")]:
+            config = repo / config_name
+            if config.exists() and marker in config.read_text(errors="ignore"):
+                return True
+        for requirements in ["requirements.txt", "requirements-dev.txt", "pyproject.toml", "uv.lock", "poetry.lock"]:
+            path = repo / requirements
+            if path.exists() and re.search(r"\bpytest\b", path.read_text(errors="ignore")):
+                return "pytest" in hints or bool(cls._find_python_tests(repo))
+        return False
+
+    @staticmethod
+    def _has_make_target(repo: Path, target: str) -> bool:
+        makefile = repo / "Makefile"
+        if not makefile.exists():
+            return False
+        return re.search(rf"^{target}\s*:", makefile.read_text(errors="ignore"), re.MULTILINE) is not None
+
+    @staticmethod
+    def _find_python_tests(repo: Path) -> List[str]:
+        tests = []
+        for root, dirs, files in os.walk(repo):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+            for file in files:
+                if file.endswith(".py") and (file.startswith("test_") or file.endswith("_test.py")):
+                    tests.append(os.path.relpath(os.path.join(root, file), repo))
+        return sorted(tests)
+
+    def collect_targets(self, repo_path: str) -> List[str]:
+        """List shardable units (test files) for this runner"""
+        if self.name == "pytest":
+            return self._find_python_tests(Path(repo_path))
+        return []
+
+
+class ShardedTestExecutor:
+    """Runs a test suite split across CPU cores with per-shard timeouts"""
+
+    def __init__(self, max_workers: Optional[int] = None, shard_timeout: Optional[int] = None):
+        from config.settings import settings
+
+        self.max_workers = max_workers or settings.test_max_workers or os.cpu_count() or 1
+        self.shard_timeout = shard_timeout or settings.test_shard_timeout
+
+    def run(self, sandbox, runner: TestRunner, targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run the suite (or just ``targets``) and return a JUnit-style aggregate"""
+        repo_path = str(Path(sandbox.sandbox_path) / "repo")
+        results_dir = Path(sandbox.sandbox_path) / "test-results"
+        results_dir.mkdir(parents=True, exist_ok=True)
+
+        if targets is None and runner.shardable:
+            targets = runner.collect_targets(repo_path)
+
+        shards = self._split(repo_path, runner, targets)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, len(shards))) as pool:
+            shard_results = list(pool.map(
+                lambda item: self._run_shard(sandbox, runner, item[0], len(shards), item[1], results_dir),
+                enumerate(shards)
+            ))
+
+        return self._aggregate(runner, shard_results, time.monotonic() - started)
+
+    def _split(self, repo_path: str, runner: TestRunner, targets: Optional[List[str]]) -> List[List[str]]:
+        """Balance test files across shards by size (largest first)"""
+        if runner.name == "jest" and not targets:
+            # jest shards its own suite via --shard=i/n
+            return [[] for _ in range(self.max_workers)]
+        if not runner.shardable or not targets:
+            return [targets or []]
+
+        shard_count = min(self.max_workers, len(targets))
+        shards: List[List[str]] = [[] for _ in range(shard_count)]
+        loads = [0] * shard_count
+
+        def size(target: str) -> int:
+            try:
+                return os.path.getsize(os.path.join(repo_path, target.split("::")[0]))
+            except OSError:
+                return 0
+
+        for target in sorted(targets, key=size, reverse=True):
+            index = loads.index(min(loads))
+            shards[index].append(target)
+            loads[index] += size(target) or 1
+        return [shard for shard in shards if shard]
+
+    def _shard_command(self, runner: TestRunner, index: int, total: int,
+                       targets: List[str], report_path: Path) -> str:
+        quoted = " ".join(shlex.quote(t) for t in targets)
+        if runner.name == "pytest":
+            return f"{runner.command} --junitxml={shlex.quote(str(report_path) + '.xml')} {quoted}".strip()
+        if runner.name == "jest":
+            selection = quoted if targets else f"--shard={index + 1}/{total} --maxWorkers=1"
+            return f"{runner.command} --json --outputFile={shlex.quote(str(report_path) + '.json')} {selection}"
+        return runner.command
+
+    def _run_shard(self, sandbox, runner: TestRunner, index: int, total: int,
+                   targets: List[str], results_dir: Path) -> Dict[str, Any]:
+        report_path = results_dir / f"{runner.name}-shard-{index}"
+        for suffix in (".xml", ".json"):
+            stale = report_path.with_name(report_path.name + suffix)
+            if stale.exists():
+                stale.unlink()
+        command = self._shard_command(runner, index, total, targets, report_path)
+        started = time.monotonic()
+        shard = {"shard": index, "command": command, "targets": len(targets)}
+
+        try:
+            result = sandbox.run_command(command, timeout=self.shard_timeout)
+        except subprocess.TimeoutExpired as e:
+            shard.update({
+                "status": "error",
+                "returncode": None,
+                "duration": round(time.monotonic() - started, 2),
+                "output": f"Shard timed out after {self.shard_timeout}s\n{self._decode(e.stdout)}"[-MAX_OUTPUT_CHARS:],
+                "tests": 0, "failures": 0, "errors": 1, "skipped": 0,
+                "failed_tests": [{"id": f"shard-{index}", "status": "error", "message": "timeout"}],
+            })
+            return shard
+
+        output = (result.stdout or "") + (result.stderr or "")
+        shard.update({
+            "returncode": result.returncode,
+            "duration": round(time.monotonic() - started, 2),
+            "output": output[-MAX_OUTPUT_CHARS:],
+        })
+        shard.update(self._parse_report(runner, report_path, output, str(Path(sandbox.sandbox_path) / "repo")))
+
+        # pytest exit code 5 means "no tests collected", which is not a failure
+        if result.returncode == 0 or (runner.name == "pytest" and result.returncode == 5):
+            shard["status"] = "passed"
+        else:
+            shard["status"] = "failed"
+        return shard
+
+    def _parse_report(self, runner: TestRunner, report_path: Path, output: str,
+                      repo_path: str) -> Dict[str, Any]:
+        xml_path = report_path.with_name(report_path.name + ".xml")
+        json_path = report_path.with_name(report_path.name + ".json")
+        if xml_path.exists():
+            return self._parse_junit(xml_path, repo_path)
+        if json_path.exists():
+            return self._parse_jest(json_path, repo_path)
+        return self._parse_text(output)
+
+    def _parse_junit(self, path: Path, repo_path: str) -> Dict[str, Any]:
+        counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0, "failed_tests": []}
+        try:
+            root = ET.parse(path).getroot()
+        except ET.ParseError as e:
+            logger.warning(f"Could not parse JUnit report {path}: {e}")
+            return counts
+        for suite in root.iter("testsuite"):
+            for key in ["tests", "failures", "errors", "skipped"]:
+                counts[key] += int(suite.get(key, 0) or 0)
+        for case in root.iter("testcase"):
+            for outcome in ("failure", "error"):
+                node = case.find(outcome)
+                if node is not None:
+                    counts["failed_tests"].append({
+                        "id": self._junit_case_id(case, repo_path),
+                        "status": outcome,
+                        "message": node.get("message", ""),
+                        "details": (node.text or "")[-4000:],
+                    })
+        return counts
+
+    def _junit_case_id(self, case: ET.Element, repo_path: str) -> str:
+        """Turn a JUnit classname/name pair into a pytest node id"""
+        classname, name = case.get("classname", ""), case.get("name", "")
+        # pytest classnames look like "tests.test_api.TestClient"
+        parts = classname.split(".") if classname else []
+        for i in range(len(parts), 0, -1):
+            candidate = "/".join(parts[:i]) + ".py"
+            if os.path.exists(os.path.join(repo_path, candidate)):
+                return "::".join([candidate] + parts[i:] + [name])
+        return f"{classname}::{name}" if classname else name
+
+    def _parse_jest(self, path: Path, repo_path: str) -> Dict[str, Any]:
+        counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0, "failed_tests": []}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not parse jest report {path}: {e}")
+            return counts
+        counts["tests"] = data.get("numTotalTests", 0)
+        counts["failures"] = data.get("numFailedTests", 0)
+        counts["errors"] = data.get("numRuntimeErrorTestSuites", 0)
+        counts["skipped"] = data.get("numPendingTests", 0)
+        for suite in data.get("testResults", []):
+            for assertion in suite.get("assertionResults", []):
+                if assertion.get("status") == "failed":
+                    counts["failed_tests"].append({
+                        "id": f"{os.path.relpath(suite.get('name', ''), repo_path)}::{assertion.get('fullName', '')}",
+                        "status": "failure",
+                        "message": (assertion.get("failureMessages") or [""])[0][:500],
+                        "details": "\n".join(assertion.get("failureMessages", []))[-4000:],
+                    })
+        return counts
+
+    def _parse_text(self, output: str) -> Dict[str, Any]:
+        """Best-effort counts for runners without a machine-readable report"""
+        counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0, "failed_tests": []}
+        ran = re.search(r"Ran (\d+) tests?", output)
+        if ran:
+            counts["tests"] = int(ran.group(1))
+        for key in ["failures", "errors", "skipped"]:
+            match = re.search(rf"{key}=(\d+)", output)
+            if match:
+                counts[key] = int(match.group(1))
+        for match in re.finditer(r"^(FAIL|ERROR): (\S+) \(([\w.]+)\)", output, re.MULTILINE):
+            counts["failed_tests"].append({
+                "id": f"{match.group(3)}.{match.group(2)}",
+                "status": "failure" if match.group(1) == "FAIL" else "error",
+                "message": "",
+                "details": "",
+            })
+        return counts
+
+    def _aggregate(self, runner: TestRunner, shards: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+        summary = {key: sum(s.get(key, 0) for s in shards) for key in ["tests", "failures", "errors", "skipped"]}
+        summary["duration"] = round(duration, 2)
+        summary["shards"] = len(shards)
+
+        statuses = {s["status"] for s in shards}
+        status = "error" if "error" in statuses else "failed" if "failed" in statuses else "passed"
+        failed_output = "\n".join(s["output"] for s in shards if s["status"] != "passed")
+
+        return {
+            runner.command: {
+                "status": status,
+                "runner": runner.name,
+                "output": (failed_output or "\n".join(s["output"] for s in shards))[-MAX_OUTPUT_CHARS:],
+                "summary": summary,
+                "failed_tests": [t for s in shards for t in s.get("failed_tests", [])],
+                "shards": [{k: v for k, v in s.items() if k not in ("output", "failed_tests")} for s in shards],
+            }
+        }
+
+    @staticmethod
+    def _decode(data) -> str:
+        if data is None:
+            return ""
+        return data.decode(errors="ignore") if isinstance(data, bytes) else data
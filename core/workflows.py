@@ -1,11 +1,12 @@
 from dbos import DBOS, DBOSConfig
 from typing import Dict, Any, Optional
 from models.schemas import (
-    PRReviewRequest, PRReviewResponse, 
+    PRReviewRequest, PRReviewResponse, BulkReviewRequest, BulkReviewResponse,
     PRCreationRequest, PRCreationResponse,
     WorkflowExecution, TaskStatus, ApprovalRequest
 )
 from services.developer.pr_reviewer import PRReviewService
+from services.developer.bulk_reviewer import BulkReviewService
 from services.developer.pr_creator import PRCreatorService
 from services.developer.pr_comment_handler import PRCommentHandler
 from services.developer.approval_system import ApprovalService
@@ -17,6 +18,7 @@ logger = logging.getLogger(__name__)
 class PRWorkflows:
     def __init__(self):
         self.pr_reviewer = PRReviewService()
+        self.bulk_reviewer = BulkReviewService(self.pr_reviewer)
         self.pr_creator = PRCreatorService()
         self.pr_comment_handler = PRCommentHandler()
         self.approval_service = ApprovalService()
@@ -49,6 +51,30 @@ class PRWorkflows:
             )
             raise
             
+    async def bulk_review_workflow(self, request: BulkReviewRequest, on_result=None) -> BulkReviewResponse:
+        """Review every PR of a repo matching a filter"""
+        execution_id = f"bulk-review-{request.thread_id}"
+
+        await self._update_execution_status(
+            execution_id, TaskStatus.IN_PROGRESS, request.dict()
+        )
+
+        try:
+            result = await self.bulk_reviewer.review_prs(request, on_result=on_result)
+
+            await self._update_execution_status(
+                execution_id, TaskStatus.COMPLETED, result.dict()
+            )
+
+            return result
+
+        except Exception as e:
+            logger.exception("Bulk review workflow failed")
+            await self._update_execution_status(
+                execution_id, TaskStatus.FAILED, {"error": str(e)}
+            )
+            raise
+
     DBOS.workflow()
     async def pr_comment_handling_workflow(self, request) -> Any:
         """Handle PR comments workflow"""
@@ -17,17 +17,42 @@ class PRReviewRequest(BaseModel):
     thread_id: str
     user_id: str
     linear_issue_id: Optional[str] = None
+    channel_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
 
 class PRReviewResponse(BaseModel):
     pr_url: str
     review_summary: str
-    code_quality_score: int
+    code_quality_score: Optional[int]
     bugs_found: List[str]
     test_coverage_issues: List[str]
     ci_status: str
     recommendations: List[str]
     linear_context: Optional[Dict[str, Any]] = None
+    incomplete_stages: Dict[str, str] = {}
+    stage_timings: Dict[str, float] = {}
+    reviewed_since: Optional[str] = None
+    resolved_findings: List[str] = []
+    cache_stats: Dict[str, Any] = {}
+    static_findings: List[str] = []
+    excluded_files: Dict[str, str] = {}
+
+class BulkReviewRequest(BaseModel):
+    repo_url: str
+    pr_filter: str = "open"
+    thread_id: str
+    user_id: str
+    channel_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class BulkReviewResponse(BaseModel):
+    repo: str
+    pr_filter: str
+    results: List[Dict[str, Any]]
+    reviewed: int
+    failed: int
+    wall_seconds: float
+    prs_per_hour: float
 
 class PRCreationRequest(BaseModel):
     description: str
@@ -47,6 +72,7 @@ class PRCreationResponse(BaseModel):
     commits: List[str]
     test_results: Dict[str, Any]
     files_changed: List[str]
+    phase_timings: Dict[str, float] = {}
 
 class WorkflowExecution(BaseModel):
     execution_id: str
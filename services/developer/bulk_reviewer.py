@@ -0,0 +1,161 @@
+"""Review many PRs of a repository with a bounded worker pool."""
+
+import asyncio
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Any, Optional
+import logging
+
+from core.integrations.github_client import GitHubClient
+from config.settings import settings
+from models.schemas import BulkReviewRequest, BulkReviewResponse, PRReviewRequest
+from utils.opik_tracer import trace
+
+logger = logging.getLogger(__name__)
+
+ResultCallback = Callable[[Dict[str, Any], int, int], Awaitable[None]]
+
+
+class BulkReviewService:
+    """Lists a repo's PRs and reviews them concurrently.
+
+    Reviews run in a worker pool of ``bulk_review_workers``; each review also
+    takes a slot from the GitHub rate governor's per-repo cap inside
+    ``review_pr``, so bulk jobs and other commands against the same repo share
+    one concurrency budget.
+    """
+
+    def __init__(self, pr_reviewer):
+        self.pr_reviewer = pr_reviewer
+        self.github_client = GitHubClient()
+        self.workers = asyncio.Semaphore(settings.bulk_review_workers)
+
+    async def review_prs(self, request: BulkReviewRequest,
+                         on_result: Optional[ResultCallback] = None) -> BulkReviewResponse:
+        owner, repo = self.parse_repo(request.repo_url)
+        pr_filter = self.parse_filter(request.pr_filter)
+        started = time.monotonic()
+
+        # Filter while paging so the limit counts matching PRs
+        pulls = await self.github_client.list_pull_requests(
+            owner, repo, state=pr_filter["state"], created_since=pr_filter["created_since"],
+            max_prs=settings.bulk_review_max_prs if pr_filter["limit"] is None else pr_filter["limit"],
+            predicate=lambda pr: self._matches(pr, pr_filter)
+        )
+        trace("bulk_review.start", {"repo": f"{owner}/{repo}", "filter": request.pr_filter, "prs": len(pulls)})
+
+        done = 0
+
+        async def review_one(pr: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal done
+            async with self.workers:
+                result = await self._review(pr, request)
+            done += 1
+            if on_result:
+                try:
+                    await on_result(result, done, len(pulls))
+                except Exception as e:
+                    logger.warning(f"Failed to report bulk review result: {e}")
+            return result
+
+        results = await asyncio.gather(*[review_one(pr) for pr in pulls])
+        wall_seconds = time.monotonic() - started
+        reviewed = sum(1 for r in results if r["status"] == "reviewed")
+        prs_per_hour = round(reviewed / wall_seconds * 3600, 1) if wall_seconds > 0 else 0.0
+
+        trace("bulk_review.complete", {
+            "repo": f"{owner}/{repo}", "prs": len(pulls), "reviewed": reviewed,
+            "wall_seconds": round(wall_seconds, 1), "prs_per_hour": prs_per_hour,
+            "github": self.github_client.governor.metrics
+        })
+        return BulkReviewResponse(
+            repo=f"{owner}/{repo}",
+            pr_filter=request.pr_filter,
+            results=sorted(results, key=lambda r: r["number"]),
+            reviewed=reviewed,
+            failed=len(results) - reviewed,
+            wall_seconds=round(wall_seconds, 1),
+            prs_per_hour=prs_per_hour,
+        )
+
+    async def _review(self, pr: Dict[str, Any], request: BulkReviewRequest) -> Dict[str, Any]:
+        result = {"number": pr["number"], "title": pr["title"], "url": pr["html_url"], "author": pr["user"]["login"]}
+        started = time.monotonic()
+        try:
+            review = await self.pr_reviewer.review_pr(PRReviewRequest(
+                pr_url=pr["html_url"], thread_id=request.thread_id, user_id=request.user_id
+            ))
+            result.update({
+                "status": "reviewed",
+                "score": review.code_quality_score,
+                "bugs": len(review.bugs_found),
+                "ci": review.ci_status,
+                "static_findings": len(review.static_findings),
+            })
+        except Exception as e:
+            logger.warning(f"Bulk review of {pr['html_url']} failed: {e}")
+            result.update({"status": "failed", "error": str(e)})
+        result["seconds"] = round(time.monotonic() - started, 1)
+        return result
+
+    def parse_repo(self, repo_url: str) -> tuple:
+        """Accept owner/repo or a GitHub URL"""
+        match = re.search(r"(?:github\.com[/:])?([\w.-]+)/([\w.-]+?)(?:\.git)?/?$", repo_url.strip().strip("<>"))
+        if not match:
+            raise ValueError(f"Not a GitHub repository: {repo_url}")
+        return match.group(1), match.group(2)
+
+    def parse_filter(self, text: str) -> Dict[str, Any]:
+        """Parse filters like ``open``, ``last day``, ``3d``, ``author:alice label:bug limit:20``"""
+        pr_filter = {"state": "open", "created_since": None, "author": None, "label": None,
+                     "base": None, "include_drafts": False, "limit": None}
+        text = (text or "").strip().lower()
+        window = None
+        if re.search(r"\b(?:last day|today|24h)\b", text):
+            window = timedelta(days=1)
+        for token in text.split():
+            key, _, value = token.partition(":")
+            age = re.fullmatch(r"(?:since:)?(\d+)([hdw])", token)
+            if token in ("open", "closed", "all"):
+                pr_filter["state"] = token
+            elif age:
+                amount, unit = int(age.group(1)), age.group(2)
+                window = timedelta(hours=amount) if unit == "h" else timedelta(days=amount * (7 if unit == "w" else 1))
+            elif key in ("author", "label", "base") and value:
+                pr_filter[key] = value
+            elif key == "limit" and value.isdigit():
+                pr_filter["limit"] = min(int(value), settings.bulk_review_max_prs)
+            elif token == "drafts":
+                pr_filter["include_drafts"] = True
+
+        if window:
+            since = datetime.now(timezone.utc) - window
+            pr_filter["created_since"] = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+            if "open" not in text.split():
+                pr_filter["state"] = "all"
+        return pr_filter
+
+    def _matches(self, pr: Dict[str, Any], pr_filter: Dict[str, Any]) -> bool:
+        if pr.get("draft") and not pr_filter["include_drafts"]:
+            return False
+        if pr_filter["author"] and pr["user"]["login"].lower() != pr_filter["author"]:
+            return False
+        if pr_filter["base"] and pr["base"]["ref"].lower() != pr_filter["base"]:
+            return False
+        if pr_filter["label"] and pr_filter["label"] not in {l["name"].lower() for l in pr.get("labels", [])}:
+            return False
+        return True
+
+    def format_table(self, response: BulkReviewResponse) -> str:
+        """Plain-text summary table for Slack"""
+        rows = [("PR", "Score", "Bugs", "CI", "Time", "Title")]
+        for r in response.results:
+            if r["status"] == "reviewed":
+                score = "n/a" if r["score"] is None else f"{r['score']}/10"
+                rows.append((f"#{r['number']}", score, str(r["bugs"]), r["ci"], f"{r['seconds']}s", r["title"][:50]))
+            else:
+                rows.append((f"#{r['number']}", "failed", "-", "-", f"{r['seconds']}s", r["title"][:50]))
+        widths = [max(len(row[i]) for row in rows) for i in range(5)]
+        lines = ["  ".join(cell.ljust(width) for cell, width in zip(row[:5], widths)) + "  " + row[5] for row in rows]
+        return "\n".join(lines)
@@ -0,0 +1,257 @@
+"""Map-reduce review for diffs too large for a single prompt."""
+
+import asyncio
+import re
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
+import logging
+
+from services.developer.diff_index import DiffIndex
+from utils.opik_tracer import trace
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_WEIGHT = {"high": 3, "medium": 2, "low": 1}
+BUG_CATEGORIES = {"bug", "security"}
+QUALITY_SECTIONS = {
+    "performance": "performance_issues",
+    "complexity": "complexity_issues",
+    "style": "style_violations",
+}
+# Only the highest-ranked deduplicated findings go to the final ranking prompt
+MAX_FINDINGS_TO_RANK = 120
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class ChunkedDiffReviewer:
+    """Reviews a large diff as independent chunks and merges the findings.
+
+    The diff is split on file boundaries, and files larger than a chunk on hunk
+    boundaries. Small files are packed together so each prompt is close to
+    ``chunk_chars``. Chunks are reviewed concurrently with at most
+    ``max_workers`` requests in flight, so wall time tracks the worker count
+    rather than the size of the PR.
+    """
+
+    def __init__(self, llm_client, chunk_chars: int, max_workers: int, review_cache=None):
+        self.llm_client = llm_client
+        self.chunk_chars = chunk_chars
+        self.max_workers = max_workers
+        self.review_cache = review_cache
+
+    async def review(self, index: DiffIndex, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        # Files reviewed before (in any PR) reuse their findings; only the rest are sent
+        sections = index.sections()
+        cached, pending = await asyncio.to_thread(self._cached_file_reviews, sections)
+
+        chunks = self._chunk_sections(index, pending)
+        trace("chunked_review.start", {
+            "diff_chars": len(index.text), "chunks": len(chunks), "files_cached": len(cached), "workers": self.max_workers
+        })
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+        done = 0
+
+        async def review_chunk(chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            nonlocal done
+            async with semaphore:
+                try:
+                    result = await self.llm_client.review_diff_chunk(self._chunk_prompt(chunk))
+                except Exception as e:
+                    logger.warning(f"Review of chunk {chunk['files'][:3]} failed: {e}")
+                    result = None
+            done += 1
+            if progress:
+                await progress(done, len(chunks))
+            return result
+
+        if progress and chunks:
+            await progress(0, len(chunks))
+        results = await asyncio.gather(*[review_chunk(c) for c in chunks])
+        failed = [c for c, r in zip(chunks, results) if r is None]
+        if chunks and len(failed) == len(chunks):
+            raise Exception("All diff chunks failed to review")
+
+        raw = [
+            {**finding, "file": finding.get("file") or chunk["files"][0]}
+            for chunk, result in zip(chunks, results) if result
+            for finding in result.get("findings", []) if finding.get("message")
+        ]
+        if self.review_cache:
+            # Cache writes touch one file each (and occasionally list the namespace to evict)
+            await asyncio.to_thread(self._store_file_reviews, pending, chunks, results, raw)
+
+        findings = self._dedupe(raw + [f for hit, _ in cached for f in hit["findings"]])
+        ranked, summary = await self._rank(findings)
+        scores = [(r.get("score"), len(c["text"])) for c, r in zip(chunks, results)
+                  if r and isinstance(r.get("score"), (int, float))]
+        scores += [(hit["score"], size) for hit, size in cached if isinstance(hit.get("score"), (int, float))]
+        score = round(sum(s * w for s, w in scores) / sum(w for _, w in scores)) if scores else None
+
+        trace("chunked_review.complete", {
+            "chunks": len(chunks), "failed_chunks": len(failed), "findings": len(findings)
+        })
+        return {
+            "chunks": len(chunks),
+            "files_total": len(sections),
+            "files_cached": len(cached),
+            "failed_files": sorted({f for c in failed for f in c["files"]}),
+            "summary": summary,
+            "findings": ranked,
+            "quality_analysis": self._quality_analysis(ranked, score),
+            "bugs": [self._format(f) for f in ranked if f.get("category") in BUG_CATEGORIES],
+        }
+
+    def split_diff(self, index: DiffIndex) -> List[Dict[str, Any]]:
+        """Split a parsed diff into chunks of roughly ``chunk_chars`` characters"""
+        return self._chunk_sections(index, index.sections())
+
+    def _chunk_sections(self, index: DiffIndex, sections: List[tuple]) -> List[Dict[str, Any]]:
+        pieces = []
+        for path, section in sections:
+            if len(section) <= self.chunk_chars:
+                pieces.append({"files": [path], "text": section})
+                continue
+
+            header = index.header(path)
+            hunks = [hunk["text"] for hunk in index.hunks(path)]
+            parts = self._pack(hunks, self.chunk_chars - len(header))
+            if not parts:
+                pieces.append({"files": [path], "text": section[:self.chunk_chars]})
+            for part in parts:
+                pieces.append({"files": [path], "text": f"{header}{part}"})
+
+        # Pack whole small files together into shared chunks
+        chunks: List[Dict[str, Any]] = []
+        for piece in pieces:
+            if chunks and len(chunks[-1]["text"]) + len(piece["text"]) <= self.chunk_chars:
+                chunks[-1]["text"] += piece["text"]
+                chunks[-1]["files"].extend(f for f in piece["files"] if f not in chunks[-1]["files"])
+            else:
+                chunks.append({"files": list(piece["files"]), "text": piece["text"]})
+        return chunks
+
+    def _cached_file_reviews(self, sections: List[tuple]) -> Tuple[List[tuple], List[tuple]]:
+        """(cached findings, patch size) for files reviewed before, and (path, patch) for the rest"""
+        cached, pending = [], []
+        for path, patch in sections:
+            hit = self.review_cache.get_file_review(patch) if self.review_cache else None
+            if hit is None:
+                pending.append((path, patch))
+            else:
+                cached.append((hit, len(patch)))
+        return cached, pending
+
+    def _store_file_reviews(self, pending: List[tuple], chunks: List[Dict[str, Any]],
+                            results: List[Optional[Dict[str, Any]]], raw: List[Dict[str, Any]]) -> None:
+        """Cache findings per file patch for files whose every chunk was reviewed"""
+        failed = {f for c, r in zip(chunks, results) if r is None for f in c["files"]}
+        chunk_scores = {}
+        for chunk, result in zip(chunks, results):
+            if result and isinstance(result.get("score"), (int, float)):
+                for path in chunk["files"]:
+                    chunk_scores.setdefault(path, []).append(result["score"])
+
+        for path, patch in pending:
+            if path in failed:
+                continue
+            findings = [f for f in raw if f["file"] == path or path.endswith(f"/{f['file']}")]
+            scores = chunk_scores.get(path)
+            self.review_cache.set_file_review(patch, sum(scores) / len(scores) if scores else None, findings)
+
+    def _pack(self, hunks: List[str], budget: int) -> List[str]:
+        """Group hunks into parts under ``budget``; oversized hunks are cut on line boundaries"""
+        budget = max(budget, 1000)
+        parts: List[str] = []
+        current = ""
+        for hunk in hunks:
+            if len(hunk) > budget:
+                lines = hunk.splitlines(keepends=True)
+                hunk_parts, piece = [], ""
+                for line in lines:
+                    if piece and len(piece) + len(line) > budget:
+                        hunk_parts.append(piece)
+                        piece = "@@ (hunk continued) @@\n"
+                    piece += line
+                hunk_parts.append(piece)
+                if current:
+                    parts.append(current)
+                    current = ""
+                parts.extend(hunk_parts)
+                continue
+            if current and len(current) + len(hunk) + 1 > budget:
+                parts.append(current)
+                current = ""
+            current += hunk if hunk.endswith("\n") else hunk + "\n"
+        if current:
+            parts.append(current)
+        return parts
+
+    def _chunk_prompt(self, chunk: Dict[str, Any]) -> str:
+        return (
+            f"Files in this part: {', '.join(chunk['files'])}\n\n"
+            "Review this part of the pull request diff for logic errors, error handling problems, "
+            "security issues, race conditions, performance, complexity and style.\n\n"
+            f"{chunk['text']}"
+        )
+
+    def _dedupe(self, findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge findings describing the same problem, keeping every location"""
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        for finding in findings:
+            category = str(finding.get("category") or "quality").lower()
+            message = str(finding["message"]).strip()
+            key = (category, re.sub(r"[^a-z ]+", "", message.lower()).strip())
+            location = f"{finding['file']}:{finding['line']}" if finding.get("line") else finding["file"]
+            severity = str(finding.get("severity") or "low").lower()
+            if key in merged:
+                entry = merged[key]
+                if location not in entry["locations"]:
+                    entry["locations"].append(location)
+                if SEVERITY_WEIGHT.get(severity, 1) > SEVERITY_WEIGHT.get(entry["severity"], 1):
+                    entry["severity"] = severity
+            else:
+                merged[key] = {"category": category, "severity": severity, "message": message,
+                               "locations": [location]}
+
+        return sorted(merged.values(),
+                      key=lambda f: (SEVERITY_WEIGHT.get(f["severity"], 1), len(f["locations"])), reverse=True)
+
+    async def _rank(self, findings: List[Dict[str, Any]]) -> tuple:
+        """Final ranking/summarization pass; falls back to the severity ordering"""
+        candidates = findings[:MAX_FINDINGS_TO_RANK]
+        if not candidates:
+            return [], ""
+
+        numbered = "\n".join(f"{i}. [{f['severity']}/{f['category']}] {self._format(f)}"
+                             for i, f in enumerate(candidates))
+        try:
+            result = await self.llm_client.rank_review_findings(f"Findings:\n{numbered}")
+        except Exception as e:
+            logger.warning(f"Failed to rank review findings: {e}")
+            return candidates, ""
+
+        order = [i for i in result.get("ranked", []) if isinstance(i, int) and 0 <= i < len(candidates)]
+        if not order:
+            return candidates, result.get("summary", "")
+        return [candidates[i] for i in dict.fromkeys(order)], result.get("summary", "")
+
+    def _quality_analysis(self, findings: List[Dict[str, Any]], score: Optional[int]) -> Dict[str, Any]:
+        analysis = {
+            "overall_score": score,
+            "issues": [],
+            "style_violations": [],
+            "complexity_issues": [],
+            "performance_issues": []
+        }
+        for finding in findings:
+            if finding["category"] in BUG_CATEGORIES:
+                continue
+            section = QUALITY_SECTIONS.get(finding["category"], "issues")
+            analysis[section].append(self._format(finding))
+        return analysis
+
+    def _format(self, finding: Dict[str, Any]) -> str:
+        locations = finding["locations"]
+        where = ", ".join(locations[:3]) + (f" (+{len(locations) - 3} more)" if len(locations) > 3 else "")
+        return f"{where}: {finding['message']}"
@@ -2,16 +2,38 @@
 
 import os
 import json
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Set
 import logging
 
+import rignore
+
+from core.cache_store import JsonCache
+
 logger = logging.getLogger(__name__)
 
+SKIP_DIRS = {'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist', 'target'}
+# Beyond this many changed files a fresh scan is as cheap as patching the cached one
+INCREMENTAL_MAX_CHANGED = 2000
+RECENT_COMMITS_PER_REPO = 20
+# Bytes sniffed for NUL to classify a file as binary, and the line counting buffer size
+SNIFF_BYTES = 8192
+COUNT_CHUNK_BYTES = 1024 * 1024
+
+def normalize_repo_url(repo_url: str) -> str:
+    """Credential-free, normalized repository URL usable as a cache key"""
+    repo_url = re.sub(r"//[^/@]+@", "//", repo_url.strip())
+    return repo_url.rstrip("/").removesuffix(".git").lower()
+
+
 class CodeAnalyzer:
     """Analyzes repository structure and determines technology stack."""
     
-    def __init__(self):
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache = JsonCache("analysis", cache_path)
         self.language_extensions = {
             'python': {'.py', '.pyx', '.pyi'},
             'javascript': {'.js', '.jsx', '.mjs', '.cjs'},
@@ -43,10 +65,41 @@ class CodeAnalyzer:
             'rails': ['Gemfile', 'config/application.rb', 'app/'],
         }
     
-    def analyze_repository(self, repo_path: str) -> Dict[str, Any]:
-        """Perform comprehensive repository analysis."""
+    def analyze_repository(self, repo_path: str, repo_url: Optional[str] = None,
+                           commit_sha: Optional[str] = None) -> Dict[str, Any]:
+        """Perform comprehensive repository analysis.
+
+        Results are cached per (repo URL, commit SHA). On a miss, the per-file
+        scan of a previously analyzed commit is reused and only files changed
+        since then are re-read.
+        """
         repo_path = Path(repo_path)
+        commit_sha = commit_sha or self._git(repo_path, "rev-parse", "HEAD")
+        repo_key = self._repo_key(repo_path, repo_url)
+        cacheable = bool(commit_sha and repo_key) and self._git(repo_path, "status", "--porcelain") == ""
+        
+        files = None
+        if cacheable:
+            cached = self.cache.get(f"{repo_key}@{commit_sha}")
+            if cached is not None:
+                logger.info(f"Repository analysis cache hit for {commit_sha[:12]}")
+                return cached
+            files = self._incremental_files(repo_path, repo_key, commit_sha)
+        
+        if files is None:
+            files = self._scan_files(repo_path)
+        
+        analysis = self._build_analysis(repo_path, files)
         
+        if cacheable:
+            self.cache.set(f"{repo_key}@{commit_sha}", analysis)
+            self.cache.set(f"{repo_key}@{commit_sha}#files", files)
+            commits = [c for c in self.cache.get(f"{repo_key}#commits") or [] if c != commit_sha]
+            self.cache.set(f"{repo_key}#commits", (commits + [commit_sha])[-RECENT_COMMITS_PER_REPO:])
+        
+        return analysis
+    
+    def _build_analysis(self, repo_path: Path, files: Dict[str, Optional[int]]) -> Dict[str, Any]:
         analysis = {
             'primary_language': None,
             'languages': {},
@@ -62,16 +115,19 @@ class CodeAnalyzer:
         }
         
         # Analyze file structure and languages
-        self._analyze_files(repo_path, analysis)
+        self._analyze_files(files, analysis)
+        
+        # One index of paths answers every manifest/indicator lookup below
+        manifest = self._manifest_index(files)
         
         # Detect frameworks and tools
-        self._detect_frameworks(repo_path, analysis)
+        self._detect_frameworks(manifest, analysis)
         
         # Analyze dependencies
-        self._analyze_dependencies(repo_path, analysis)
+        self._analyze_dependencies(repo_path, manifest, analysis)
         
         # Find entry points
-        self._find_entry_points(repo_path, analysis)
+        self._find_entry_points(manifest, analysis)
         
         # Determine primary language
         if analysis['languages']:
@@ -82,60 +138,166 @@ class CodeAnalyzer:
         
         return analysis
     
-    def _analyze_files(self, repo_path: Path, analysis: Dict) -> None:
-        """Analyze all files in the repository."""
+    def _incremental_files(self, repo_path: Path, repo_key: str,
+                           commit_sha: str) -> Optional[Dict[str, Optional[int]]]:
+        """Patch the file scan of a cached commit with the files changed since it"""
+        for base_sha in reversed(self.cache.get(f"{repo_key}#commits") or []):
+            files = self.cache.get(f"{repo_key}@{base_sha}#files")
+            if files is None:
+                continue
+            diff = self._git(repo_path, "diff", "--name-only", "--no-renames", "-z", base_sha, commit_sha)
+            if diff is None:
+                # Base commit isn't in this clone; try an older one
+                continue
+            
+            changed = [path for path in diff.split("\0") if path]
+            if len(changed) > INCREMENTAL_MAX_CHANGED:
+                return None
+            for path in changed:
+                files.pop(path, None)
+            files.update(self._scan_files(repo_path, changed))
+            logger.info(f"Incremental analysis: {len(changed)} files changed since {base_sha[:12]}")
+            return files
+        return None
+    
+    def _scan_files(self, repo_path: Path, paths: Optional[List[str]] = None) -> Dict[str, Optional[int]]:
+        """Line counts keyed by relative path; ``None`` for files that aren't counted.
+
+        Scans the whole tree honoring ``.gitignore``, or only ``paths`` (skipping
+        ones that no longer exist or that the full scan would ignore). Files are
+        counted in parallel.
+        """
+        if paths is None:
+            paths = [str(entry.relative_to(repo_path)) for entry in self._walk(repo_path) if entry.is_file()]
+        else:
+            visible = self._visible_entries(repo_path, [path for path in paths if (repo_path / path).is_file()])
+            paths = [path for path in paths if path in visible]
+        
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            counts = executor.map(lambda rel_path: self._count_lines(repo_path / rel_path), paths)
+            return dict(zip(paths, counts))
+    
+    def _walk(self, directory: Path, max_depth: Optional[int] = None):
+        return rignore.walk(
+            str(directory),
+            ignore_hidden=False,
+            read_git_ignore=True,
+            require_git=False,
+            max_depth=max_depth,
+            should_exclude_entry=self._is_skipped_dir,
+        )
+    
+    def _visible_entries(self, repo_path: Path, paths: List[str]) -> Set[str]:
+        """Which of ``paths`` and their parent directories a full scan would reach.
+
+        Lists only the directories on the way to each path, one level deep, with
+        the same ignore rules as the full walk. A path counts only if it and every
+        directory above it are listed by their parent.
+        """
+        directories = {Path(".")}
+        for path in paths:
+            directories.update(Path(path).parents)
+        listed = set()
+        for directory in directories:
+            # The walk yields its own root too, which must not vouch for itself
+            root = repo_path / directory
+            listed.update(str(entry.relative_to(repo_path)) for entry in self._walk(root, 1) if entry != root)
+        return {
+            path for path in paths
+            if path in listed and all(str(parent) in listed for parent in list(Path(path).parents)[:-1])
+        }
+    
+    def _is_skipped_dir(self, path: Path) -> bool:
+        """Hidden directories (including .git) and common dependency/build output"""
+        name = path.name
+        return (name in SKIP_DIRS or name.startswith('.')) and path.is_dir()
+    
+    def _count_lines(self, file_path: Path) -> Optional[int]:
+        """Count lines without decoding; ``None`` for hidden, binary or unreadable files"""
+        if file_path.name.startswith('.'):
+            return None
+        try:
+            with open(file_path, 'rb') as f:
+                chunk = f.read(SNIFF_BYTES)
+                if b'\0' in chunk:
+                    return None
+                lines = 0
+                last = b''
+                while chunk:
+                    lines += chunk.count(b'\n')
+                    last = chunk
+                    chunk = f.read(COUNT_CHUNK_BYTES)
+        except OSError as e:
+            logger.debug(f"Could not read file {file_path}: {e}")
+            return None
+        # A final line without a trailing newline still counts
+        return lines + (1 if last and not last.endswith(b'\n') else 0)
+    
+    def _manifest_index(self, files: Dict[str, Optional[int]]) -> Set[str]:
+        """Every scanned file path plus every directory path (with a trailing slash)"""
+        manifest = set()
+        for rel_path in files:
+            manifest.add(Path(rel_path).as_posix())
+            for parent in Path(rel_path).parents:
+                if parent == Path('.'):
+                    break
+                manifest.add(f"{parent.as_posix()}/")
+        return manifest
+    
+    def _analyze_files(self, files: Dict[str, Optional[int]], analysis: Dict) -> None:
+        """Aggregate per-file line counts into structure and language stats."""
         structure = {}
         languages = {}
         total_lines = 0
         file_count = 0
         
-        for root, dirs, files in os.walk(repo_path):
-            # Skip hidden directories and common ignore patterns
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in {
-                'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist', 'target'
-            }]
-            
-            rel_path = os.path.relpath(root, repo_path)
-            if rel_path == '.':
-                rel_path = ''
+        for rel_path, lines in sorted(files.items()):
+            parent, name = os.path.split(rel_path)
+            structure.setdefault(parent, {'directories': [], 'files': []})['files'].append(name)
+            # Register the directory chain up to the root
+            while parent:
+                grandparent, dirname = os.path.split(parent)
+                entry = structure.setdefault(grandparent, {'directories': [], 'files': []})
+                if dirname in entry['directories']:
+                    break
+                entry['directories'].append(dirname)
+                parent = grandparent
             
-            structure[rel_path] = {
-                'directories': dirs,
-                'files': files
-            }
+            if lines is None:
+                continue
+            total_lines += lines
+            file_count += 1
             
-            # Analyze each file
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                    
-                file_path = Path(root) / file
-                file_ext = file_path.suffix.lower()
-                
-                # Count lines and determine language
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        lines = len(f.readlines())
-                        total_lines += lines
-                        file_count += 1
-                        
-                        # Determine language
-                        for lang, extensions in self.language_extensions.items():
-                            if file_ext in extensions:
-                                if lang not in languages:
-                                    languages[lang] = {'file_count': 0, 'line_count': 0}
-                                languages[lang]['file_count'] += 1
-                                languages[lang]['line_count'] += lines
-                                break
-                except Exception as e:
-                    logger.debug(f"Could not read file {file_path}: {e}")
+            # Determine language
+            file_ext = Path(rel_path).suffix.lower()
+            for lang, extensions in self.language_extensions.items():
+                if file_ext in extensions:
+                    if lang not in languages:
+                        languages[lang] = {'file_count': 0, 'line_count': 0}
+                    languages[lang]['file_count'] += 1
+                    languages[lang]['line_count'] += lines
+                    break
         
         analysis['structure'] = structure
         analysis['languages'] = languages
         analysis['total_lines'] = total_lines
         analysis['file_count'] = file_count
     
-    def _detect_frameworks(self, repo_path: Path, analysis: Dict) -> None:
+    def _repo_key(self, repo_path: Path, repo_url: Optional[str]) -> Optional[str]:
+        repo_url = repo_url or self._git(repo_path, "config", "--get", "remote.origin.url")
+        return normalize_repo_url(repo_url) if repo_url else None
+    
+    def _git(self, repo_path: Path, *args: str) -> Optional[str]:
+        try:
+            result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.debug(f"git {args[0]} failed: {e}")
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() if args[0] != "diff" else result.stdout
+    
+    def _detect_frameworks(self, manifest: Set[str], analysis: Dict) -> None:
         """Detect frameworks and build tools."""
         frameworks = []
         build_tools = []
@@ -145,7 +307,7 @@ class CodeAnalyzer:
         # Check for framework indicators
         for framework, indicators in self.framework_indicators.items():
             for indicator in indicators:
-                if (repo_path / indicator).exists():
+                if indicator in manifest:
                     frameworks.append(framework)
                     break
         
@@ -166,7 +328,7 @@ class CodeAnalyzer:
         }
         
         for config_file, tool in build_configs.items():
-            if (repo_path / config_file).exists():
+            if config_file in manifest:
                 build_tools.append(tool)
                 config_files.append(config_file)
         
@@ -181,7 +343,7 @@ class CodeAnalyzer:
         
         for test_fw, indicators in test_indicators.items():
             for indicator in indicators:
-                if (repo_path / indicator).exists():
+                if indicator in manifest:
                     test_frameworks.append(test_fw)
                     break
         
@@ -190,13 +352,13 @@ class CodeAnalyzer:
         analysis['test_frameworks'] = test_frameworks
         analysis['config_files'] = config_files
     
-    def _analyze_dependencies(self, repo_path: Path, analysis: Dict) -> None:
+    def _analyze_dependencies(self, repo_path: Path, manifest: Set[str], analysis: Dict) -> None:
         """Analyze project dependencies."""
         dependencies = {}
         
         # Node.js dependencies
         package_json = repo_path / 'package.json'
-        if package_json.exists():
+        if 'package.json' in manifest:
             try:
                 with open(package_json, 'r') as f:
                     data = json.load(f)
@@ -209,7 +371,7 @@ class CodeAnalyzer:
         
         # Python dependencies
         requirements_txt = repo_path / 'requirements.txt'
-        if requirements_txt.exists():
+        if 'requirements.txt' in manifest:
             try:
                 with open(requirements_txt, 'r') as f:
                     deps = [line.strip() for line in f if line.strip() and not line.startswith('#')]
@@ -219,7 +381,7 @@ class CodeAnalyzer:
         
         analysis['dependencies'] = dependencies
     
-    def _find_entry_points(self, repo_path: Path, analysis: Dict) -> None:
+    def _find_entry_points(self, manifest: Set[str], analysis: Dict) -> None:
         """Find likely entry points for the application."""
         entry_points = []
         
@@ -233,22 +395,23 @@ class CodeAnalyzer:
         ]
         
         for entry_point in common_entry_points:
-            if (repo_path / entry_point).exists():
+            if entry_point in manifest:
                 entry_points.append(entry_point)
         
         # Check src directory
-        src_dir = repo_path / 'src'
-        if src_dir.exists():
+        if 'src/' in manifest:
             for entry_point in common_entry_points:
-                if (src_dir / entry_point).exists():
+                if f'src/{entry_point}' in manifest:
                     entry_points.append(f'src/{entry_point}')
         
         analysis['entry_points'] = entry_points
     
-    def get_code_context(self, repo_path: str, max_files: int = 10) -> str:
+    def get_code_context(self, repo_path: str, max_files: int = 10,
+                         analysis: Optional[Dict[str, Any]] = None) -> str:
         """Get relevant code context for LLM analysis."""
         repo_path = Path(repo_path)
-        analysis = self.analyze_repository(repo_path)
+        if analysis is None:
+            analysis = self.analyze_repository(repo_path)
         
         context = f"""
 Repository Analysis:
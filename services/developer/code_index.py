@@ -0,0 +1,301 @@
+"""Embedding index over repository source, chunked at function/class boundaries."""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+import numpy as np
+
+from services.developer.symbol_index import SymbolIndex
+
+logger = logging.getLogger(__name__)
+
+MAX_CHUNK_LINES = 120
+MIN_GAP_LINES = 3  # Loose code between definitions needs this many non-blank lines to be a chunk
+MAX_EMBED_CHARS = 2000
+EMBED_BATCH_SIZE = 64
+BLOB_TTL_SECONDS = 30 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, seen REAL);
+CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, sha TEXT, start_line INTEGER, end_line INTEGER, name TEXT);
+CREATE INDEX IF NOT EXISTS chunks_sha ON chunks (sha);
+"""
+
+
+class CodeIndex:
+    """Top-k code chunk retrieval for a task description.
+
+    Chunks are keyed by git blob SHA like the symbol index, so re-indexing a new
+    commit only embeds files whose content changed. Vectors are appended to a
+    float32 file that is memory-mapped for search; chunk metadata lives in SQLite.
+    """
+
+    def __init__(self, base_path: Optional[str] = None, model_name: Optional[str] = None,
+                 symbol_index: Optional[SymbolIndex] = None, max_new_chunks: Optional[int] = None):
+        from config.settings import settings
+
+        self.model_name = model_name or settings.code_embedding_model_name
+        self.base_path = Path(base_path or Path(settings.cache_path) / "code_index") / self.model_name.replace("/", "__")
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.base_path / "chunks.sqlite"
+        self.max_new_chunks = max_new_chunks or settings.code_index_max_new_chunks
+        self.symbol_index = symbol_index or SymbolIndex()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._trees: Dict[str, Dict[str, str]] = {}
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def update(self, repo_path: str) -> Dict[str, str]:
+        """Embed chunks of files whose content hasn't been indexed yet"""
+        started = time.monotonic()
+        tree = self.symbol_index.working_tree(repo_path)
+        self._trees[repo_path] = tree
+
+        with self._connect() as conn:
+            known = self._known_blobs(conn, set(tree.values()))
+            now = time.time()
+            conn.executemany("UPDATE blobs SET seen = ? WHERE sha = ?", [(now, sha) for sha in known])
+
+        # Chunk new files until the per-update embedding budget is spent
+        pending: List[Tuple[str, int, int, str, str]] = []
+        new_blobs: List[str] = []
+        for path, sha in tree.items():
+            if sha in known:
+                continue
+            known.add(sha)
+            chunks = self._chunk_file(repo_path, path)
+            if pending and len(pending) + len(chunks) > self.max_new_chunks:
+                logger.info("Code index embedding budget reached; remaining files are indexed on the next update")
+                break
+            new_blobs.append(sha)
+            pending.extend((sha, start, end, name, text) for start, end, name, text in chunks)
+
+        if new_blobs:
+            vectors = self._embed([text for *_, text in pending]) if pending else None
+            self._append(new_blobs, pending, vectors)
+            logger.info(f"Code index: embedded {len(pending)} chunks from {len(new_blobs)} files "
+                        f"in {time.monotonic() - started:.2f}s")
+        return tree
+
+    def search(self, repo_path: str, query: str, top_k: int = 8) -> List[Dict[str, Any]]:
+        """Chunks of the repo's current tree most similar to ``query``"""
+        tree = self.update(repo_path)
+        paths_by_sha: Dict[str, List[str]] = {}
+        for path, sha in tree.items():
+            paths_by_sha.setdefault(sha, []).append(path)
+
+        with self._connect() as conn:
+            dim, generation = self._dimension(conn), self._generation(conn)
+            rows = []
+            shas = list(paths_by_sha)
+            for i in range(0, len(shas), 500):
+                batch = shas[i:i + 500]
+                rows.extend(conn.execute(
+                    f"SELECT row, sha, start_line, end_line, name FROM chunks WHERE sha IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+        if not rows or not dim:
+            return []
+
+        vectors = self._vectors(generation, dim)
+        rows = [row for row in rows if row[0] < len(vectors)]
+        if not rows:
+            return []
+        query_vector = self._embed([query])[0]
+        scores = vectors[[row[0] for row in rows]] @ query_vector
+        best = np.argsort(-scores)[:top_k]
+
+        results = []
+        for index in best:
+            _, sha, start, end, name = rows[index]
+            for path in paths_by_sha[sha]:
+                results.append({"path": path, "start_line": start, "end_line": end, "name": name,
+                                "score": round(float(scores[index]), 4)})
+        return results[:top_k]
+
+    def context_for(self, repo_path: str, query: str, top_k: int = 8, max_tokens: int = 2000) -> str:
+        """Retrieved chunks formatted for a prompt, within a token budget"""
+        budget = max_tokens * 4
+        sections = []
+        for hit in self.search(repo_path, query, top_k):
+            try:
+                with open(Path(repo_path) / hit["path"], encoding="utf-8", errors="ignore") as f:
+                    code = "".join(f.readlines()[hit["start_line"] - 1:hit["end_line"]]).rstrip()
+            except OSError:
+                continue
+            section = f"--- {hit['path']}:{hit['start_line']}-{hit['end_line']} ({hit['name']}) ---\n{code}"
+            if len(section) > budget:
+                continue
+            sections.append(section)
+            budget -= len(section)
+        return "\n\n".join(sections)
+
+    # Chunking
+
+    def _chunk_file(self, repo_path: str, path: str) -> List[Tuple[int, int, str, str]]:
+        try:
+            source = (Path(repo_path) / path).read_text(encoding="utf-8", errors="ignore")
+        except OSError:
+            return []
+        lines = source.splitlines()
+        return [
+            (start, end, name, f"{path}\n{name}\n" + "\n".join(lines[start - 1:end])[:MAX_EMBED_CHARS])
+            for start, end, name in self._chunk_spans(source, path, len(lines))
+        ]
+
+    def _chunk_spans(self, source: str, path: str, line_count: int) -> List[Tuple[int, int, str]]:
+        """(start, end, name) spans: one per definition, oversized classes split into members"""
+        definitions = [d for d in self.symbol_index.outline(source, path) if d["kind"] != "variable"]
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for definition in definitions:
+            children.setdefault(definition["parent"], []).append(definition)
+
+        spans = []
+
+        def add(definition, qualified):
+            start, end = definition["line"], definition["end_line"]
+            members = children.get(qualified, [])
+            if end - start + 1 > MAX_CHUNK_LINES and members:
+                if members[0]["line"] > start:
+                    spans.append((start, members[0]["line"] - 1, qualified))
+                for member in members:
+                    add(member, f"{qualified}.{member['name']}")
+            else:
+                spans.append((start, end, qualified))
+
+        for definition in children.get(None, []):
+            add(definition, definition["name"])
+
+        # Module-level code between definitions (imports, constants, scripts)
+        covered = [False] * (line_count + 1)
+        for start, end, _ in spans:
+            for line in range(start, min(end, line_count) + 1):
+                covered[line] = True
+        lines = source.splitlines()
+        gap_start = None
+        for line in range(1, line_count + 2):
+            if line <= line_count and not covered[line]:
+                gap_start = gap_start or line
+                continue
+            if gap_start:
+                if sum(1 for text in lines[gap_start - 1:line - 1] if text.strip()) >= MIN_GAP_LINES:
+                    spans.append((gap_start, line - 1, "<module>"))
+                gap_start = None
+
+        # Split anything still too long into windows
+        chunks = []
+        for start, end, name in sorted(spans):
+            for window in range(start, end + 1, MAX_CHUNK_LINES):
+                chunks.append((window, min(end, window + MAX_CHUNK_LINES - 1), name))
+        return chunks
+
+    # Embeddings and storage
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            # Concurrent to_thread callers must not load the model twice
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        vectors = self._model.encode(texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True,
+                                     show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _append(self, shas: List[str], chunks: List[tuple], vectors: Optional[np.ndarray]) -> None:
+        with self._connect() as conn:
+            # Serialize writers: row numbers must match offsets in the vector file
+            conn.execute("BEGIN IMMEDIATE")
+            already = self._known_blobs(conn, set(shas))
+            keep = [i for i, chunk in enumerate(chunks) if chunk[0] not in already]
+            now = time.time()
+            conn.executemany("INSERT OR IGNORE INTO blobs (sha, seen) VALUES (?, ?)", [(sha, now) for sha in shas])
+            if not keep:
+                return
+
+            dim = self._dimension(conn) or vectors.shape[1]
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('dimension', ?)", (str(dim),))
+            vector_file = self._vector_file(self._generation(conn))
+            first_row = vector_file.stat().st_size // (4 * dim) if vector_file.exists() else 0
+            with open(vector_file, "ab") as f:
+                f.seek(first_row * 4 * dim)
+                f.truncate()  # Drop any partial row from an interrupted write
+                f.write(vectors[keep].tobytes())
+            conn.executemany(
+                "INSERT INTO chunks (row, sha, start_line, end_line, name) VALUES (?, ?, ?, ?, ?)",
+                [(first_row + n, *chunks[i][:4]) for n, i in enumerate(keep)]
+            )
+            self._prune(conn, now, dim)
+
+    def _prune(self, conn: sqlite3.Connection, now: float, dim: int) -> None:
+        """Forget blobs unseen for a while; rewrite the vector file once half of it is dead"""
+        stale = [row[0] for row in conn.execute("SELECT sha FROM blobs WHERE seen < ?", (now - BLOB_TTL_SECONDS,))]
+        conn.executemany("DELETE FROM chunks WHERE sha = ?", [(sha,) for sha in stale])
+        conn.executemany("DELETE FROM blobs WHERE sha = ?", [(sha,) for sha in stale])
+
+        generation = self._generation(conn)
+        vector_file = self._vector_file(generation)
+        total = vector_file.stat().st_size // (4 * dim) if vector_file.exists() else 0
+        live = [row[0] for row in conn.execute("SELECT row FROM chunks ORDER BY row")]
+        if total < 1000 or len(live) * 2 > total:
+            return
+
+        vectors = np.memmap(vector_file, dtype=np.float32, mode="r", shape=(total, dim))
+        next_file = self._vector_file(generation + 1)
+        with open(next_file, "wb") as f:
+            f.write(np.ascontiguousarray(vectors[live]).tobytes())
+        conn.executemany("UPDATE chunks SET row = ? WHERE row = ?", [(new, old) for new, old in enumerate(live)])
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(generation + 1),))
+        # Searches in flight may still read the previous generation; drop the one before it
+        self._vector_file(generation - 1).unlink(missing_ok=True)
+        logger.info(f"Compacted code index vectors: {total} -> {len(live)} rows")
+
+    def _vectors(self, generation: int, dim: int) -> np.ndarray:
+        vector_file = self._vector_file(generation)
+        rows = vector_file.stat().st_size // (4 * dim) if vector_file.exists() else 0
+        if not rows:
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.memmap(vector_file, dtype=np.float32, mode="r", shape=(rows, dim))
+
+    def _vector_file(self, generation: int) -> Path:
+        return self.base_path / f"vectors-{generation}.f32"
+
+    def _known_blobs(self, conn: sqlite3.Connection, shas: set) -> set:
+        known = set()
+        shas = list(shas)
+        for i in range(0, len(shas), 500):
+            batch = shas[i:i + 500]
+            rows = conn.execute(f"SELECT sha FROM blobs WHERE sha IN ({','.join('?' * len(batch))})", batch)
+            known.update(row[0] for row in rows)
+        return known
+
+    def _dimension(self, conn: sqlite3.Connection) -> Optional[int]:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        return int(row[0]) if row else None
+
+    def _generation(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    @contextmanager
+    def _connect(self):
+        """Connection committed on success and always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
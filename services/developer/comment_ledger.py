@@ -0,0 +1,79 @@
+"""Persistent record of which PR comments were already handled."""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from core.cache_store import JsonCache
+
+logger = logging.getLogger(__name__)
+
+
+class CommentLedger:
+    """Per-PR ledger of handled comments, keyed by comment ID and body hash.
+
+    Each entry records the outcome (``addressed``, ``unresolved`` or ``failed``),
+    the commit that addressed it and whether we replied. Comments we already
+    handled are skipped on the next run unless their body was edited; failed
+    ones are retried. Comments the handler posts itself are remembered too, so
+    its own replies and summaries are never treated as feedback.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.store = JsonCache("comment_ledger", cache_path, max_entries=2000)
+
+    def load(self, owner: str, repo: str, pr_number: int) -> Dict[str, Any]:
+        return self.store.get(self._pr_key(owner, repo, pr_number)) or {"comments": {}, "own": []}
+
+    def save(self, owner: str, repo: str, pr_number: int, ledger: Dict[str, Any]) -> None:
+        self.store.set(self._pr_key(owner, repo, pr_number), ledger)
+
+    def needs_handling(self, ledger: Dict[str, Any], comment: Dict[str, Any]) -> bool:
+        """True for comments that are new, edited since we handled them, or failed last time"""
+        key = self._comment_key(comment["type"], comment["id"])
+        if key in ledger["own"]:
+            return False
+        entry = ledger["comments"].get(key)
+        return entry is None or entry["body_hash"] != self._hash(comment["body"]) or entry["state"] == "failed"
+
+    def record(self, ledger: Dict[str, Any], comment: Dict[str, Any], state: str,
+               commit: Optional[str] = None, summary: Optional[str] = None) -> None:
+        ledger["comments"][self._comment_key(comment["type"], comment["id"])] = {
+            "comment": {**{k: comment.get(k) for k in ("type", "id", "user", "path", "line")},
+                        "body": comment["body"][:200]},
+            "body_hash": self._hash(comment["body"]),
+            "state": state,
+            "commit": commit,
+            "summary": summary,
+            "replied": False,
+            "handled_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def record_reply(self, ledger: Dict[str, Any], comment: Dict[str, Any], reply: Dict[str, Any]) -> None:
+        entry = ledger["comments"].get(self._comment_key(comment["type"], comment["id"]))
+        if entry:
+            entry["replied"] = True
+        self.record_own(ledger, comment["type"], reply)
+
+    def record_own(self, ledger: Dict[str, Any], comment_type: str, posted: Optional[Dict[str, Any]]) -> None:
+        if posted and posted.get("id") is not None:
+            ledger["own"].append(self._comment_key(comment_type, posted["id"]))
+
+    def unreplied(self, ledger: Dict[str, Any],
+                  exclude: List[Dict[str, Any]] = ()) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(handled, original) pairs for addressed comments whose reply failed earlier"""
+        skip = {self._comment_key(c["type"], c["id"]) for c in exclude}
+        return [({"summary": entry["summary"]}, entry["comment"])
+                for key, entry in ledger["comments"].items()
+                if key not in skip and entry["state"] == "addressed" and not entry["replied"]]
+
+    def _pr_key(self, owner: str, repo: str, pr_number: int) -> str:
+        return f"{owner}/{repo}#{pr_number}".lower()
+
+    def _comment_key(self, comment_type: str, comment_id: Any) -> str:
+        # Review and issue comment IDs come from different sequences
+        return f"{comment_type}:{comment_id}"
+
+    def _hash(self, body: str) -> str:
+        return hashlib.sha256(body.strip().encode()).hexdigest()[:16]
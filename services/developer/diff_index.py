@@ -0,0 +1,265 @@
+"""Parsed unified diff shared by the review and comment-handling stages."""
+
+import re
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+FILE_HEADER = re.compile(r"diff --git a/(.+?) b/(.+)")
+HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class DiffIndex:
+    """A unified diff parsed once into files, hunks and per-line old/new numbers.
+
+    Hunks and hunk lines live in parallel ``array`` columns holding line numbers
+    and offsets into the diff text, so the index costs a few integers per diff
+    line and text is only sliced out when a stage asks for it. ``(path, line)``
+    lookups on either side go through a dict to the hunk line, and line numbers
+    outside the hunks translate through the preceding hunk's offset.
+    ``subset`` narrows the files without parsing again.
+    """
+
+    def __init__(self, diff: str):
+        self.source = diff
+        self.files: List[Dict[str, Any]] = []
+        # One entry per hunk; "key" columns hold the first line a hunk covers on each side
+        self.hunk_old_start, self.hunk_old_count = array("l"), array("l")
+        self.hunk_new_start, self.hunk_new_count = array("l"), array("l")
+        self.hunk_old_key, self.hunk_new_key = array("l"), array("l")
+        self.hunk_offset, self.hunk_end = array("l"), array("l")
+        self.hunk_first_line = array("l")
+        # One entry per hunk line; 0 means the line doesn't exist on that side
+        self.line_old, self.line_new = array("l"), array("l")
+        self.line_offset, self.line_hunk = array("l"), array("l")
+        self._old_lines: Dict[Tuple[int, int], int] = {}
+        self._new_lines: Dict[Tuple[int, int], int] = {}
+        self._parse(diff)
+        self._by_path = {f["path"]: f for f in self.files}
+        self._text: Optional[str] = diff
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self.patch(f["path"]) for f in self.files)
+        return self._text
+
+    @property
+    def paths(self) -> List[str]:
+        return [f["path"] for f in self.files]
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._by_path
+
+    def subset(self, paths) -> "DiffIndex":
+        """Index over just ``paths``, sharing this index's storage"""
+        keep = set(paths)
+        view = self.__class__.__new__(self.__class__)
+        view.__dict__.update(self.__dict__)
+        view.files = [f for f in self.files if f["path"] in keep]
+        view._by_path = {f["path"]: f for f in view.files}
+        view._text = None
+        return view
+
+    def file(self, path: str) -> Optional[Dict[str, Any]]:
+        return self._by_path.get(path)
+
+    def sections(self) -> List[Tuple[str, str]]:
+        """(path, patch) for each file"""
+        return [(f["path"], self.patch(f["path"])) for f in self.files]
+
+    def patch(self, path: str) -> str:
+        entry = self._by_path.get(path)
+        return self.source[entry["start"]:entry["end"]] if entry else ""
+
+    def header(self, path: str) -> str:
+        """The file's patch up to its first hunk"""
+        entry = self._by_path.get(path)
+        if not entry:
+            return ""
+        first, last = entry["hunks"]
+        return self.source[entry["start"]:self.hunk_offset[first] if last > first else entry["end"]]
+
+    def hunks(self, path: str) -> List[Dict[str, Any]]:
+        entry = self._by_path.get(path)
+        return [self._hunk(i) for i in range(*entry["hunks"])] if entry else []
+
+    def hunk_at(self, path: str, line: int, side: str = "new") -> Optional[Dict[str, Any]]:
+        """The hunk containing ``line`` of the new (or old) file, if the diff shows it"""
+        index = self._line_index(path, line, side)
+        return self._hunk(self.line_hunk[index]) if index is not None else None
+
+    def commentable(self, path: str, line: int) -> bool:
+        """True for new-file lines GitHub accepts review comments on (added or context)"""
+        return self._line_index(path, line, "new") is not None
+
+    def added_lines(self, path: str) -> List[Tuple[int, str]]:
+        """(new file line number, text) for every added line"""
+        entry = self._by_path.get(path)
+        if not entry:
+            return []
+        first, last = entry["hunks"]
+        if last == first:
+            return []
+        added = []
+        for i in range(self._first_line(first), self._first_line(last)):
+            if self.line_new[i] and not self.line_old[i]:
+                added.append((self.line_new[i], self._line_text(i)))
+        return added
+
+    def to_old(self, path: str, line: int) -> Optional[int]:
+        """Old-file line number for a new-file line; None when the PR added it"""
+        return self._translate(path, line, "new")
+
+    def to_new(self, path: str, line: int) -> Optional[int]:
+        """New-file line number for an old-file line; None when the PR removed it"""
+        return self._translate(path, line, "old")
+
+    def context(self, path: str, line: int, radius: int = 3, side: str = "new") -> str:
+        """Diff lines within ``radius`` of ``line`` in its hunk, with their +/-/space prefixes"""
+        index = self._line_index(path, line, side)
+        if index is None:
+            return ""
+        hunk = self.line_hunk[index]
+        start = max(index - radius, self._first_line(hunk))
+        end = min(index + radius + 1, self._first_line(hunk + 1))
+        return "\n".join(self.source[self.line_offset[i]:self._line_end(i)] for i in range(start, end))
+
+    def _parse(self, diff: str) -> None:
+        old_no = new_no = old_left = new_left = 0
+        offset = 0
+        entry = None
+        for line in diff.split("\n"):
+            start, offset = offset, offset + len(line) + 1
+            if line.startswith("diff --git "):
+                entry = self._open_file(line, start)
+                old_left = new_left = 0
+                continue
+            if old_left or new_left:
+                prefix = line[:1]
+                if prefix == "\\":
+                    continue
+                if prefix == "-":
+                    self._add_line(entry["id"], old_no, 0, start)
+                    old_no, old_left = old_no + 1, old_left - 1
+                elif prefix == "+":
+                    self._add_line(entry["id"], 0, new_no, start)
+                    new_no, new_left = new_no + 1, new_left - 1
+                else:
+                    # Context; some tools strip the leading space of blank context lines
+                    self._add_line(entry["id"], old_no, new_no, start)
+                    old_no, new_no = old_no + 1, new_no + 1
+                    old_left, new_left = old_left - 1, new_left - 1
+                continue
+            header = HUNK_HEADER.match(line)
+            if header:
+                if entry is None:
+                    entry = self._open_file("", 0)
+                old_no, old_left = int(header.group(1)), int(header.group(2) or 1)
+                new_no, new_left = int(header.group(3)), int(header.group(4) or 1)
+                self._add_hunk(entry, old_no, old_left, new_no, new_left, start)
+            elif entry is None and line.strip():
+                entry = self._open_file("", 0)
+            elif entry is not None and line.startswith(("rename from ", "rename to ")):
+                key = "old_path" if line.startswith("rename from ") else "path"
+                entry[key] = line.split(" ", 2)[2]
+        self._close_file(len(diff))
+
+    def _open_file(self, header: str, start: int) -> Dict[str, Any]:
+        self._close_file(start)
+        match = FILE_HEADER.match(header)
+        entry = {
+            "id": len(self.files),
+            "path": match.group(2) if match else "unknown",
+            "old_path": match.group(1) if match else "unknown",
+            "start": start,
+            "end": start,
+            "hunks": (len(self.hunk_offset), len(self.hunk_offset)),
+        }
+        self.files.append(entry)
+        return entry
+
+    def _close_file(self, end: int) -> None:
+        if self.files:
+            entry = self.files[-1]
+            entry["end"] = end
+            entry["hunks"] = (entry["hunks"][0], len(self.hunk_offset))
+            if entry["hunks"][1] > entry["hunks"][0]:
+                self.hunk_end[-1] = end
+
+    def _add_hunk(self, entry: Dict[str, Any], old_start: int, old_count: int,
+                  new_start: int, new_count: int, offset: int) -> None:
+        if len(self.hunk_offset) > entry["hunks"][0]:
+            self.hunk_end[-1] = offset
+        self.hunk_old_start.append(old_start)
+        self.hunk_old_count.append(old_count)
+        self.hunk_new_start.append(new_start)
+        self.hunk_new_count.append(new_count)
+        # A side with no lines names the line before the change
+        self.hunk_old_key.append(old_start if old_count else old_start + 1)
+        self.hunk_new_key.append(new_start if new_count else new_start + 1)
+        self.hunk_offset.append(offset)
+        self.hunk_end.append(offset)
+        self.hunk_first_line.append(len(self.line_offset))
+
+    def _add_line(self, file_id: int, old_no: int, new_no: int, offset: int) -> None:
+        index = len(self.line_offset)
+        self.line_old.append(old_no)
+        self.line_new.append(new_no)
+        self.line_offset.append(offset)
+        self.line_hunk.append(len(self.hunk_offset) - 1)
+        if old_no:
+            self._old_lines[(file_id, old_no)] = index
+        if new_no:
+            self._new_lines[(file_id, new_no)] = index
+
+    def _first_line(self, hunk: int) -> int:
+        return self.hunk_first_line[hunk] if hunk < len(self.hunk_first_line) else len(self.line_offset)
+
+    def _line_end(self, index: int) -> int:
+        end = self.source.find("\n", self.line_offset[index])
+        return len(self.source) if end < 0 else end
+
+    def _line_text(self, index: int) -> str:
+        return self.source[self.line_offset[index] + 1:self._line_end(index)].rstrip("\r")
+
+    def _line_index(self, path: str, line: int, side: str) -> Optional[int]:
+        entry = self._by_path.get(path)
+        if not entry:
+            return None
+        lines = self._new_lines if side == "new" else self._old_lines
+        return lines.get((entry["id"], line))
+
+    def _hunk(self, index: int) -> Dict[str, Any]:
+        return {
+            "old_start": self.hunk_old_start[index],
+            "old_count": self.hunk_old_count[index],
+            "new_start": self.hunk_new_start[index],
+            "new_count": self.hunk_new_count[index],
+            "text": self.source[self.hunk_offset[index]:self.hunk_end[index]],
+        }
+
+    def _translate(self, path: str, line: int, side: str) -> Optional[int]:
+        entry = self._by_path.get(path)
+        if not entry:
+            return line
+        index = self._line_index(path, line, side)
+        if index is not None:
+            return (self.line_old if side == "new" else self.line_new)[index] or None
+
+        first, last = entry["hunks"]
+        keys, counts = (self.hunk_new_key, self.hunk_new_count) if side == "new" \
+            else (self.hunk_old_key, self.hunk_old_count)
+        other_keys, other_counts = (self.hunk_old_key, self.hunk_old_count) if side == "new" \
+            else (self.hunk_new_key, self.hunk_new_count)
+        hunk = bisect_right(keys, line, first, last) - 1
+        if hunk < first:
+            return line
+        # Past the end of the preceding hunk, lines shift by that hunk's size difference
+        return line - (keys[hunk] + counts[hunk]) + other_keys[hunk] + other_counts[hunk]
@@ -0,0 +1,176 @@
+"""Static classification of PR files before any LLM review."""
+
+import fnmatch
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from services.developer.diff_index import DiffIndex
+
+logger = logging.getLogger(__name__)
+
+LOCKFILES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'bun.lockb', 'uv.lock',
+    'poetry.lock', 'Pipfile.lock', 'pdm.lock', 'Cargo.lock', 'Gemfile.lock', 'composer.lock', 'go.sum',
+    'mix.lock', 'pubspec.lock', 'Podfile.lock', 'packages.lock.json', 'flake.lock'
+}
+VENDORED_DIRS = {'vendor', 'vendors', 'node_modules', 'third_party', 'third-party', 'thirdparty', 'external',
+                 'bower_components', 'site-packages', 'Pods'}
+GENERATED_DIRS = {'dist', 'build', 'out', '__generated__', 'generated', 'gen'}
+GENERATED_PATTERNS = [
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js', '*-bundle.js', '*.snap', '*/__snapshots__/*',
+    '*_pb2.py', '*_pb2_grpc.py', '*.pb.go', '*.pb.cc', '*.pb.h', '*.generated.*', '*.g.dart', '*.designer.cs'
+]
+# Markers linguist and common generators put at the top of generated files
+GENERATED_MARKERS = re.compile(
+    r"code generated .* do not edit|@generated|auto-?generated|this file (?:was|is) (?:automatically )?generated",
+    re.IGNORECASE
+)
+# Only this many lines at the start of the file are checked for markers
+GENERATED_MARKER_LINES = 5
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@", re.MULTILINE)
+SECRET_PATTERNS = [
+    ("AWS access key", re.compile(r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b")),
+    ("private key", re.compile(r"-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP )?PRIVATE KEY-----")),
+    ("GitHub token", re.compile(r"\b(?:ghp|gho|ghu|ghs|ghr)_[A-Za-z0-9]{36}\b|\bgithub_pat_[A-Za-z0-9_]{40,}\b")),
+    ("Slack token", re.compile(r"\bxox[abposr]-[A-Za-z0-9-]{10,}\b")),
+    ("OpenAI key", re.compile(r"\bsk-(?:proj-)?[A-Za-z0-9_-]{32,}\b")),
+    ("Google API key", re.compile(r"\bAIza[0-9A-Za-z_-]{35}\b")),
+    ("hardcoded credential", re.compile(
+        r"(?i)\b(?:password|passwd|secret|api[_-]?key|access[_-]?token|auth[_-]?token)\b\s*[:=]\s*['\"]([^'\"\s]{12,})['\"]"
+    )),
+]
+HUGE_FILE_LINES = 3000
+# Added content that is mostly very long, high-entropy lines is minified code or a data blob
+LONG_LINE_CHARS = 500
+HIGH_ENTROPY_BITS = 5.2
+
+
+class DiffPrefilter:
+    """Keeps lockfiles, vendored, generated and binary files out of LLM prompts.
+
+    Classification uses path rules, ``.gitattributes`` ``linguist-generated`` and
+    ``linguist-vendored`` attributes, generator markers and a size/entropy check
+    on the added lines. Cheap deterministic checks (huge files, binary changes,
+    likely secrets) are reported directly.
+    """
+
+    def filter(self, index: DiffIndex, files: List[Dict[str, Any]], gitattributes: str = "") -> Dict[str, Any]:
+        attributes = self._parse_gitattributes(gitattributes)
+        stats = {f["filename"]: f for f in files}
+
+        kept_paths, excluded, findings = [], {}, []
+        for path, patch in index.sections():
+            added = index.added_lines(path)
+            reason = self.classify(path, patch, added, attributes)
+            findings.extend(self._static_findings(path, patch, added, stats.get(path, {}), reason))
+            if reason:
+                excluded[path] = reason
+            else:
+                kept_paths.append(path)
+
+        kept = index.subset(kept_paths)
+        kept_files = [f for f in files if f["filename"] not in excluded]
+        return {
+            "index": kept,
+            "diff": kept.text,
+            "files": kept_files,
+            "excluded": excluded,
+            "excluded_summary": [self._summarize(path, reason, stats.get(path, {})) for path, reason in excluded.items()],
+            "findings": findings,
+            "excluded_chars": len(index.text) - len(kept.text),
+        }
+
+    def classify(self, path: str, patch: str, added: List[Tuple[int, str]],
+                 attributes: List[Tuple[str, Optional[str]]]) -> Optional[str]:
+        """Reason to keep ``path`` out of LLM review, or None to review it"""
+        name = path.rsplit("/", 1)[-1]
+        parts = path.split("/")[:-1]
+
+        for pattern, attribute in attributes:
+            if self._matches(pattern, path):
+                # An explicit false (e.g. -linguist-generated) forces a review
+                return attribute
+        if name in LOCKFILES:
+            return "lockfile"
+        if any(p in VENDORED_DIRS for p in parts):
+            return "vendored"
+        if any(p in GENERATED_DIRS for p in parts) or any(fnmatch.fnmatch(path, p) or fnmatch.fnmatch(name, p)
+                                                          for p in GENERATED_PATTERNS):
+            return "generated"
+        if "Binary files " in patch or "GIT binary patch" in patch:
+            return "binary"
+        if any(GENERATED_MARKERS.search(line) for line in self._file_header(patch)):
+            return "generated"
+        if self._looks_minified([line for _, line in added]):
+            return "minified"
+        return None
+
+    def _file_header(self, patch: str) -> List[str]:
+        """The first lines of the new file, when the patch shows them"""
+        header = HUNK_HEADER.search(patch)
+        if not header or int(header.group(1)) > 1:
+            return []
+        lines = []
+        for line in patch[header.end():].split("\n")[1:]:
+            if line.startswith("@@") or len(lines) == GENERATED_MARKER_LINES:
+                break
+            if not line.startswith(("-", "\\")):
+                lines.append(line[1:])
+        return lines
+
+    def _static_findings(self, path: str, patch: str, added: List[Tuple[int, str]], stats: Dict[str, Any],
+                         reason: Optional[str]) -> List[str]:
+        findings = []
+        changed = stats.get("changes", len(added))
+        if changed > HUGE_FILE_LINES and reason not in ("lockfile", "vendored", "generated"):
+            findings.append(f"{path}: {changed} changed lines in one file; consider splitting this change")
+        if reason == "binary":
+            findings.append(f"{path}: binary file changed ({stats.get('status', 'modified')})")
+        for number, line in added:
+            for label, pattern in SECRET_PATTERNS:
+                match = pattern.search(line)
+                if match:
+                    secret = match.group(match.lastindex or 0)
+                    findings.append(f"{path}:{number}: possible {label} ({secret[:4]}…)")
+                    break
+        return findings
+
+    def _looks_minified(self, added: List[str]) -> bool:
+        long_lines = [line for line in added if len(line) > LONG_LINE_CHARS]
+        if not long_lines or sum(map(len, long_lines)) < 0.5 * sum(map(len, added)):
+            return False
+        sample = "".join(long_lines)[:20000]
+        counts = Counter(sample)
+        entropy = -sum(c / len(sample) * math.log2(c / len(sample)) for c in counts.values())
+        return entropy > HIGH_ENTROPY_BITS or len(long_lines) >= 3
+
+    def _summarize(self, path: str, reason: str, stats: Dict[str, Any]) -> str:
+        if stats:
+            return f"{path} ({reason}, +{stats.get('additions', 0)}/-{stats.get('deletions', 0)})"
+        return f"{path} ({reason})"
+
+    def _parse_gitattributes(self, text: str) -> List[Tuple[str, Optional[str]]]:
+        """(pattern, 'generated'|'vendored'|None) for linguist attributes, last line first"""
+        rules = []
+        for line in text.splitlines():
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            for attribute in fields[1:]:
+                key, _, value = attribute.lstrip("-!").partition("=")
+                if key not in ("linguist-generated", "linguist-vendored"):
+                    continue
+                enabled = not attribute.startswith(("-", "!")) and value in ("", "true")
+                rules.append((fields[0], key.split("-")[1] if enabled else None))
+        return list(reversed(rules))
+
+    def _matches(self, pattern: str, path: str) -> bool:
+        pattern = pattern.lstrip("/")
+        if pattern.endswith("/**"):
+            return path.startswith(pattern[:-2])
+        if "/" not in pattern:
+            return fnmatch.fnmatch(path.rsplit("/", 1)[-1], pattern)
+        return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path, pattern.replace("**/", ""))
@@ -0,0 +1,187 @@
+"""Per-repository knowledge card: a compact, cached summary injected into prompts."""
+
+import asyncio
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import logging
+
+from core.cache_store import JsonCache
+from services.developer.code_analyzer import normalize_repo_url
+from utils.opik_tracer import trace
+
+logger = logging.getLogger(__name__)
+
+MAX_MODULE_DEPTH = 2
+MAX_MODULES = 80
+MAX_DIRS_PER_PROMPT = 40
+FILES_PER_DIR = 25
+# Regenerate the architecture summary when this share of modules changed
+OVERVIEW_REFRESH_RATIO = 0.3
+SKIP_MODULE_DIRS = {'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist', 'target', 'vendor'}
+
+
+class KnowledgeCardService:
+    """Builds and maintains a knowledge card per repo.
+
+    The card holds an architecture summary, a module map, conventions and test
+    commands. Module descriptions are keyed by each directory's git tree hash,
+    so a refresh only asks the LLM about directories whose content changed.
+    """
+
+    def __init__(self, llm_client, cache_path: Optional[str] = None):
+        self.llm_client = llm_client
+        self.cache = JsonCache("knowledge_cards", cache_path)
+
+    async def get_card(self, repo_path: str, repo_url: str, repo_analysis: Dict[str, Any],
+                       test_command: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the repo's card, refreshing only the parts that changed"""
+        hashes = await asyncio.to_thread(self._directory_hashes, repo_path)
+        if not hashes:
+            return None
+
+        key = normalize_repo_url(repo_url)
+        card = self.cache.get(key) or {}
+        root_hash = hashes.pop(".")
+        stack = self._stack(repo_analysis)
+
+        if card.get("root_hash") == root_hash:
+            trace("knowledge_card.hit", {"repo": key})
+        else:
+            previous = card.get("modules", {})
+            changed = [d for d, h in hashes.items() if previous.get(d, {}).get("hash") != h]
+            refresh_overview = not card.get("architecture") or len(changed) > OVERVIEW_REFRESH_RATIO * len(hashes)
+            trace("knowledge_card.refresh", {
+                "repo": key, "modules": len(hashes), "changed": len(changed), "overview": refresh_overview
+            })
+
+            descriptions = await self._describe(repo_path, changed, stack, refresh_overview)
+            # The prompt lists directories as "src/"; match keys echoed back either way
+            described = {d.strip().rstrip("/"): text for d, text in descriptions.get("modules", {}).items()}
+            modules = {}
+            for d, h in sorted(hashes.items()):
+                if d in changed and d not in described:
+                    # Keep the stale hash so the next run retries this module
+                    modules[d] = previous.get(d, {"hash": None, "description": ""})
+                else:
+                    modules[d] = {"hash": h, "description": described.get(d) or previous.get(d, {}).get("description", "")}
+            complete = all(modules[d]["hash"] == h for d, h in hashes.items())
+            card = {
+                "root_hash": root_hash if complete else None,
+                "architecture": descriptions.get("architecture") or card.get("architecture", ""),
+                "conventions": descriptions.get("conventions") or card.get("conventions", []),
+                "modules": modules,
+            }
+
+        card["stack"] = stack
+        if test_command:
+            card["test_command"] = test_command
+        self.cache.set(key, card)
+        return card
+
+    def format_card(self, card: Dict[str, Any]) -> str:
+        """Compact prompt prefix"""
+        lines = [f"Stack: {card.get('stack', '')}"]
+        if card.get("architecture"):
+            lines.append(f"Architecture: {card['architecture']}")
+        modules = [f"- {d}/: {m['description']}" for d, m in card.get("modules", {}).items() if m.get("description")]
+        if modules:
+            lines.append("Modules:")
+            lines.extend(modules)
+        if card.get("conventions"):
+            lines.append("Conventions:")
+            lines.extend(f"- {c}" for c in card["conventions"])
+        if card.get("test_command"):
+            lines.append(f"Test command: {card['test_command']}")
+        return "\n".join(lines)
+
+    async def _describe(self, repo_path: str, changed: List[str], stack: str,
+                        refresh_overview: bool) -> Dict[str, Any]:
+        """Ask the LLM for descriptions of changed modules (and the overview if stale)"""
+        result: Dict[str, Any] = {"modules": {}}
+        batches = [changed[i:i + MAX_DIRS_PER_PROMPT] for i in range(0, len(changed), MAX_DIRS_PER_PROMPT)]
+        if refresh_overview and not batches:
+            batches = [[]]
+
+        for index, batch in enumerate(batches):
+            overview = refresh_overview and index == 0
+            prompt = await asyncio.to_thread(self._prompt, repo_path, batch, stack, overview)
+            try:
+                response = await self.llm_client.describe_repository(prompt)
+            except Exception as e:
+                logger.warning(f"Failed to describe repository modules: {e}")
+                continue
+            if overview:
+                result["architecture"] = response.get("architecture", "")
+                result["conventions"] = response.get("conventions", [])
+            result["modules"].update(response.get("modules", {}))
+        return result
+
+    def _prompt(self, repo_path: str, dirs: List[str], stack: str, overview: bool) -> str:
+        sections = [f"Technology stack: {stack}"]
+        if overview:
+            sections.append("Top-level entries:\n" + "\n".join(self._ls(repo_path, "")[:60]))
+            readme = next((p for p in ("README.md", "README.rst", "README") if (Path(repo_path) / p).exists()), None)
+            if readme:
+                with open(Path(repo_path) / readme, encoding="utf-8", errors="ignore") as f:
+                    sections.append(f"{readme} (start):\n" + "".join(f.readlines()[:40]))
+            sections.append("Provide: architecture, conventions (naming, layout, error handling, testing), "
+                            "and modules for the directories below.")
+        else:
+            sections.append("Provide only: modules for the directories below.")
+
+        for directory in dirs:
+            sections.append(f"Directory {directory}/:\n" + "\n".join(self._ls(repo_path, directory)[:FILES_PER_DIR]))
+        return "\n\n".join(sections)
+
+    def _directory_hashes(self, repo_path: str) -> Dict[str, str]:
+        """Tree hash for the repo root ('.') and each module directory"""
+        root = self._git(repo_path, "rev-parse", "HEAD^{tree}")
+        listing = self._git(repo_path, "ls-tree", "-r", "-d", "-z", "HEAD")
+        if not root or listing is None:
+            return {}
+
+        hashes = {}
+        for entry in listing.split("\0"):
+            if "\t" not in entry:
+                continue
+            meta, path = entry.split("\t", 1)
+            parts = path.split("/")
+            if len(parts) > MAX_MODULE_DEPTH or any(p.startswith(".") or p in SKIP_MODULE_DIRS for p in parts):
+                continue
+            hashes[path] = meta.split()[2]
+
+        if len(hashes) > MAX_MODULES:
+            # Too many to describe usefully; keep the top level only
+            hashes = dict(list({p: h for p, h in hashes.items() if "/" not in p}.items())[:MAX_MODULES])
+        hashes["."] = root.strip()
+        return hashes
+
+    def _ls(self, repo_path: str, directory: str) -> List[str]:
+        output = self._git(repo_path, "ls-tree", "--name-only", "-z", f"HEAD:{directory}")
+        return [name for name in (output or "").split("\0") if name]
+
+    def _stack(self, repo_analysis: Dict[str, Any]) -> str:
+        parts = [repo_analysis.get("primary_language") or "unknown"]
+        if repo_analysis.get("frameworks"):
+            parts.append(f"frameworks: {', '.join(repo_analysis['frameworks'])}")
+        if repo_analysis.get("build_tools"):
+            parts.append(f"build: {', '.join(repo_analysis['build_tools'])}")
+        if repo_analysis.get("test_frameworks"):
+            parts.append(f"tests: {', '.join(repo_analysis['test_frameworks'])}")
+        dependencies = []
+        for deps in repo_analysis.get("dependencies", {}).values():
+            if isinstance(deps, dict):
+                dependencies.extend(deps.get("dependencies", {}).keys())
+            elif isinstance(deps, list):
+                dependencies.extend(deps)
+        if dependencies:
+            parts.append(f"key dependencies: {', '.join(dependencies[:10])}")
+        return "; ".join(parts)
+
+    def _git(self, repo_path: str, *args: str) -> Optional[str]:
+        try:
+            result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
@@ -0,0 +1,189 @@
+"""Apply LLM edits given as search/replace blocks or unified diffs."""
+
+import difflib
+import json
+import re
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from utils.opik_tracer import trace
+
+logger = logging.getLogger(__name__)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@")
+# Minimum similarity for a search block that no longer matches the file exactly
+FUZZY_THRESHOLD = 0.85
+# Shorter blocks are too easily confused with similar lines to match by similarity
+FUZZY_MIN_LINES = 3
+# How much better the best window must be than any window it doesn't overlap
+FUZZY_MARGIN = 0.05
+
+
+class PatchApplier:
+    """Applies model edits to a file instead of taking a full rewrite.
+
+    A change is a dict with ``edits`` (``[{"search", "replace"}]``), a unified
+    ``diff`` or the complete ``content``. Search blocks are matched exactly, then
+    ignoring surrounding whitespace (re-indenting the replacement), preferring
+    the match closest to where the previous edit ended or to the hunk's line
+    number. Blocks of several lines may also match by similarity when one place
+    in the file clearly wins. ``resolve`` falls back to asking the model for the
+    whole file when an edit can't be placed.
+    """
+
+    def __init__(self, llm_client=None):
+        self.llm_client = llm_client
+
+    async def resolve(self, path: str, original: str, change: Dict[str, Any],
+                      instructions: str = "") -> Optional[str]:
+        """New content for ``path``, or None when neither the edits nor a rewrite worked"""
+        try:
+            content = self.apply(original, change)
+        except Exception as e:
+            logger.warning(f"Failed to apply edits to {path}: {e}")
+            content = None
+        if content is not None or self.llm_client is None or not (change.get("edits") or change.get("diff")):
+            return content
+
+        logger.info(f"Edits for {path} did not apply, requesting the full file")
+        trace("patch_applier.full_file_fallback", {"path": path, "file_length": len(original)})
+        requested = change.get("edits") or change.get("diff")
+        prompt = f"""
+        File: {path}
+
+        Current File Content:
+        ```
+        {original}
+        ```
+
+        Requested Change:
+        {instructions}
+
+        These edits could not be applied to the current file:
+        {requested if isinstance(requested, str) else json.dumps(requested, indent=2)}
+
+        Return the complete updated file with the intended change applied.
+        """
+        result = await self.llm_client.rewrite_file(prompt)
+        return result.get("content")
+
+    def apply(self, original: str, change: Dict[str, Any]) -> Optional[str]:
+        """Content after applying ``change``, or None when an edit doesn't match"""
+        if change.get("edits"):
+            blocks = [(edit.get("search", "").splitlines(), edit.get("replace", "").splitlines(), None)
+                      for edit in change["edits"]]
+        elif change.get("diff"):
+            blocks = self.parse_diff(change["diff"])
+        else:
+            return change.get("content")
+
+        eol = "\r\n" if "\r\n" in original else "\n"
+        lines = original.splitlines(keepends=True)
+        cursor, delta = 0, 0
+        for search, replace, hint in blocks:
+            position = cursor if hint is None else max(hint + delta, 0)
+            applied = self._apply_block(lines, search, replace, position, hint, eol)
+            if applied is None:
+                logger.debug(f"Edit block did not match: {search[:3]}")
+                return None
+            lines, cursor = applied
+            delta += len(replace) - len(search)
+        return "".join(lines)
+
+    def parse_diff(self, diff: str) -> List[Tuple[List[str], List[str], Optional[int]]]:
+        """(search lines, replace lines, 0-based old start) for each hunk"""
+        blocks = []
+        search, replace, hint = None, None, None
+        for line in diff.splitlines():
+            header = HUNK_HEADER.match(line)
+            if header:
+                if search or replace:
+                    blocks.append((search, replace, hint))
+                # An empty old side names the line the insertion goes after
+                start = int(header.group(1))
+                search, replace, hint = [], [], start if header.group(2) == "0" else max(start - 1, 0)
+                continue
+            if search is None:
+                # File headers, or hunks written without an @@ line
+                if line.startswith(("diff --git", "index ", "--- ", "+++ ")):
+                    continue
+                search, replace = [], []
+            if line.startswith("\\"):
+                continue
+            if line.startswith("-"):
+                search.append(line[1:])
+            elif line.startswith("+"):
+                replace.append(line[1:])
+            else:
+                context = line[1:] if line.startswith(" ") else line
+                search.append(context)
+                replace.append(context)
+        if search or replace:
+            blocks.append((search, replace, hint))
+        return blocks
+
+    def _apply_block(self, lines: List[str], search: List[str], replace: List[str],
+                     position: int, hint: Optional[int], eol: str) -> Optional[Tuple[List[str], int]]:
+        if not search:
+            # Pure insertion needs a hunk line number (or an empty file)
+            if lines and hint is None:
+                return None
+            start = end = min(position, len(lines))
+        else:
+            match = self._locate([line.rstrip("\r\n") for line in lines], search, position)
+            if match is None:
+                return None
+            start, end, found_indent, search_indent = match
+            if found_indent != search_indent:
+                replace = [found_indent + line[len(search_indent):] if line.startswith(search_indent) else line
+                           for line in replace]
+
+        block = [line + eol for line in replace]
+        if block and end == len(lines) and lines and not lines[-1].endswith("\n"):
+            block[-1] = block[-1][:-len(eol)]
+        return lines[:start] + block + lines[end:], start + len(block)
+
+    def _locate(self, lines: List[str], search: List[str],
+                position: int) -> Optional[Tuple[int, int, str, str]]:
+        """(start, end, file indent, search indent) of the best match for ``search``"""
+        size = len(search)
+        for normalize in (str.rstrip, str.strip):
+            normalized = [normalize(line) for line in lines]
+            target = [normalize(line) for line in search]
+            found = [i for i in range(len(lines) - size + 1) if normalized[i:i + size] == target]
+            if found:
+                start = min(found, key=lambda i: (i < position, abs(i - position)))
+                return start, start + size, self._indent(lines[start:start + size]), self._indent(search)
+
+        # A line dropped or added by the model still matches by similarity, if unambiguously
+        if sum(1 for line in search if line.strip()) < FUZZY_MIN_LINES:
+            return None
+        stripped = [line.strip() for line in lines]
+        target = "\n".join(line.strip() for line in search)
+        floor = FUZZY_THRESHOLD - FUZZY_MARGIN
+        candidates = []
+        for window in (size, size - 1, size + 1):
+            for i in range(len(lines) - window + 1):
+                matcher = difflib.SequenceMatcher(None, "\n".join(stripped[i:i + window]), target)
+                if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                    continue
+                ratio = matcher.ratio()
+                if ratio >= floor:
+                    candidates.append((ratio, i, i + window))
+        if not candidates:
+            return None
+
+        ratio, start, end = max(candidates, key=lambda c: (c[0], c[1] >= position, -abs(c[1] - position)))
+        if ratio < FUZZY_THRESHOLD:
+            return None
+        for other, other_start, other_end in candidates:
+            if other >= ratio - FUZZY_MARGIN and (other_end <= start or other_start >= end):
+                logger.debug(f"Ambiguous similarity match at lines {start + 1} and {other_start + 1}")
+                return None
+        return start, end, self._indent(lines[start:end]), self._indent(search)
+
+    def _indent(self, lines: List[str]) -> str:
+        for line in lines:
+            if line.strip():
+                return line[:len(line) - len(line.lstrip())]
+        return ""
@@ -2,27 +2,52 @@
 
 import asyncio
 import uuid
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from utils.opik_tracer import trace
 from core.sandbox import SandboxManager
+from core.repo_mirror import RepoMirror
 from core.integrations.github_client import GitHubClient
+from core.integrations.github_batch import GitHubCommentBatch
 from core.integrations.llm_client import LLMClient
+from config.settings import settings
 from models.schemas import PRCommentHandlingRequest, PRCommentHandlingResponse
 from services.developer.code_analyzer import CodeAnalyzer
+from services.developer.symbol_index import SymbolIndex
+from services.developer.code_index import CodeIndex
+from services.developer.knowledge_card import KnowledgeCardService
+from services.developer.patch_applier import PatchApplier
+from services.developer.comment_ledger import CommentLedger
+from services.developer.diff_index import DiffIndex
 import logging
 
 logger = logging.getLogger(__name__)
 
+# PR changes shown alongside a file's comments
+MAX_PR_PATCH_CHARS = 8000
+
 class PRCommentHandler:
     def __init__(self):
         self.sandbox_manager = SandboxManager()
         self.github_client = GitHubClient()
         self.llm_client = LLMClient()
         self.code_analyzer = CodeAnalyzer()
+        self.symbol_index = SymbolIndex()
+        self.code_index = CodeIndex(symbol_index=self.symbol_index)
+        self.knowledge_cards = KnowledgeCardService(self.llm_client)
+        self.patch_applier = PatchApplier(self.llm_client)
+        self.file_workers = asyncio.Semaphore(settings.comment_handler_workers)
+        self.comment_ledger = CommentLedger()
+        self.repo_mirror = RepoMirror()
         
     async def handle_pr_comments(self, request: PRCommentHandlingRequest) -> PRCommentHandlingResponse:
         """Handle all comments on a PR by making appropriate code changes"""
+        owner, repo, _ = self._parse_pr_url(request.pr_url)
+        # Shares the per-repo concurrency budget with reviews and bulk jobs
+        async with self.github_client.governor.repo_slot(owner, repo):
+            return await self._handle_pr_comments(request)
+
+    async def _handle_pr_comments(self, request: PRCommentHandlingRequest) -> PRCommentHandlingResponse:
         logger.info(f"Starting PR comment handling for: {request.pr_url}")
         trace("pr_comment_handler.start", {"pr_url": request.pr_url})
         
@@ -46,13 +71,28 @@ class PRCommentHandler:
         # Filter actionable comments (exclude resolved, bot comments, etc.)
         actionable_comments = self._filter_actionable_comments(review_comments, issue_comments)
         
+        # Only new comments, edited ones and earlier failures need another pass
+        ledger = self.comment_ledger.load(owner, repo, pr_number)
+        already_handled = len(actionable_comments)
+        actionable_comments = [c for c in actionable_comments if self.comment_ledger.needs_handling(ledger, c)]
+        already_handled -= len(actionable_comments)
+        pending_replies = self.comment_ledger.unreplied(ledger, exclude=actionable_comments)
+        trace("pr_comment_handler.ledger", {
+            "already_handled": already_handled,
+            "new_or_edited": len(actionable_comments),
+            "pending_replies": len(pending_replies)
+        })
+        
         if not actionable_comments:
+            await self._send_replies(owner, repo, pr_number, pending_replies, ledger)
+            self.comment_ledger.save(owner, repo, pr_number, ledger)
             return PRCommentHandlingResponse(
                 pr_url=request.pr_url,
                 comments_handled=0,
                 commits_made=[],
                 files_modified=[],
-                summary="No actionable comments found to handle.",
+                summary=(f"No new or edited comments since the last run ({already_handled} already handled)."
+                         if already_handled else "No actionable comments found to handle."),
                 unresolved_comments=[]
             )
         
@@ -66,10 +106,24 @@ class PRCommentHandler:
             repo_url = pr_details["head"]["repo"]["clone_url"]
             pr_branch = pr_details["head"]["ref"]
             
-            repo_path = sandbox.clone_repo(repo_url, pr_branch)
+            # The PR's own diff comes from the base repo's mirror while the branch clones
+            repo_path, pr_index = await asyncio.gather(
+                asyncio.to_thread(sandbox.clone_repo, repo_url, pr_branch),
+                self._get_pr_index(owner, repo, pr_number, pr_details)
+            )
             
             # Analyze repository structure
-            repo_analysis = self.code_analyzer.analyze_repository(repo_path)
+            repo_analysis = await asyncio.to_thread(
+                self.code_analyzer.analyze_repository, repo_path, repo_url, sandbox.repo.head.commit.hexsha
+            )
+            
+            knowledge_card = ""
+            try:
+                card = await self.knowledge_cards.get_card(repo_path, repo_url, repo_analysis)
+                if card:
+                    knowledge_card = self.knowledge_cards.format_card(card)
+            except Exception as e:
+                logger.warning(f"Failed to load knowledge card: {e}")
             
             # Group comments by file for efficient processing
             comments_by_file = self._group_comments_by_file(actionable_comments)
@@ -78,45 +132,47 @@ class PRCommentHandler:
             files_modified = []
             handled_comments = []
             unresolved_comments = []
+            replies = list(pending_replies)
+            file_addressed = []
             
-            # Process each file's comments
-            for file_path, file_comments in comments_by_file.items():
-                try:
-                    result = await self._handle_file_comments(
-                        sandbox, repo_path, file_path, file_comments, repo_analysis
-                    )
-                    
-                    if result["modified"]:
-                        # Commit changes for this file
-                        commit_message = f"Address comments in {file_path}\n\n" + \
-                                       "\n".join([f"- {c['summary']}" for c in result["handled_comments"]])
-                        
-                        commit_sha = sandbox.commit_changes(commit_message)
-                        commits_made.append(commit_sha)
-                        files_modified.append(file_path)
-                        handled_comments.extend(result["handled_comments"])
-                        
-                        # Reply to each handled comment and mark as resolved
-                        for i, comment in enumerate(result["handled_comments"]):
-                            try:
-                                # Reply to the specific comment
-                                await self._reply_to_individual_comment(
-                                    owner, repo, pr_number, comment, file_comments[i]
-                                )
-                            except Exception as e:
-                                logger.warning(f"Failed to reply/resolve comment {comment.get('id')}: {e}")
-                    else:
-                        unresolved_comments.extend(file_comments)
-                        
-                except Exception as e:
-                    logger.error(f"Failed to handle comments for {file_path}: {e}")
+            # Compute the file edits concurrently; each task only writes its own file
+            file_groups = [(path, group) for path, group in comments_by_file.items() if path != "general"]
+            results = await asyncio.gather(*[
+                self._handle_file_comments_bounded(
+                    sandbox, repo_path, file_path, file_comments, repo_analysis, knowledge_card, pr_index
+                )
+                for file_path, file_comments in file_groups
+            ], return_exceptions=True)
+            
+            commit_lines = []
+            for (file_path, file_comments), result in zip(file_groups, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to handle comments for {file_path}: {result}")
                     unresolved_comments.extend(file_comments)
+                    for comment in file_comments:
+                        self.comment_ledger.record(ledger, comment, "failed")
+                elif result["modified"]:
+                    files_modified.append(file_path)
+                    addressed, unaddressed = self._match_handled(result["handled_comments"], file_comments)
+                    handled_comments.extend(handled for handled, _ in addressed)
+                    commit_lines.extend(f"- {file_path}: {handled.get('summary', '')}" for handled, _ in addressed)
+                    file_addressed.extend(addressed)
+                    self._record_unaddressed(ledger, unaddressed, unresolved_comments)
+                else:
+                    self._record_unaddressed(ledger, file_comments, unresolved_comments)
             
-            # Handle general comments separately
+            if files_modified:
+                commit_message = f"Address review comments in {len(files_modified)} file(s)\n\n" + "\n".join(commit_lines)
+                commit_sha = sandbox.commit_changes(commit_message)
+                commits_made.append(commit_sha)
+                self._record_addressed(ledger, file_addressed, commit_sha)
+                replies.extend(file_addressed)
+            
+            # General comments may touch any file, so they run after the file edits land
             if "general" in comments_by_file:
                 try:
                     result = await self._handle_general_comments(
-                        sandbox, repo_path, comments_by_file["general"], repo_analysis
+                        sandbox, repo_path, comments_by_file["general"], repo_analysis, knowledge_card
                     )
                     
                     if result["modified"]:
@@ -126,33 +182,34 @@ class PRCommentHandler:
                         
                         commit_sha = sandbox.commit_changes(commit_message)
                         commits_made.append(commit_sha)
-                        handled_comments.extend(result["handled_comments"])
-                        
-                        # Reply to each general comment
-                        for i, comment in enumerate(result["handled_comments"]):
-                            try:
-                                await self._reply_to_individual_comment(
-                                    owner, repo, pr_number, comment, comments_by_file["general"][i]
-                                )
-                            except Exception as e:
-                                logger.warning(f"Failed to reply to general comment: {e}")
+                        general_addressed, unaddressed = self._match_handled(
+                            result["handled_comments"], comments_by_file["general"]
+                        )
+                        handled_comments.extend(handled for handled, _ in general_addressed)
+                        self._record_addressed(ledger, general_addressed, commit_sha)
+                        self._record_unaddressed(ledger, unaddressed, unresolved_comments)
+                        replies.extend(general_addressed)
                     else:
-                        unresolved_comments.extend(comments_by_file["general"])
+                        self._record_unaddressed(ledger, comments_by_file["general"], unresolved_comments)
                         
                 except Exception as e:
                     logger.error(f"Failed to handle general comments: {e}")
                     unresolved_comments.extend(comments_by_file["general"])
+                    for comment in comments_by_file["general"]:
+                        self.comment_ledger.record(ledger, comment, "failed")
             
-            # Push all changes
+            # Push all changes once, then reply so the replies point at pushed commits
             if commits_made:
                 sandbox.push_branch(pr_branch)
-                
-            # Post summary comment to GitHub PR
+            
+            # Replies and the summary comment go out as one batch
+            summary_body = None
             if handled_comments or commits_made:
-                await self._post_github_summary_comment(
-                    owner, repo, pr_number, handled_comments, commits_made, 
-                    files_modified, unresolved_comments
+                summary_body = self._generate_github_comment_body(
+                    handled_comments, commits_made, files_modified, unresolved_comments
                 )
+            await self._send_replies(owner, repo, pr_number, replies, ledger, summary_body)
+            self.comment_ledger.save(owner, repo, pr_number, ledger)
                 
             # Generate summary
             summary = self._generate_summary(handled_comments, commits_made, files_modified, unresolved_comments)
@@ -169,11 +226,56 @@ class PRCommentHandler:
             trace("pr_comment_handler.complete", {
                 "comments_handled": len(handled_comments),
                 "commits_made": len(commits_made),
-                "github_summary_posted": len(handled_comments) > 0 or len(commits_made) > 0
+                "github_summary_posted": len(handled_comments) > 0 or len(commits_made) > 0,
+                "resource_usage": sandbox.usage_summary()
             })
             
             return result
     
+    def _match_handled(self, handled: List[Dict], comments: List[Dict]) -> Tuple[List[tuple], List[Dict]]:
+        """(handled, original) pairs matched on the comment id, and the comments nothing handled"""
+        by_id = {str(comment["id"]): comment for comment in comments}
+        addressed = []
+        for entry in handled:
+            original = by_id.pop(str(entry.get("id")), None)
+            if original is None:
+                logger.debug(f"Ignoring handled comment with unknown id {entry.get('id')}")
+                continue
+            addressed.append((entry, original))
+        return addressed, list(by_id.values())
+    
+    def _record_addressed(self, ledger: Dict[str, Any], addressed: List[tuple], commit_sha: str) -> None:
+        for handled, original in addressed:
+            self.comment_ledger.record(ledger, original, "addressed", commit=commit_sha, summary=handled.get("summary"))
+    
+    def _record_unaddressed(self, ledger: Dict[str, Any], comments: List[Dict], unresolved: List[Dict]) -> None:
+        unresolved.extend(comments)
+        for comment in comments:
+            self.comment_ledger.record(ledger, comment, "unresolved")
+    
+    async def _send_replies(self, owner: str, repo: str, pr_number: int, replies: List[tuple],
+                            ledger: Dict[str, Any], summary_body: Optional[str] = None) -> None:
+        """Post the replies (and summary) as one batch, noting what was posted in the ledger"""
+        batch = GitHubCommentBatch(self.github_client, owner, repo, pr_number)
+        for i, (handled, original) in enumerate(replies):
+            if original["type"] == "review":
+                batch.add_reply(i, original["id"], self._reply_body(handled, original))
+            else:
+                batch.add_comment(i, self._reply_body(handled, original))
+        if summary_body:
+            batch.add_comment("summary", summary_body)
+        
+        posted = await batch.submit()
+        for i, (handled, original) in enumerate(replies):
+            if posted.get(i):
+                self.comment_ledger.record_reply(ledger, original, posted[i])
+            else:
+                logger.warning(f"Failed to reply to comment {original.get('id')}")
+        self.comment_ledger.record_own(ledger, "issue", posted.get("summary"))
+        trace("pr_comment_handler.replies_posted", {
+            "replies": len(replies), "posted": sum(1 for v in posted.values() if v), **batch.stats
+        })
+    
     def _parse_pr_url(self, pr_url: str) -> tuple:
         """Parse GitHub PR URL to extract owner, repo, and PR number"""
         # Example: https://github.com/owner/repo/pull/123
@@ -280,12 +382,41 @@ class PRCommentHandler:
         
         return grouped
     
+    async def _handle_file_comments_bounded(self, sandbox, repo_path: str, file_path: str,
+                                          comments: List[Dict], repo_analysis: Dict,
+                                          knowledge_card: str = "",
+                                          pr_index: Optional[DiffIndex] = None) -> Dict[str, Any]:
+        """Handle one file's comments within the shared LLM concurrency limit"""
+        async with self.file_workers:
+            return await self._handle_file_comments(
+                sandbox, repo_path, file_path, comments, repo_analysis, knowledge_card, pr_index
+            )
+    
+    async def _get_pr_index(self, owner: str, repo: str, pr_number: int, pr_details: Dict) -> Optional[DiffIndex]:
+        """This PR's diff, computed from the local mirror and parsed (None when unavailable)"""
+        if not settings.local_diff_enabled:
+            return None
+        try:
+            diff = await asyncio.wait_for(asyncio.to_thread(
+                self.repo_mirror.pr_diff, owner, repo, pr_number,
+                pr_details["base"]["ref"], pr_details["base"]["repo"]["clone_url"]
+            ), settings.local_diff_timeout)
+            return await asyncio.to_thread(DiffIndex, diff)
+        except asyncio.TimeoutError:
+            logger.warning(f"Local diff for {owner}/{repo}#{pr_number} took over {settings.local_diff_timeout}s")
+            return None
+        except Exception as e:
+            logger.warning(f"Local diff for {owner}/{repo}#{pr_number} failed: {e}")
+            return None
+    
     async def _handle_file_comments(self, sandbox, repo_path: str, file_path: str, 
-                                  comments: List[Dict], repo_analysis: Dict) -> Dict[str, Any]:
+                                  comments: List[Dict], repo_analysis: Dict,
+                                  knowledge_card: str = "",
+                                  pr_index: Optional[DiffIndex] = None) -> Dict[str, Any]:
         """Handle all comments for a specific file"""
         if file_path == "general":
             # Handle general PR comments
-            return await self._handle_general_comments(sandbox, repo_path, comments, repo_analysis)
+            return await self._handle_general_comments(sandbox, repo_path, comments, repo_analysis, knowledge_card)
         
         # Handle file-specific comments
         full_file_path = Path(repo_path) / file_path
@@ -299,15 +430,22 @@ class PRCommentHandler:
             current_content = f.read()
         
         # Prepare context for LLM
-        context = self._prepare_file_context(file_path, current_content, comments, repo_analysis)
+        context = self._prepare_file_context(file_path, current_content, comments, repo_analysis, pr_index)
         
         # Ask LLM to address the comments
         response = await self.llm_client.address_pr_comments(context)
         
-        if response.get("modified", False) and response.get("new_content"):
+        if response.get("modified", False):
+            change = {"edits": response.get("edits"), "diff": response.get("diff"), "content": response.get("new_content")}
+            new_content = await self.patch_applier.resolve(
+                file_path, current_content, change, self._format_comments_for_llm(comments)
+            )
+            if not new_content or new_content == current_content:
+                return {"modified": False, "handled_comments": []}
+            
             # Write the modified content
             with open(full_file_path, 'w', encoding='utf-8') as f:
-                f.write(response["new_content"])
+                f.write(new_content)
             
             return {
                 "modified": True,
@@ -316,50 +454,57 @@ class PRCommentHandler:
         
         return {"modified": False, "handled_comments": []}
     
-    async def _reply_to_individual_comment(self, owner: str, repo: str, pr_number: int,
-                                         handled_comment: Dict, original_comment: Dict) -> None:
+    def _reply_body(self, handled_comment: Dict, original_comment: Dict) -> str:
         """Reply to an individual comment with details of how it was addressed"""
-        try:
-            # Create a personalized reply
-            user = original_comment.get("user", "")
-            summary = handled_comment.get("summary", "Your comment has been addressed")
-            
-            if original_comment["type"] == "review":
-                # For review comments (line-specific), reply directly
-                reply_body = f"@{user} ✅ **Comment Addressed**\n\n{summary}\n\n*This change was automatically implemented by the PR Comment Handler bot.*"
-                reply_body += f"\n\n**Please review the changes and resolve this comment if you're satisfied with the implementation.**"
-                
-                await self.github_client.reply_to_review_comment(
-                    owner, repo, pr_number, original_comment["id"], reply_body
-                )
-                logger.info(f"Replied to review comment {original_comment['id']} by {user}")
-                
-            elif original_comment["type"] == "issue":
-                # For general issue comments, create a new comment mentioning the user
-                reply_body = f"@{user} ✅ **Your comment has been addressed**\n\n> {original_comment['body'][:100]}{'...' if len(original_comment['body']) > 100 else ''}\n\n{summary}\n\n*This change was automatically implemented by the PR Comment Handler bot.*"
-                reply_body += f"\n\n**Please review the changes and resolve this comment if you're satisfied with the implementation.**"
-                
-                await self.github_client.reply_to_issue_comment(
-                    owner, repo, pr_number, reply_body
-                )
-                logger.info(f"Replied to issue comment by {user}")
-                
-        except Exception as e:
-            logger.error(f"Failed to reply to comment: {e}")
+        # Create a personalized reply
+        user = original_comment.get("user", "")
+        summary = handled_comment.get("summary", "Your comment has been addressed")
+        
+        if original_comment["type"] == "review":
+            # For review comments (line-specific), reply in the thread
+            reply_body = f"@{user} ✅ **Comment Addressed**\n\n{summary}\n\n*This change was automatically implemented by the PR Comment Handler bot.*"
+        else:
+            # For general issue comments, create a new comment mentioning the user
+            reply_body = f"@{user} ✅ **Your comment has been addressed**\n\n> {original_comment['body'][:100]}{'...' if len(original_comment['body']) > 100 else ''}\n\n{summary}\n\n*This change was automatically implemented by the PR Comment Handler bot.*"
+        reply_body += f"\n\n**Please review the changes and resolve this comment if you're satisfied with the implementation.**"
+        return reply_body
     
     async def _handle_general_comments(self, sandbox, repo_path: str, 
-                                     comments: List[Dict], repo_analysis: Dict) -> Dict[str, Any]:
+                                     comments: List[Dict], repo_analysis: Dict,
+                                     knowledge_card: str = "") -> Dict[str, Any]:
         """Handle general PR comments that don't target specific files"""
         # For general comments, we need to understand what files they might affect
+        comments_text = self._format_comments_for_llm(comments)
+        try:
+            symbol_context = await asyncio.to_thread(
+                self.symbol_index.context_for, repo_path, comments_text, settings.symbol_context_max_tokens
+            )
+        except Exception as e:
+            logger.warning(f"Failed to build symbol context: {e}")
+            symbol_context = ""
+        retrieved_code = ""
+        if settings.code_index_enabled:
+            try:
+                retrieved_code = await asyncio.to_thread(
+                    self.code_index.context_for, repo_path, comments_text,
+                    settings.code_retrieval_top_k, settings.symbol_context_max_tokens
+                )
+            except Exception as e:
+                logger.warning(f"Failed to retrieve code context: {e}")
+        
         context = f"""
-        Repository Analysis: {self._format_repo_analysis(repo_analysis)}
+        Repository Analysis: {knowledge_card or self._format_repo_analysis(repo_analysis)}
         
         General PR Comments to Address:
-        {self._format_comments_for_llm(comments)}
+        {comments_text}
         
         Please analyze these general comments and determine what files need to be modified.
         Provide specific file changes to address the feedback.
         """
+        if symbol_context:
+            context += f"\n        Relevant Definitions:\n{symbol_context}\n"
+        if retrieved_code:
+            context += f"\n        Related Code:\n{retrieved_code}\n"
         
         response = await self.llm_client.address_general_pr_comments(context)
         
@@ -388,11 +533,13 @@ class PRCommentHandler:
         }
     
     def _prepare_file_context(self, file_path: str, content: str, 
-                            comments: List[Dict], repo_analysis: Dict) -> str:
+                            comments: List[Dict], repo_analysis: Dict,
+                            pr_index: Optional[DiffIndex] = None) -> str:
         """Prepare context for LLM to address file comments"""
-        comments_text = self._format_comments_for_llm(comments)
+        comments_text = self._format_comments_for_llm(comments, pr_index)
+        pr_patch = pr_index.patch(file_path) if pr_index else ""
         
-        return f"""
+        context = f"""
         File: {file_path}
         Repository Type: {repo_analysis.get('primary_language', 'Unknown')}
         Frameworks: {', '.join(repo_analysis.get('frameworks', []))}
@@ -405,23 +552,36 @@ class PRCommentHandler:
         Comments to Address:
         {comments_text}
         
-        Please modify the file content to address all the comments.
+        Please return edits to the file that address all the comments.
         Maintain the existing code style and structure.
         Only make necessary changes to address the feedback.
         """
+        if pr_patch:
+            context += f"""
+        Changes this PR already makes to the file:
+        ```diff
+        {pr_patch[:MAX_PR_PATCH_CHARS]}
+        ```
+        """
+        return context
     
-    def _format_comments_for_llm(self, comments: List[Dict]) -> str:
+    def _format_comments_for_llm(self, comments: List[Dict], pr_index: Optional[DiffIndex] = None) -> str:
         """Format comments for LLM consumption"""
         formatted = []
         
         for i, comment in enumerate(comments, 1):
-            comment_text = f"{i}. {comment['user']} commented:\n"
+            comment_text = f"{i}. {comment['user']} commented (id {comment['id']}):\n"
             comment_text += f"   {comment['body']}\n"
             
             if comment.get('line'):
                 comment_text += f"   (Line {comment['line']})\n"
             
-            if comment.get('diff_hunk'):
+            # The PR's current diff around the line beats GitHub's hunk, which is cut off and may be stale
+            current = pr_index.context(comment["path"], comment["line"]) \
+                if pr_index and comment.get("path") and comment.get("line") else ""
+            if current:
+                comment_text += f"   Context:\n{current}\n"
+            elif comment.get('diff_hunk'):
                 comment_text += f"   Context: {comment['diff_hunk'][:200]}...\n"
             
             formatted.append(comment_text)
@@ -463,23 +623,6 @@ class PRCommentHandler:
         
         return summary.strip()
     
-    async def _post_github_summary_comment(self, owner: str, repo: str, pr_number: int,
-                                         handled_comments: List[Dict], commits: List[str],
-                                         files_modified: List[str], unresolved: List[Dict]) -> None:
-        """Post a summary comment to the GitHub PR"""
-        try:
-            # Create a comprehensive summary comment
-            comment_body = self._generate_github_comment_body(
-                handled_comments, commits, files_modified, unresolved
-            )
-            
-            # Post the comment to GitHub
-            await self.github_client.add_pr_comment(owner, repo, pr_number, comment_body)
-            logger.info(f"Posted summary comment to PR #{pr_number}")
-            
-        except Exception as e:
-            logger.error(f"Failed to post summary comment to GitHub PR: {e}")
-    
     def _generate_github_comment_body(self, handled_comments: List[Dict], commits: List[str],
                                     files_modified: List[str], unresolved: List[Dict]) -> str:
         """Generate the GitHub comment body with summary"""
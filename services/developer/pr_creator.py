@@ -1,16 +1,25 @@
 # services/pr_creator.py
 import asyncio
+import time
 import uuid
 from typing import Optional, Dict, Any,List
 from pathlib import Path
 from slack_sdk import WebClient
 from utils.opik_tracer import trace
 from core.sandbox import SandboxManager
+from core.dependency_cache import DependencyCache
+from core.stage_graph import StageGraph
 from core.integrations.github_client import GitHubClient
 from core.integrations.linear_client import LinearClient
 from core.integrations.llm_client import LLMClient
 from models.schemas import PRCreationRequest, PRCreationResponse
 from services.developer.code_analyzer import CodeAnalyzer
+from services.developer.test_impact import TestImpactSelector
+from services.developer.symbol_index import SymbolIndex
+from services.developer.code_index import CodeIndex
+from services.developer.knowledge_card import KnowledgeCardService
+from services.developer.patch_applier import PatchApplier
+from services.developer.test_failures import TestFailureExtractor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +31,13 @@ class PRCreatorService:
         self.linear_client = LinearClient()
         self.llm_client = LLMClient()
         self.code_analyzer = CodeAnalyzer()
+        self.dependency_cache = DependencyCache()
+        self.test_impact = TestImpactSelector()
+        self.symbol_index = SymbolIndex()
+        self.code_index = CodeIndex(symbol_index=self.symbol_index)
+        self.knowledge_cards = KnowledgeCardService(self.llm_client)
+        self.patch_applier = PatchApplier(self.llm_client)
+        self.failure_extractor = TestFailureExtractor()
         
     async def create_pr(self, request: PRCreationRequest) -> PRCreationResponse:
         """Create PR in sandbox environment"""
@@ -30,40 +46,43 @@ class PRCreatorService:
         
         sandbox_id = f"pr-{uuid.uuid4().hex[:8]}"
         
-        # Get Linear context if available
-        linear_context = None
-        if request.linear_issue_id:
+        # Clarification step; it only needs the Linear context, not a checkout
+        from config.settings import settings
+        if (not settings.skip_clarifications) and not request.clarification_questions:
+            linear_context = None
             try:
-                linear_context = await self.linear_client.get_issue_details(request.linear_issue_id)
+                linear_context = await self._get_linear_context(request.linear_issue_id)
             except Exception as e:
                 logger.warning(f"Failed to fetch Linear context: {e}")
+            clarifications = await self._get_clarifications(
+                request.description, linear_context
+            )
+            return PRCreationResponse(
+                pr_url="",
+                branch_name=request.branch_name,
+                commits=[],
+                test_results={},
+                files_changed=[],
+                clarification_questions=clarifications
+            )
             
         with self.sandbox_manager.get_sandbox(sandbox_id) as sandbox:
-            # Clone repository and checkout base branch
-            repo_path = sandbox.clone_repo(request.repo_url, request.base_branch)
+            # Setup runs as a stage graph: clone ‖ Linear, then env warmup ‖ analysis, then plan
+            setup = await self._build_setup_graph(sandbox, request).run()
+            results = setup["results"]
+            phase_timings = {name: seconds for name, seconds in setup["timings"].items() if name != "total"}
+            phase_timings["setup"] = setup["timings"]["total"]
+            trace("pr_creator.setup", {"timings": setup["timings"], "errors": setup["errors"]})
+            if "plan" not in results:
+                failed = next(((name, error) for name, error in setup["errors"].items() if name not in results),
+                              ("plan", "skipped"))
+                raise Exception(f"PR setup failed at {failed[0]}: {failed[1]}")
             
-            # Create feature branch from base branch
-            sandbox.create_branch(request.branch_name)
-            
-            # Clarification step
-            from config.settings import settings
-            if (not settings.skip_clarifications) and not request.clarification_questions:
-                clarifications = await self._get_clarifications(
-                    request.description, linear_context
-                )
-                return PRCreationResponse(
-                    pr_url="",
-                    branch_name=request.branch_name,
-                    commits=[],
-                    test_results={},
-                    files_changed=[],
-                    clarification_questions=clarifications
-                )
-            
-            # Generate implementation plan
-            implementation_plan = await self._generate_implementation_plan(
-                request, linear_context, repo_path
-            )
+            repo_path = results["checkout"]["repo_path"]
+            base_sha = results["checkout"]["base_sha"]
+            linear_context = results["linear_context"]
+            test_frameworks = results["repo_analysis"]['test_frameworks']
+            implementation_plan = results["plan"]
             
             # Share plan to Slack if configured
             from config.settings import settings
@@ -71,29 +90,70 @@ class PRCreatorService:
                 await self._post_plan_to_slack(request, implementation_plan)
 
             # Implement changes
+            phase_started = time.monotonic()
             changes_made = await self._implement_changes(
                 sandbox, implementation_plan, repo_path
             )
+            phase_timings["implement"] = round(time.monotonic() - phase_started, 3)
+            phase_started = time.monotonic()
             
-            # Run tests
-            test_results = sandbox.run_tests()
+            # Run the tests affected by the change first; the full suite runs once at the end
+            changed_files = changes_made["files_changed"] + changes_made["files_created"] + changes_made["tests_added"]
+            affected_tests = self._select_affected_tests(sandbox, repo_path, changed_files, test_frameworks, base_sha)
+            test_results = sandbox.run_tests(test_frameworks, targets=affected_tests or None)
+            trace("pr_creator.tests_run", {
+                cmd: result.get("summary", {}) for cmd, result in test_results.items()
+            })
             
             # If tests fail, attempt to fix
+            fixes_applied = False
             if not self._tests_passed(test_results):
+                def rerun_tests(target_sandbox, fixes: List[Dict], failures: List[Dict]) -> Dict[str, Any]:
+                    # Re-run just the failing tests plus the tests the fixes touch
+                    target_repo = str(Path(target_sandbox.sandbox_path) / "repo")
+                    targets = self.failure_extractor.rerun_targets(failures, target_repo)
+                    if targets is not None:
+                        touched = self._select_affected_tests(
+                            target_sandbox, target_repo, [fix["file"] for fix in fixes], test_frameworks, base_sha
+                        )
+                        targets = sorted(set(targets) | set(touched or []))
+                    elif affected_tests:
+                        targets = self._select_affected_tests(
+                            target_sandbox, target_repo,
+                            changed_files + [fix["file"] for fix in fixes], test_frameworks, base_sha
+                        )
+                    return target_sandbox.run_tests(test_frameworks, targets=targets or None)
+
                 try:
                     fix_attempts = await self._fix_test_failures(
-                        sandbox, test_results, changes_made
+                        sandbox, test_results, changes_made, rerun_tests
                     )
-                    # Re-run tests after fixes
-                    if fix_attempts.get("fixes"):
-                        test_results = sandbox.run_tests()
-                        trace("pr_creator.tests_rerun", {"fixes_applied": len(fix_attempts["fixes"])})
+                    trace("pr_creator.fix_loop", {
+                        "attempts": fix_attempts["attempts"],
+                        "stop_reason": fix_attempts["stop_reason"],
+                        "fixes_applied": len(fix_attempts["fixes"])
+                    })
+                    if fix_attempts["fixes"]:
+                        test_results = fix_attempts["test_results"]
+                        fixes_applied = True
                 except Exception as e:
                     logger.error(f"Failed to fix test failures: {e}")
                     trace("pr_creator.fix_tests_error", {"error": str(e)})
                     # Continue with original test results
+            
+            phase_timings["tests"] = round(time.monotonic() - phase_started, 3)
+            
+            # Only a subset ran so far; confirm with the full suite once
+            phase_started = time.monotonic()
+            if affected_tests or fixes_applied:
+                test_results = sandbox.run_tests(test_frameworks)
+                trace("pr_creator.full_suite_run", {
+                    cmd: result.get("summary", {}) for cmd, result in test_results.items()
+                })
+                phase_timings["full_suite"] = round(time.monotonic() - phase_started, 3)
                 
             # Commit changes
+            phase_started = time.monotonic()
             commit_message = f"feat: {request.description}"
             if linear_context:
                 commit_message += f" (Linear: {linear_context['title']})"
@@ -114,16 +174,85 @@ class PRCreatorService:
                 base=request.base_branch
             )
             
+            phase_timings["publish"] = round(time.monotonic() - phase_started, 3)
+            
             result = PRCreationResponse(
                 pr_url=pr_response["html_url"],
                 branch_name=request.branch_name,
                 commits=[commit_sha],
                 test_results=test_results,
-                files_changed=changes_made["files_changed"]
+                files_changed=changes_made["files_changed"],
+                phase_timings=phase_timings
             )
-            trace("pr_creator.finish", {"pr_url": result.pr_url, "files_changed": len(result.files_changed)})
+            trace("pr_creator.finish", {
+                "pr_url": result.pr_url,
+                "files_changed": len(result.files_changed),
+                "phase_timings": phase_timings,
+                "resource_usage": sandbox.usage_summary()
+            })
             return result
             
+    def _build_setup_graph(self, sandbox, request: PRCreationRequest) -> StageGraph:
+        """Setup stages and their inputs; independent stages run concurrently"""
+        from config.settings import settings
+        graph = StageGraph()
+        graph.add("linear_context", lambda: self._get_linear_context(request.linear_issue_id), fallback=None)
+        graph.add("checkout", lambda: asyncio.to_thread(self._checkout, sandbox, request))
+        # Attach cached dependency environments keyed by the repo lockfiles
+        graph.add("dependency_env", lambda checkout: asyncio.to_thread(
+                      self._prepare_dependencies, sandbox, checkout["repo_path"]),
+                  deps=["checkout"], fallback={})
+        # Analyze the repository once; the plan and the test runner both use it
+        graph.add("repo_analysis", lambda checkout: asyncio.to_thread(
+                      self.code_analyzer.analyze_repository, checkout["repo_path"], request.repo_url, checkout["base_sha"]),
+                  deps=["checkout"])
+        graph.add("knowledge_card", lambda checkout, repo_analysis: self._get_knowledge_card(
+                      sandbox, checkout["repo_path"], request.repo_url, repo_analysis),
+                  deps=["checkout", "repo_analysis"], fallback="")
+        # Coverage runs the base commit's tests, so it waits for the environment but not for the plan
+        if settings.test_impact_coverage_map:
+            graph.add("coverage_map", lambda checkout, dependency_env, repo_analysis: self._build_coverage_map(
+                          sandbox, checkout["base_sha"], repo_analysis),
+                      deps=["checkout", "dependency_env", "repo_analysis"], fallback=None)
+        graph.add("plan", lambda linear_context, checkout, repo_analysis, knowledge_card: self._generate_implementation_plan(
+                      request, linear_context, checkout["repo_path"], repo_analysis, knowledge_card),
+                  deps=["linear_context", "checkout", "repo_analysis", "knowledge_card"])
+        return graph
+    
+    async def _get_linear_context(self, issue_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not issue_id:
+            return None
+        return await self.linear_client.get_issue_details(issue_id)
+    
+    def _checkout(self, sandbox, request: PRCreationRequest) -> Dict[str, str]:
+        """Clone the base branch and create the feature branch from it"""
+        repo_path = sandbox.clone_repo(request.repo_url, request.base_branch)
+        base_sha = sandbox.repo.head.commit.hexsha
+        sandbox.create_branch(request.branch_name)
+        return {"repo_path": repo_path, "base_sha": base_sha}
+    
+    def _prepare_dependencies(self, sandbox, repo_path: str) -> Dict[str, Any]:
+        dependency_env = self.dependency_cache.prepare(sandbox, repo_path)
+        trace("pr_creator.dependency_env", {
+            kind: {"cache_hit": env["cache_hit"], "installer": env["installer"]}
+            for kind, env in dependency_env.items()
+        })
+        return dependency_env
+    
+    async def _get_knowledge_card(self, sandbox, repo_path: str, repo_url: str, repo_analysis: Dict) -> str:
+        """Stored repo knowledge card, so the plan doesn't re-describe the repo"""
+        runner = sandbox.detect_test_runner(repo_analysis['test_frameworks'])
+        card = await self.knowledge_cards.get_card(
+            repo_path, repo_url, repo_analysis, runner.command if runner else None
+        )
+        return self.knowledge_cards.format_card(card) if card else ""
+    
+    async def _build_coverage_map(self, sandbox, base_sha: str, repo_analysis: Dict) -> None:
+        """Record which tests cover which files on the untouched base commit"""
+        runner = sandbox.detect_test_runner(repo_analysis['test_frameworks'])
+        if runner and runner.name == "pytest":
+            await asyncio.to_thread(self.test_impact.build_coverage_map, sandbox, base_sha)
+    
     async def _get_clarifications(self, description: str, 
                                 linear_context: Optional[Dict]) -> List[str]:
         """Generate clarification questions"""
@@ -157,13 +286,37 @@ class PRCreatorService:
         except Exception as e:
             logger.warning(f"Failed to post plan to Slack: {e}")
 
-    async def _generate_implementation_plan(self, request: PRCreationRequest, linear_context: Optional[Dict], repo_path: str) -> Dict:
+    async def _generate_implementation_plan(self, request: PRCreationRequest, linear_context: Optional[Dict],
+                                            repo_path: str, repo_analysis: Dict[str, Any],
+                                            knowledge_card: str = "") -> Dict:
         """Generate detailed implementation plan"""
         trace("pr_creator.analyze_repo", {"repo_path": repo_path})
         
-        # Perform comprehensive code analysis
-        repo_analysis = self.code_analyzer.analyze_repository(repo_path)
-        code_context = self.code_analyzer.get_code_context(repo_path)
+        code_context = self.code_analyzer.get_code_context(repo_path, analysis=repo_analysis)
+        
+        # Source of the symbols the task mentions, so edits aren't made blind
+        from config.settings import settings
+        task_text = request.description
+        if linear_context:
+            task_text += f"\n{linear_context.get('title', '')}\n{linear_context.get('description', '')}"
+        try:
+            symbol_context = await asyncio.to_thread(
+                self.symbol_index.context_for, repo_path, task_text, settings.symbol_context_max_tokens
+            )
+        except Exception as e:
+            logger.warning(f"Failed to build symbol context: {e}")
+            symbol_context = ""
+        
+        # Surrounding code most similar to the task
+        retrieved_code = ""
+        if settings.code_index_enabled:
+            try:
+                retrieved_code = await asyncio.to_thread(
+                    self.code_index.context_for, repo_path, task_text,
+                    settings.code_retrieval_top_k, settings.symbol_context_max_tokens
+                )
+            except Exception as e:
+                logger.warning(f"Failed to retrieve code context: {e}")
         
         trace("pr_creator.repo_analysis", {
             "primary_language": repo_analysis['primary_language'],
@@ -176,12 +329,18 @@ class PRCreatorService:
         TASK: {request.description}
         
         REPOSITORY ANALYSIS:
-        {self._format_repo_analysis(repo_analysis)}
+        {knowledge_card or self._format_repo_analysis(repo_analysis)}
         
         CODE CONTEXT:
         {code_context}
         """
         
+        if symbol_context:
+            context += f"\nRELEVANT DEFINITIONS:\n{symbol_context}\n"
+        
+        if retrieved_code:
+            context += f"\nRELATED CODE:\n{retrieved_code}\n"
+        
         if linear_context:
             context += f"\nLINEAR ISSUE CONTEXT:\n"
             context += f"Title: {linear_context.get('title', '')}\n"
@@ -196,6 +355,9 @@ class PRCreatorService:
         2. Follow the existing code patterns and structure
         3. Respect the project's architecture and conventions
         4. Only suggest changes that make sense for this technology stack
+        5. For files that already exist, return search/replace "edits" instead of the whole file. Each "search"
+           must be copied exactly from the current file and include enough lines to be unique; list edits in file order.
+           Use "content" only for new files.
         
         Provide a JSON response with:
         {{
@@ -204,7 +366,10 @@ class PRCreatorService:
                 {{
                     "path": "relative/path/to/file",
                     "type": "create|modify|delete",
-                    "content": "actual file content",
+                    "content": "complete file content (create only)",
+                    "edits": [
+                        {{"search": "exact lines from the current file", "replace": "replacement lines"}}
+                    ],
                     "reasoning": "why this change is needed"
                 }}
             ],
@@ -282,10 +447,18 @@ Dependencies:
         for file_change in plan.get("file_changes", []):
             file_path = file_change["path"]
             change_type = file_change["type"]  # modify, create, delete
-            content = file_change["content"]
             
             full_path = Path(repo_path) / file_path
             full_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            # Modifications arrive as edits against the current file
+            original = full_path.read_text() if full_path.exists() else ""
+            content = await self.patch_applier.resolve(
+                file_path, original, file_change, file_change.get("reasoning", "")
+            )
+            if content is None:
+                logger.warning(f"Skipping {file_path}: no applicable edits or content")
+                continue
 
             if change_type == "create":
                 with open(full_path, "w") as f:
@@ -338,38 +511,153 @@ Dependencies:
             if result.returncode != 0:
                 logger.warning(f"Failed to install npm dependencies: {result.stderr}")
         
-        # Install pip dependencies
+        # Install pip dependencies into the sandbox environment
         if pip_deps:
-            cmd = f"pip install {' '.join(pip_deps)}"
+            if sandbox.dependency_env.get("python", {}).get("installer") == "uv":
+                cmd = f"uv pip install {' '.join(pip_deps)}"
+            else:
+                cmd = f"python -m pip install {' '.join(pip_deps)}"
             result = sandbox.run_command(cmd)
             if result.returncode != 0:
                 logger.warning(f"Failed to install pip dependencies: {result.stderr}")
         
+    def _select_affected_tests(self, sandbox, repo_path: str, changed_files: List[str],
+                               test_frameworks: List[str], base_sha: str) -> Optional[List[str]]:
+        """Select the tests affected by the changed files (None means run everything)"""
+        runner = sandbox.detect_test_runner(test_frameworks)
+        if runner is None:
+            return None
+        try:
+            affected = self.test_impact.select(repo_path, changed_files, runner.name, base_sha)
+        except Exception as e:
+            logger.warning(f"Test impact analysis failed, running full suite: {e}")
+            return None
+        trace("pr_creator.test_impact", {
+            "changed_files": len(changed_files),
+            "affected_tests": len(affected) if affected is not None else "all"
+        })
+        return affected
+
     def _tests_passed(self, test_results: Dict[str, Any]) -> bool:
-        """Check if tests passed"""
-        for result in test_results.values():
-            if result.get("status") == "passed":
-                return True
-        return False
-        
-    async def _fix_test_failures(self, sandbox, test_results: Dict, 
-                               changes_made: Dict) -> Dict[str, Any]:
-        """Attempt to fix test failures"""
-        trace("pr_creator.fix_test_failures", {"test_results": list(test_results.keys())})
-        
-        failure_info = []
-        for cmd, result in test_results.items():
-            if result.get("status") == "failed":
-                failure_info.append(f"Command: {cmd}\nError: {result.get('output', '')}")
-        
-        if not failure_info:
+        """Check if tests passed (a repo without a test runner has nothing failing)"""
+        if not test_results:
+            return False
+        return all(result.get("status") in ("passed", "skipped") for result in test_results.values())
+        
+    async def _fix_test_failures(self, sandbox, test_results: Dict, changes_made: Dict,
+                               rerun_tests) -> Dict[str, Any]:
+        """Fix failing tests in rounds, within an attempt and time budget.
+
+        Each round sends only the structured failures to the LLM and re-runs just
+        the failing tests plus those the fix touches. A round that doesn't reduce
+        the failure count, or makes a test fail that passed before, is rolled back
+        and ends the loop, as does running out of failures, attempts or time.
+        """
+        from config.settings import settings
+        repo_path = str(Path(sandbox.sandbox_path) / "repo")
+        deadline = time.monotonic() + settings.fix_time_budget
+        failures = self.failure_extractor.extract(test_results, repo_path)
+        applied, attempts = [], []
+        stop_reason = "max_attempts"
+        
+        for attempt in range(max(1, settings.fix_max_attempts)):
+            if not failures:
+                stop_reason = "converged"
+                break
+            if time.monotonic() >= deadline:
+                stop_reason = "time_budget"
+                break
+            
+            started = time.monotonic()
+            outcome = await self._fix_attempt(sandbox, test_results, failures, changes_made, rerun_tests)
+            attempts.append({
+                "failing": len(failures),
+                "candidates": outcome.get("candidates", 0),
+                "kept": bool(outcome["fixes"]),
+                "seconds": round(time.monotonic() - started, 1)
+            })
+            if not outcome["fixes"]:
+                stop_reason = "no_progress" if outcome.get("rolled_back") else "no_fixes"
+                break
+            
+            applied.extend(outcome["fixes"])
+            test_results = outcome["test_results"]
+            failures = self.failure_extractor.extract(test_results, repo_path)
+            logger.info(f"Fix attempt {attempt + 1}: {attempts[-1]['failing']} -> {len(failures)} failing tests")
+        else:
+            if not failures:
+                stop_reason = "converged"
+        
+        return {"fixes": applied, "test_results": test_results, "attempts": attempts, "stop_reason": stop_reason}
+    
+    async def _fix_attempt(self, sandbox, test_results: Dict, failures: List[Dict], changes_made: Dict,
+                           rerun_tests) -> Dict[str, Any]:
+        """One round of fixes, keeping the best candidate that reduces failures without regressions.
+
+        Candidates start from a snapshot of the current sandbox; with more than one
+        candidate each runs in its own fork in parallel.
+        """
+        from config.settings import settings
+        trace("pr_creator.fix_test_failures", {"failures": len(failures)})
+        
+        candidate_count = max(1, settings.fix_candidates)
+        suggestions = await asyncio.gather(
+            *[self._suggest_test_fixes(failures, changes_made) for _ in range(candidate_count)],
+            return_exceptions=True
+        )
+        suggestions = [s for s in suggestions if isinstance(s, dict) and s.get("fixes")]
+        # Every candidate is applied to the same base state, so resolve edits against it once
+        resolved = await asyncio.gather(*[self._resolve_fixes(sandbox, s["fixes"]) for s in suggestions])
+        suggestions = [{**s, "fixes": fixes} for s, fixes in zip(suggestions, resolved) if fixes]
+        if not suggestions:
+            return {"fixes": [], "test_results": test_results}
+        
+        baseline = self._failure_count(test_results)
+        
+        if len(suggestions) == 1:
+            base = sandbox.snapshot("before-fixes")
+            try:
+                fixes = suggestions[0]["fixes"]
+                self._apply_fixes(sandbox, fixes, changes_made)
+                results = await asyncio.to_thread(rerun_tests, sandbox, fixes, failures)
+                if not self._improves(results, baseline, failures, sandbox):
+                    logger.warning("Fixes did not improve the test results, restoring snapshot")
+                    sandbox.restore(base)
+                    return {"fixes": [], "test_results": test_results, "rolled_back": True, "candidates": 1}
+                return {"fixes": fixes, "test_results": results, "candidates": 1}
+            finally:
+                sandbox.discard_snapshot(base)
+        
+        # Try every candidate in parallel from the same base state
+        forks = [sandbox.fork(f"fix-{i}") for i in range(len(suggestions))]
+        try:
+            for fork, suggestion in zip(forks, suggestions):
+                self._apply_fixes(fork, suggestion["fixes"], changes_made)
+            results = await asyncio.gather(*[
+                asyncio.to_thread(rerun_tests, fork, suggestion["fixes"], failures)
+                for fork, suggestion in zip(forks, suggestions)
+            ])
+            improved = [i for i in range(len(forks)) if self._improves(results[i], baseline, failures, forks[i])]
+            if not improved:
+                return {"fixes": [], "test_results": test_results, "rolled_back": True, "candidates": len(forks)}
+            best = min(improved, key=lambda i: self._failure_count(results[i]))
+            sandbox.adopt(forks[best])
+            logger.info(f"Kept fix candidate {best} of {len(forks)}")
+            return {"fixes": suggestions[best]["fixes"], "test_results": results[best], "candidates": len(forks)}
+        finally:
+            for fork in forks:
+                sandbox.discard_fork(fork)
+    
+    async def _suggest_test_fixes(self, failures: List[Dict], changes_made: Dict) -> Dict[str, Any]:
+        """Ask the LLM for fixes to the failing tests"""
+        if not failures:
             return {"fixes": []}
             
         # Use LLM to suggest fixes
         fix_prompt = f"""
-        The following test failures occurred:
+        The following tests fail (assertion, then the stack frames inside the repository):
         
-        {chr(10).join(failure_info)}
+        {self.failure_extractor.format(failures)}
         
         Files changed: {changes_made['files_changed']}
         Files created: {changes_made['files_created']}
@@ -378,10 +666,28 @@ Dependencies:
         Provide the complete file path relative to the repository root.
         """
         
-        fixes = await self.llm_client.suggest_test_fixes(fix_prompt)
+        return await self.llm_client.suggest_test_fixes(fix_prompt)
+    
+    async def _resolve_fixes(self, sandbox, fixes: List[Dict]) -> List[Dict]:
+        """Turn edit-style fixes into full file content for the current sandbox state"""
+        repo_path = Path(sandbox.sandbox_path) / "repo"
+        
+        async def resolve(fix: Dict) -> Optional[Dict]:
+            full_path = repo_path / fix["file"]
+            original = full_path.read_text() if full_path.exists() else ""
+            try:
+                content = await self.patch_applier.resolve(fix["file"], original, fix, fix.get("reasoning", ""))
+            except Exception as e:
+                logger.warning(f"Failed to resolve fix for {fix['file']}: {e}")
+                return None
+            return {**fix, "content": content} if content is not None else None
         
-        # Apply fixes
-        for fix in fixes.get("fixes", []):
+        resolved = await asyncio.gather(*[resolve(fix) for fix in fixes if fix.get("file")])
+        return [fix for fix in resolved if fix]
+    
+    def _apply_fixes(self, sandbox, fixes: List[Dict], changes_made: Dict) -> None:
+        """Write suggested fixes into the sandbox repo"""
+        for fix in fixes:
             file_path = fix["file"]
             new_content = fix["content"]
             
@@ -399,8 +705,29 @@ Dependencies:
                     logger.error(f"Failed to apply fix to {file_path}: {e}")
             else:
                 logger.warning(f"Skipping fix for non-existent file: {file_path}")
-                
-        return fixes
+    
+    def _improves(self, results: Dict[str, Any], baseline: int, failures: List[Dict], sandbox) -> bool:
+        """True when ``results`` fail fewer tests than ``baseline`` and none that passed before"""
+        if self._failure_count(results) >= baseline:
+            return False
+        after = self.failure_extractor.extract(results, str(Path(sandbox.sandbox_path) / "repo"))
+        regressions = self.failure_extractor.regressions(failures, after)
+        if regressions:
+            logger.warning(f"Fix candidate breaks previously passing tests: {regressions[:5]}")
+            return False
+        return True
+    
+    def _failure_count(self, test_results: Dict[str, Any]) -> int:
+        """Number of failing tests (or failing runs when no summary is available)"""
+        count = 0
+        for result in test_results.values():
+            summary = result.get("summary")
+            failed = summary.get("failures", 0) + summary.get("errors", 0) if summary else 0
+            # A failed run with nothing parsed (e.g. pytest exit 4 on a bad target) still failed
+            if result.get("status") in ("failed", "error"):
+                failed = max(failed, 1)
+            count += failed
+        return count
         
     def _parse_repo_url(self, repo_url: str) -> tuple:
         """Parse GitHub repo URL to get owner and repo"""
@@ -1,70 +1,136 @@
 import asyncio
+import os
+import re
+import time
 from typing import Dict, List, Any,Optional
+from slack_sdk import WebClient
 from core.integrations.github_client import GitHubClient
+from core.integrations.github_batch import GitHubCommentBatch
 from core.integrations.linear_client import LinearClient
 from core.integrations.llm_client import LLMClient
+from core.cache_store import JsonCache
+from core.repo_mirror import RepoMirror
+from core.stage_graph import StageGraph
+from services.developer.chunked_review import ChunkedDiffReviewer
+from services.developer.review_cache import ReviewCache
+from services.developer.diff_prefilter import DiffPrefilter
+from services.developer.diff_index import DiffIndex
 from models.schemas import PRReviewRequest, PRReviewResponse
+from config.settings import settings
+from utils.opik_tracer import trace
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Stand-ins used when a stage fails so the rest of the review can still be delivered
+QUALITY_UNAVAILABLE = {
+    "overall_score": None,
+    "issues": [],
+    "style_violations": [],
+    "complexity_issues": [],
+    "performance_issues": []
+}
+CI_UNAVAILABLE = {"state": "unknown"}
+# "path/to/file.py:42" inside a finding
+FINDING_LOCATION = re.compile(r"([\w./-]+\.\w+):(\d+)")
+MAX_INLINE_COMMENTS = 30
+
 class PRReviewService:
     def __init__(self):
         self.github_client = GitHubClient()
         self.linear_client = LinearClient()
         self.llm_client = LLMClient()
+        self.review_cache = ReviewCache(settings.io_model)
+        self.prefilter = DiffPrefilter()
+        self.chunked_reviewer = ChunkedDiffReviewer(
+            self.llm_client, settings.review_chunk_chars, settings.review_max_workers, self.review_cache
+        )
+        self.review_state = JsonCache("review_state", max_entries=2000)
+        self.repo_mirror = RepoMirror()
         
     async def review_pr(self, request: PRReviewRequest) -> PRReviewResponse:
-        """Comprehensive PR review"""
+        """Comprehensive PR review, within the repo's shared concurrency budget"""
+        owner, repo, _ = self._parse_pr_url(request.pr_url)
+        async with self.github_client.governor.repo_slot(owner, repo):
+            return await self._review_pr(request)
+
+    async def _review_pr(self, request: PRReviewRequest) -> PRReviewResponse:
         logger.info(f"Starting PR review for: {request.pr_url}")
         
         # Parse PR URL to get owner, repo, and PR number
         owner, repo, pr_number = self._parse_pr_url(request.pr_url)
         
-        # Gather PR information
-        pr_details, pr_diff, pr_files, linear_context = await asyncio.gather(
-            self.github_client.get_pr_details(owner, repo, pr_number),
-            self.github_client.get_pr_diff(owner, repo, pr_number),
-            self.github_client.get_pr_files(owner, repo, pr_number),
-            self._get_linear_context(request.linear_issue_id) if request.linear_issue_id else asyncio.sleep(0, result=None)
-        )
-        
-        # Get CI status
-        ci_status = await self.github_client.get_ci_status(
-            owner, repo, pr_details["head"]["sha"]
-        )
-        
-        # Perform code quality analysis
-        quality_analysis = await self._analyze_code_quality(pr_diff, pr_files)
-        
-        # Find potential bugs
-        bugs_found = await self._find_bugs(pr_diff, pr_files)
-        
-        # Check test coverage
-        test_coverage = await self._check_test_coverage(pr_files)
-        
-        # Generate recommendations
-        recommendations = await self._generate_recommendations(
-            pr_details, pr_diff, quality_analysis, bugs_found, linear_context
-        )
+        # A previous review lets us review only the commits pushed since
+        state_key = f"{owner}/{repo}#{pr_number}"
+        state = self.review_state.get(state_key)
+        pr_details = None
+        if state:
+            pr_details = await self.github_client.get_pr_details(owner, repo, pr_number)
+            if pr_details["head"]["sha"] == state["head_sha"]:
+                logger.info(f"No new commits on {request.pr_url} since the last review")
+                return self._unchanged_response(request, state)
 
-        # Build review summary text
-        review_summary = await self._generate_review_summary(
-            pr_details, quality_analysis, bugs_found, ci_status
-        )
+        graph = self._build_review_graph(owner, repo, pr_number, request, pr_details, state)
+        report = await graph.run()
+        results = report["results"]
+        incomplete = {**report["errors"], **{name: "skipped" for name in report["skipped"]}}
+        trace("pr_review.stages", {
+            "pr_url": request.pr_url, "timings": report["timings"], "incomplete": incomplete
+        })
+        if "pr_details" not in results:
+            raise Exception(f"Could not fetch PR details: {incomplete.get('pr_details')}")
+
+        quality_analysis = results.get("quality_analysis", QUALITY_UNAVAILABLE)
+        bugs_found = results.get("bugs", [])
+        test_coverage = results.get("test_coverage", [])
+        recommendations = results.get("recommendations", [])
+        ci_status = results.get("ci_status", CI_UNAVAILABLE)
+        linear_context = results.get("linear_context")
+        review_summary = results.get("review_summary") or "Review summary unavailable."
+        delta = results.get("delta")
+        reconciliation = results.get("reconciliation")
+        prefilter = results.get("prefilter") or {}
+        if prefilter:
+            trace("pr_review.prefilter", {
+                "pr_url": request.pr_url, "excluded": len(prefilter["excluded"]),
+                "excluded_chars": prefilter["excluded_chars"], "static_findings": len(prefilter["findings"])
+            })
+        if prefilter.get("findings"):
+            review_summary += "\n\n### Static Checks\n" + "\n".join(f"- ⚠️ {f}" for f in prefilter["findings"])
+        if prefilter.get("excluded"):
+            review_summary += "\n\n**Not sent to LLM review**: " + ", ".join(prefilter["excluded_summary"][:20])
+            if len(prefilter["excluded"]) > 20:
+                review_summary += f" and {len(prefilter['excluded']) - 20} more"
+        cache_stats = self._cache_stats(results)
+        if cache_stats:
+            review_summary += f"\n\n**Review cache**: {cache_stats['files_cached']}/{cache_stats['files_total']} " \
+                              f"files reused ({cache_stats['hit_ratio']:.0%})"
+        if reconciliation:
+            still_open = reconciliation["still_present"]
+            bugs_found = bugs_found + [f["text"] for f in still_open if f["kind"] == "bug" and f["text"] not in bugs_found]
+            review_summary += self._format_reconciliation(state["head_sha"], results["pr_details"], reconciliation)
+        if incomplete:
+            review_summary += "\n\n**Incomplete stages**: " + ", ".join(
+                f"{name} ({error})" for name, error in incomplete.items()
+            )
 
-        # Post review as a comment to the PR
+        # Post the review, with findings that point at diff lines as inline comments
         try:
+            title = "Incremental PR Review" if delta else "Automated PR Review"
             comment_body = (
-                "## 🔍 Automated PR Review\n\n"
+                f"## 🔍 {title}\n\n"
                 f"{review_summary}\n\n"
                 "### Recommendations\n" + "\n".join(f"- {rec}" for rec in recommendations)
             )
-            await self.github_client.add_pr_comment(owner, repo, pr_number, comment_body)
+            batch = GitHubCommentBatch(self.github_client, owner, repo, pr_number)
+            findings = [f"🐛 {bug}" for bug in bugs_found] + [f"⚠️ {f}" for f in prefilter.get("findings", [])]
+            for path, line, text in self._inline_findings(findings, results.get("diff_index")):
+                batch.add_inline(path, line, text)
+            await batch.submit(review_body=comment_body, commit_id=results["pr_details"]["head"]["sha"])
         except Exception as e:
             logger.warning(f"Failed to add PR comment: {e}")
-        
-        return PRReviewResponse(
+
+        response = PRReviewResponse(
             pr_url=request.pr_url,
             review_summary=review_summary,
             code_quality_score=quality_analysis["overall_score"],
@@ -72,8 +138,280 @@ class PRReviewService:
             test_coverage_issues=test_coverage,
             ci_status=ci_status["state"],
             recommendations=recommendations,
-            linear_context=linear_context
+            linear_context=linear_context,
+            incomplete_stages=incomplete,
+            stage_timings=report["timings"],
+            reviewed_since=state["head_sha"] if delta else None,
+            resolved_findings=[f["text"] for f in reconciliation["resolved"]] if reconciliation else [],
+            cache_stats=cache_stats,
+            static_findings=prefilter.get("findings", []),
+            excluded_files=prefilter.get("excluded", {})
+        )
+        if not results.get("cached_review") and "quality_analysis" not in incomplete and "bugs" not in incomplete:
+            self.review_cache.set_review(results["diff"], {
+                "quality_analysis": results["quality_analysis"],
+                "bugs": results["bugs"],
+                "chunked_review": results.get("chunked_review"),
+            })
+        # Only a review whose analysis completed may become the baseline for the next one
+        if "quality_analysis" not in incomplete and "bugs" not in incomplete:
+            self._save_state(state_key, results, response, reconciliation)
+        return response
+
+    def _build_review_graph(self, owner: str, repo: str, pr_number: int, request: PRReviewRequest,
+                            pr_details: Optional[Dict] = None, state: Optional[Dict] = None) -> StageGraph:
+        """Review stages and their inputs; independent stages run concurrently"""
+        graph = StageGraph(default_timeout=settings.review_stage_timeout)
+        if pr_details:
+            graph.add("pr_details", lambda: asyncio.sleep(0, result=pr_details))
+        else:
+            graph.add("pr_details", lambda: self.github_client.get_pr_details(owner, repo, pr_number))
+
+        if state:
+            # Review only the commits pushed since the last review; fall back to the
+            # whole PR when that diff is unavailable (e.g. after a force push)
+            graph.add("delta", lambda: self._get_delta(owner, repo, state["head_sha"], pr_details["head"]["sha"]),
+                      fallback=None)
+            graph.add("raw_diff", lambda delta, pr_details: asyncio.sleep(0, result=delta["diff"]) if delta
+                      else self._get_pr_diff(owner, repo, pr_number, pr_details), deps=["delta", "pr_details"])
+            graph.add("raw_files", lambda delta: asyncio.sleep(0, result=delta["files"]) if delta
+                      else self.github_client.get_pr_files(owner, repo, pr_number), deps=["delta"])
+            graph.add("reconciliation", lambda delta: self._reconcile_findings(state, delta), deps=["delta"],
+                      fallback={"resolved": [], "still_present": state["findings"]})
+        else:
+            graph.add("raw_diff", lambda pr_details: self._get_pr_diff(owner, repo, pr_number, pr_details),
+                      deps=["pr_details"])
+            graph.add("raw_files", lambda: self.github_client.get_pr_files(owner, repo, pr_number))
+
+        # Parsed once; every later stage reads files, hunks and line numbers from the index
+        graph.add("diff_index", lambda raw_diff: asyncio.to_thread(DiffIndex, raw_diff), deps=["raw_diff"])
+
+        # Lockfiles, vendored and generated files never reach the LLM stages
+        graph.add("gitattributes", lambda pr_details: self._get_gitattributes(owner, repo, pr_details),
+                  deps=["pr_details"], fallback="")
+        graph.add("prefilter", lambda diff_index, raw_files, gitattributes: asyncio.to_thread(
+                      self.prefilter.filter, diff_index, raw_files, gitattributes),
+                  deps=["diff_index", "raw_files", "gitattributes"], fallback=None)
+        graph.add("review_index", lambda diff_index, prefilter: asyncio.sleep(
+                      0, result=prefilter["index"] if prefilter else diff_index),
+                  deps=["diff_index", "prefilter"])
+        graph.add("diff", lambda review_index: asyncio.sleep(0, result=review_index.text), deps=["review_index"])
+        graph.add("files", lambda raw_files, prefilter: asyncio.sleep(0, result=prefilter["files"] if prefilter else raw_files),
+                  deps=["raw_files", "prefilter"])
+        graph.add("linear_context", lambda: self._get_linear_context(request.linear_issue_id), fallback=None)
+        graph.add("ci_status",
+                  lambda pr_details: self.github_client.get_ci_status(owner, repo, pr_details["head"]["sha"]),
+                  deps=["pr_details"], fallback=CI_UNAVAILABLE)
+        graph.add("cached_review", lambda diff: asyncio.sleep(0, result=self.review_cache.get_review(diff)),
+                  deps=["diff"], fallback=None)
+        graph.add("chunked_review",
+                  lambda review_index, cached_review: self._chunked_review(review_index, request, cached_review),
+                  deps=["review_index", "cached_review"], timeout=settings.review_large_diff_timeout, fallback=None)
+        graph.add("quality_analysis", self._quality_stage, deps=["diff", "files", "chunked_review", "cached_review"],
+                  fallback=QUALITY_UNAVAILABLE)
+        graph.add("bugs", self._bugs_stage, deps=["diff", "files", "chunked_review", "cached_review"], fallback=[])
+        graph.add("test_coverage", self._check_test_coverage, deps=["files"])
+        graph.add("recommendations", self._generate_recommendations,
+                  deps=["pr_details", "diff", "quality_analysis", "bugs", "linear_context"])
+        graph.add("review_summary", self._generate_review_summary,
+                  deps=["pr_details", "quality_analysis", "bugs", "ci_status", "chunked_review"])
+        return graph
+
+    async def _get_pr_diff(self, owner: str, repo: str, pr_number: int, pr_details: Dict) -> str:
+        """PR diff computed from the local mirror, or from the API when that fails or is slow"""
+        if settings.local_diff_enabled:
+            try:
+                # Well inside the stage timeout so the API still has time; a first fetch of a
+                # large repo keeps running in its thread and warms the mirror for next time
+                return await asyncio.wait_for(asyncio.to_thread(
+                    self.repo_mirror.pr_diff, owner, repo, pr_number,
+                    pr_details["base"]["ref"], pr_details["base"]["repo"]["clone_url"]
+                ), settings.local_diff_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Local diff for {owner}/{repo}#{pr_number} took over "
+                               f"{settings.local_diff_timeout}s, using the API")
+            except Exception as e:
+                logger.warning(f"Local diff for {owner}/{repo}#{pr_number} failed, using the API: {e}")
+        return await self.github_client.get_pr_diff(owner, repo, pr_number)
+
+    async def _get_gitattributes(self, owner: str, repo: str, pr_details: Dict) -> str:
+        try:
+            return await self.github_client.get_file_content(owner, repo, ".gitattributes", ref=pr_details["head"]["sha"])
+        except Exception:
+            return ""
+
+    async def _get_delta(self, owner: str, repo: str, base_sha: str, head_sha: str) -> Optional[Dict[str, Any]]:
+        """Diff and files changed between the last reviewed head and the new one"""
+        comparison = await self.github_client.compare_commits(owner, repo, base_sha, head_sha)
+        if comparison.get("status") != "ahead":
+            logger.info(f"Last reviewed commit {base_sha[:7]} is not an ancestor of {head_sha[:7]} "
+                        f"({comparison.get('status')}), reviewing the whole PR")
+            return None
+        diff = await self.github_client.get_compare_diff(owner, repo, base_sha, head_sha)
+        return {"diff": diff, "files": comparison.get("files", [])}
+
+    async def _reconcile_findings(self, state: Dict[str, Any],
+                                  delta: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Split earlier findings into resolved and still present given the new commits"""
+        if not delta:
+            return None
+
+        touched = {f["filename"] for f in delta["files"]}
+        # Findings anchored only to untouched files cannot have changed
+        candidates = [f for f in state["findings"] if not f["files"] or set(f["files"]) & touched]
+        untouched = [f for f in state["findings"] if f not in candidates]
+        if not candidates:
+            return {"resolved": [], "still_present": untouched}
+
+        numbered = "\n".join(f"{i}. {f['text']}" for i, f in enumerate(candidates))
+        prompt = (
+            f"Earlier findings:\n{numbered}\n\n"
+            f"Diff of the commits pushed since that review:\n{delta['diff'][:settings.review_large_diff_chars]}"
         )
+        result = await self.llm_client.reconcile_review_findings(prompt)
+        resolved = {i for i in result.get("resolved", []) if isinstance(i, int)}
+        return {
+            "resolved": [f for i, f in enumerate(candidates) if i in resolved],
+            "still_present": untouched + [f for i, f in enumerate(candidates) if i not in resolved],
+        }
+
+    def _format_reconciliation(self, base_sha: str, pr_details: Dict, reconciliation: Dict[str, Any]) -> str:
+        section = f"\n\n### Since last review ({base_sha[:7]}..{pr_details['head']['sha'][:7]})\n"
+        if reconciliation["resolved"]:
+            section += "**Resolved**:\n" + "\n".join(f"- ✅ {f['text']}" for f in reconciliation["resolved"]) + "\n"
+        if reconciliation["still_present"]:
+            section += "**Still open**:\n" + "\n".join(f"- {f['text']}" for f in reconciliation["still_present"]) + "\n"
+        if not reconciliation["resolved"] and not reconciliation["still_present"]:
+            section += "No earlier findings.\n"
+        return section
+
+    def _save_state(self, state_key: str, results: Dict[str, Any], response: PRReviewResponse,
+                    reconciliation: Optional[Dict[str, Any]]) -> None:
+        """Record the reviewed head and open findings, anchored to the files they mention"""
+        previous = self.review_state.get(state_key) or {}
+        paths = sorted({f["filename"] for f in results.get("files", [])} | set(previous.get("paths", [])))
+        new_findings = [{"kind": "bug", "text": text} for text in results.get("bugs", [])]
+        new_findings += [{"kind": "issue", "text": text}
+                         for text in results.get("quality_analysis", QUALITY_UNAVAILABLE)["issues"]]
+        findings = [{**f, "files": self._anchor(f["text"], paths)} for f in new_findings]
+        if reconciliation:
+            seen = {f["text"] for f in findings}
+            findings += [f for f in reconciliation["still_present"] if f["text"] not in seen]
+
+        self.review_state.set(state_key, {
+            "head_sha": results["pr_details"]["head"]["sha"],
+            "reviewed_at": time.time(),
+            "findings": findings,
+            "paths": paths,
+            "response": response.dict(),
+        })
+
+    def _anchor(self, text: str, paths: List[str]) -> List[str]:
+        return [p for p in paths if p in text or f" {os.path.basename(p)}" in f" {text}"]
+
+    def _inline_findings(self, findings: List[str], index: Optional[DiffIndex]) -> List[tuple]:
+        """(path, line, text) for findings naming a line GitHub can comment on"""
+        if index is None:
+            return []
+        inline = []
+        for text in findings:
+            for path, line in FINDING_LOCATION.findall(text):
+                if index.commentable(path, int(line)):
+                    inline.append((path, int(line), text))
+                    break
+        return inline[:MAX_INLINE_COMMENTS]
+
+    def _unchanged_response(self, request: PRReviewRequest, state: Dict[str, Any]) -> PRReviewResponse:
+        previous = state["response"]
+        previous.update({
+            "pr_url": request.pr_url,
+            "review_summary": f"No new commits since the last review ({state['head_sha'][:7]}).\n\n"
+                              f"{previous['review_summary']}",
+            "reviewed_since": state["head_sha"],
+            "resolved_findings": [],
+            "stage_timings": {},
+        })
+        return PRReviewResponse(**previous)
+
+    async def _chunked_review(self, index: DiffIndex, request: PRReviewRequest,
+                              cached_review: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Map-reduce review for diffs too large for one prompt; None for regular diffs.
+
+        Diffs touching many files, or some files reviewed before, also take this
+        path: findings are cached per file patch, so only files not seen yet are
+        sent to the LLM.
+        """
+        if cached_review:
+            return cached_review.get("chunked_review")
+        if len(index.text) <= settings.review_large_diff_chars and not self._reuses_file_reviews(index):
+            return None
+        return await self.chunked_reviewer.review(
+            index, progress=lambda done, total: self._report_progress(request, done, total)
+        )
+
+    def _reuses_file_reviews(self, index: DiffIndex) -> bool:
+        if len(index) >= settings.review_chunked_min_files:
+            return True
+        return len(index) > 1 and any(self.review_cache.get_file_review(patch) for _, patch in index.sections())
+
+    def _cache_stats(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        """How much of this review was served from cache"""
+        if "review_index" not in results:
+            return {}
+        files_total = len(results["review_index"])
+        chunked_review = results.get("chunked_review")
+        if results.get("cached_review"):
+            files_cached = files_total
+        elif chunked_review:
+            files_cached = chunked_review["files_cached"]
+        else:
+            files_cached = 0
+        return {
+            "review_hit": bool(results.get("cached_review")),
+            "files_total": files_total,
+            "files_cached": files_cached,
+            "hit_ratio": round(files_cached / files_total, 3) if files_total else 0.0,
+        }
+
+    async def _quality_stage(self, diff: str, files: List[Dict], chunked_review: Optional[Dict[str, Any]],
+                             cached_review: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if cached_review:
+            return cached_review["quality_analysis"]
+        if not diff.strip():
+            return QUALITY_UNAVAILABLE
+        if chunked_review:
+            return chunked_review["quality_analysis"]
+        if len(diff) > settings.review_large_diff_chars:
+            raise Exception("Chunked review of the large diff did not complete")
+        return await self._analyze_code_quality(diff, files)
+
+    async def _bugs_stage(self, diff: str, files: List[Dict], chunked_review: Optional[Dict[str, Any]],
+                          cached_review: Optional[Dict[str, Any]]) -> List[str]:
+        if cached_review:
+            return cached_review["bugs"]
+        if not diff.strip():
+            return []
+        if chunked_review:
+            return chunked_review["bugs"]
+        if len(diff) > settings.review_large_diff_chars:
+            raise Exception("Chunked review of the large diff did not complete")
+        return await self._find_bugs(diff, files)
+
+    async def _report_progress(self, request: PRReviewRequest, done: int, total: int) -> None:
+        """Post chunked review progress to the Slack thread at roughly 25% steps"""
+        step = max(1, total // 4)
+        if not (request.channel_id and request.thread_id) or (done % step and done != total):
+            return
+        if done == 0:
+            text = f"📦 Large PR: reviewing the diff in {total} chunks with {settings.review_max_workers} workers"
+        else:
+            text = f"⏳ Reviewed {done}/{total} chunks"
+        try:
+            client = WebClient(token=settings.slack_bot_token)
+            await asyncio.to_thread(client.chat_postMessage, channel=request.channel_id,
+                                    text=text, thread_ts=request.thread_id)
+        except Exception as e:
+            logger.warning(f"Failed to post review progress to Slack: {e}")
         
     def _parse_pr_url(self, pr_url: str) -> tuple:
         """Parse GitHub PR URL to extract owner, repo, and PR number"""
@@ -158,7 +496,7 @@ class PRReviewService:
         recommendations = []
         
         # Code quality recommendations
-        if quality_analysis["overall_score"] < 7:
+        if quality_analysis["overall_score"] is not None and quality_analysis["overall_score"] < 7:
             recommendations.append("Consider refactoring to improve code quality")
             
         # Bug fix recommendations
@@ -172,7 +510,8 @@ class PRReviewService:
         return recommendations
         
     async def _generate_review_summary(self, pr_details: Dict, quality_analysis: Dict,
-                                     bugs: List[str], ci_status: Dict) -> str:
+                                     bugs: List[str], ci_status: Dict,
+                                     chunked_review: Optional[Dict[str, Any]] = None) -> str:
         """Generate comprehensive review summary"""
         summary = f"""
         ## PR Review Summary
@@ -181,7 +520,7 @@ class PRReviewService:
         **Author**: {pr_details['user']['login']}
         **Changes**: {pr_details['additions']} additions, {pr_details['deletions']} deletions
         
-        **Code Quality Score**: {quality_analysis['overall_score']}/10
+        **Code Quality Score**: {quality_analysis['overall_score'] if quality_analysis['overall_score'] is not None else 'n/a'}/10
         **Bugs Found**: {len(bugs)}
         **CI Status**: {ci_status['state']}
         
@@ -193,5 +532,11 @@ class PRReviewService:
         - Ensure adequate test coverage
         - Consider code style improvements
         """
-        
+
+        if chunked_review:
+            summary += f"\n**Large PR**: reviewed in {chunked_review['chunks']} chunks\n"
+            if chunked_review["summary"]:
+                summary += f"\n{chunked_review['summary']}\n"
+            if chunked_review["failed_files"]:
+                summary += f"\n**Not reviewed** (chunk failed): {', '.join(chunked_review['failed_files'][:20])}\n"
         return summary
\ No newline at end of file
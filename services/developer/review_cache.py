@@ -0,0 +1,45 @@
+"""Review results cached by normalized diff content."""
+
+import hashlib
+import re
+from typing import Dict, List, Any, Optional
+import logging
+
+from core.cache_store import JsonCache
+
+logger = logging.getLogger(__name__)
+
+HUNK_OFFSETS = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@", re.MULTILINE)
+INDEX_LINE = re.compile(r"^index [0-9a-f]+\.\.[0-9a-f]+.*\n", re.MULTILINE)
+
+
+class ReviewCache:
+    """Caches review findings by a fingerprint that ignores where a diff applies.
+
+    Rebased, reopened and cherry-picked PRs produce the same diff apart from
+    ``index`` lines and hunk offsets, so both are dropped before hashing. Whole
+    diffs map to the diff-dependent review results and single file patches map
+    to that file's findings. Keys include the model, so switching models never
+    serves stale reviews.
+    """
+
+    def __init__(self, model: str, cache_path: Optional[str] = None):
+        self.model = model
+        self.reviews = JsonCache("review_results", cache_path, max_entries=2000)
+        self.files = JsonCache("review_file_findings", cache_path, max_entries=20000)
+
+    def fingerprint(self, diff: str) -> str:
+        normalized = HUNK_OFFSETS.sub("@@", INDEX_LINE.sub("", diff))
+        return hashlib.sha256(f"{self.model}\0{normalized}".encode()).hexdigest()
+
+    def get_review(self, diff: str) -> Optional[Dict[str, Any]]:
+        return self.reviews.get(self.fingerprint(diff))
+
+    def set_review(self, diff: str, review: Dict[str, Any]) -> None:
+        self.reviews.set(self.fingerprint(diff), review)
+
+    def get_file_review(self, file_patch: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(self.fingerprint(file_patch))
+
+    def set_file_review(self, file_patch: str, score: Optional[float], findings: List[Dict[str, Any]]) -> None:
+        self.files.set(self.fingerprint(file_patch), {"score": score, "findings": findings})
@@ -0,0 +1,384 @@
+"""Symbol index: definitions, references and imports for the code in a repository."""
+
+import ast
+import hashlib
+import os
+import re
+import sqlite3
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE_BY_EXTENSION = {
+    '.py': 'python', '.pyi': 'python',
+    '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript',
+    '.go': 'go',
+    '.rs': 'rust',
+}
+
+# ctags-style definition patterns: (kind, regex with the name in group 1)
+DEFINITION_PATTERNS = {
+    'javascript': [
+        ('function', re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)')),
+        ('class', re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)')),
+        ('function', re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)')),
+        ('method', re.compile(r'^\s+(?:static\s+)?(?:async\s+)?([A-Za-z_$][\w$]*)\s*\([^)]*\)\s*\{')),
+    ],
+    'typescript': [
+        ('type', re.compile(r'^\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+([A-Za-z_$][\w$]*)')),
+    ],
+    'go': [
+        ('function', re.compile(r'^func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)')),
+        ('type', re.compile(r'^type\s+([A-Za-z_]\w*)')),
+    ],
+    'rust': [
+        ('function', re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+([A-Za-z_]\w*)')),
+        ('type', re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|type|union)\s+([A-Za-z_]\w*)')),
+        ('module', re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+([A-Za-z_]\w*)')),
+    ],
+}
+DEFINITION_PATTERNS['typescript'] = DEFINITION_PATTERNS['javascript'] + DEFINITION_PATTERNS['typescript']
+
+IMPORT_PATTERNS = {
+    'javascript': [re.compile(r'''(?:from|import)\s+['"]([^'"]+)['"]'''), re.compile(r'''require\(\s*['"]([^'"]+)['"]\s*\)''')],
+    'go': [re.compile(r'^\s*(?:import\s+)?(?:[\w.]+\s+)?"([^"]+)"\s*$')],
+    'rust': [re.compile(r'^\s*(?:pub\s+)?use\s+([\w:]+)')],
+}
+IMPORT_PATTERNS['typescript'] = IMPORT_PATTERNS['javascript']
+
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')
+KEYWORDS = {
+    'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'else', 'new', 'typeof',
+    'const', 'let', 'var', 'class', 'import', 'export', 'from', 'async', 'await', 'def',
+    'self', 'None', 'True', 'False', 'and', 'not', 'the', 'this', 'true', 'false', 'null',
+    'func', 'type', 'struct', 'impl', 'pub', 'use', 'mod', 'package', 'string', 'int',
+}
+# Regex definitions have no end marker; a definition runs until the next one, capped
+MAX_DEFINITION_LINES = 80
+CHARS_PER_TOKEN = 4
+BLOB_TTL_SECONDS = 30 * 24 * 3600
+MAX_INDEXED_FILE_BYTES = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, language TEXT, seen REAL);
+CREATE TABLE IF NOT EXISTS definitions (sha TEXT, name TEXT, kind TEXT, parent TEXT, line INTEGER, end_line INTEGER);
+CREATE TABLE IF NOT EXISTS refs (sha TEXT, name TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS imports (sha TEXT, module TEXT);
+CREATE INDEX IF NOT EXISTS definitions_name ON definitions (name);
+CREATE INDEX IF NOT EXISTS definitions_sha ON definitions (sha);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+CREATE INDEX IF NOT EXISTS refs_sha ON refs (sha);
+CREATE INDEX IF NOT EXISTS imports_sha ON imports (sha);
+"""
+
+
+class SymbolIndex:
+    """Content-addressed symbol index stored in SQLite.
+
+    Parsed symbols are keyed by git blob SHA, so any commit of any repo reuses
+    every file it shares with a previously indexed tree; ``update`` only parses
+    blobs that are new. Queries are answered for one repo's current tree.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        from config.settings import settings
+
+        self.db_path = Path(db_path or Path(settings.cache_path) / "symbols.sqlite")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # repo_path -> {relative path: blob sha} for the last update
+        self._trees: Dict[str, Dict[str, str]] = {}
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def update(self, repo_path: str) -> Dict[str, str]:
+        """Index any files in the working tree whose content hasn't been seen before"""
+        started = time.monotonic()
+        tree = self.working_tree(repo_path)
+
+        with self._connect() as conn:
+            known = set()
+            shas = list(set(tree.values()))
+            for i in range(0, len(shas), 500):
+                batch = shas[i:i + 500]
+                rows = conn.execute(f"SELECT sha FROM blobs WHERE sha IN ({','.join('?' * len(batch))})", batch)
+                known.update(row[0] for row in rows)
+
+            new_files = {sha: path for path, sha in tree.items() if sha not in known}
+            for sha, path in new_files.items():
+                self._index_file(conn, repo_path, path, sha)
+
+            now = time.time()
+            conn.executemany("UPDATE blobs SET seen = ? WHERE sha = ?", [(now, sha) for sha in known])
+            self._prune(conn, now)
+
+        self._trees[repo_path] = tree
+        logger.info(f"Symbol index: {len(tree)} files, {len(new_files)} parsed "
+                    f"in {time.monotonic() - started:.2f}s")
+        return tree
+
+    def definitions(self, repo_path: str, name: str) -> List[Dict[str, Any]]:
+        """Where ``name`` is defined in the repo"""
+        paths_by_sha = self._paths_by_sha(repo_path)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT sha, name, kind, parent, line, end_line FROM definitions WHERE name = ?", (name,)
+            ).fetchall()
+        return [
+            {"path": path, "name": row[1], "kind": row[2], "parent": row[3], "line": row[4], "end_line": row[5]}
+            for row in rows for path in paths_by_sha.get(row[0], [])
+        ]
+
+    def references(self, repo_path: str, name: str) -> List[str]:
+        """Files that use ``name``"""
+        paths_by_sha = self._paths_by_sha(repo_path)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT sha FROM refs WHERE name = ?", (name,)).fetchall()
+        return sorted(path for (sha,) in rows for path in paths_by_sha.get(sha, []))
+
+    def files_for(self, repo_path: str, name: str) -> List[str]:
+        """Files defining or using ``name``"""
+        return sorted({d["path"] for d in self.definitions(repo_path, name)} | set(self.references(repo_path, name)))
+
+    def importers(self, repo_path: str, module: str) -> List[str]:
+        """Files importing ``module`` (or one of its submodules)"""
+        paths_by_sha = self._paths_by_sha(repo_path)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT sha FROM imports WHERE module = ? OR module LIKE ?", (module, f"{module}.%")
+            ).fetchall()
+        return sorted(path for (sha,) in rows for path in paths_by_sha.get(sha, []))
+
+    def context_for(self, repo_path: str, text: str, max_tokens: int = 2000) -> str:
+        """Source of the definitions named in ``text``, within a token budget"""
+        # Cheap when nothing changed: only new blobs get parsed
+        self.update(repo_path)
+
+        # Backticked names first, then identifiers in the order they are mentioned
+        names = re.findall(r'`([^`\s]+)`', text) + IDENTIFIER.findall(text)
+        candidates = list(dict.fromkeys(
+            part for name in names for part in [name] + name.split('.')[-1:] if part not in KEYWORDS
+        ))
+
+        budget = max_tokens * CHARS_PER_TOKEN
+        sections = []
+        included: Dict[str, List[Tuple[int, int]]] = {}
+        for name in candidates:
+            for definition in self.definitions(repo_path, name)[:3]:
+                # Skip definitions overlapping source that is already included
+                ranges = included.setdefault(definition["path"], [])
+                if any(start <= definition["end_line"] and definition["line"] <= end for start, end in ranges):
+                    continue
+                snippet = self._snippet(repo_path, definition)
+                used_in = [p for p in self.references(repo_path, name) if p != definition["path"]][:5]
+                section = f"--- {definition['path']}:{definition['line']} ({definition['kind']} {name}) ---\n{snippet}"
+                if used_in:
+                    section += f"\nUsed in: {', '.join(used_in)}"
+                if len(section) > budget:
+                    continue
+                sections.append(section)
+                ranges.append((definition["line"], definition["end_line"]))
+                budget -= len(section)
+        return "\n\n".join(sections)
+
+    # Working tree
+
+    def working_tree(self, repo_path: str) -> Dict[str, str]:
+        """Map indexable files in the working tree to their git blob SHAs"""
+        output = self._git(repo_path, "ls-files", "-s", "-z")
+        if output is None:
+            return self._hash_tree(repo_path)
+
+        tree = {}
+        for entry in output.split("\0"):
+            if "\t" not in entry:
+                continue
+            meta, path = entry.split("\t", 1)
+            mode, sha = meta.split()[:2]
+            if mode != "160000" and self._language(path):
+                tree[path] = sha
+
+        # Modified and untracked files differ from the index; hash their current content
+        dirty = (self._git(repo_path, "diff", "--name-only", "-z") or "").split("\0")
+        dirty += (self._git(repo_path, "ls-files", "-o", "--exclude-standard", "-z") or "").split("\0")
+        for path in dirty:
+            if not path or not self._language(path):
+                continue
+            full_path = Path(repo_path) / path
+            if full_path.is_file():
+                tree[path] = self._blob_sha(full_path.read_bytes())
+            else:
+                tree.pop(path, None)
+        return tree
+
+    def _hash_tree(self, repo_path: str) -> Dict[str, str]:
+        tree = {}
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in {'node_modules', '__pycache__', 'venv'}]
+            for name in files:
+                if self._language(name):
+                    full_path = os.path.join(root, name)
+                    with open(full_path, "rb") as f:
+                        tree[os.path.relpath(full_path, repo_path)] = self._blob_sha(f.read())
+        return tree
+
+    def _paths_by_sha(self, repo_path: str) -> Dict[str, List[str]]:
+        tree = self._trees.get(repo_path) or self.update(repo_path)
+        paths: Dict[str, List[str]] = {}
+        for path, sha in tree.items():
+            paths.setdefault(sha, []).append(path)
+        return paths
+
+    def _snippet(self, repo_path: str, definition: Dict[str, Any]) -> str:
+        try:
+            with open(Path(repo_path) / definition["path"], encoding="utf-8", errors="ignore") as f:
+                lines = f.readlines()
+        except OSError:
+            return ""
+        return "".join(lines[definition["line"] - 1:definition["end_line"]]).rstrip()
+
+    # Parsing
+
+    def outline(self, source: str, path: str) -> List[Dict[str, Any]]:
+        """Definitions in ``source`` (as if it lived at ``path``), in file order"""
+        language = self._language(path)
+        if language == "python":
+            definitions, _, _ = self._parse_python(source, path)
+        else:
+            definitions, _, _ = self._parse_regex(source, language)
+        return sorted(
+            ({"name": d[0], "kind": d[1], "parent": d[2], "line": d[3], "end_line": d[4]} for d in definitions),
+            key=lambda d: d["line"]
+        )
+
+    def _index_file(self, conn: sqlite3.Connection, repo_path: str, path: str, sha: str) -> None:
+        language = self._language(path)
+        full_path = Path(repo_path) / path
+        try:
+            if full_path.stat().st_size > MAX_INDEXED_FILE_BYTES:
+                source = ""
+            else:
+                source = full_path.read_text(encoding="utf-8", errors="ignore")
+        except OSError as e:
+            logger.debug(f"Could not read {path}: {e}")
+            return
+
+        if language == "python":
+            definitions, refs, imports = self._parse_python(source, path)
+        else:
+            definitions, refs, imports = self._parse_regex(source, language)
+
+        conn.execute("INSERT OR REPLACE INTO blobs (sha, language, seen) VALUES (?, ?, ?)", (sha, language, time.time()))
+        conn.execute("DELETE FROM definitions WHERE sha = ?", (sha,))
+        conn.execute("DELETE FROM refs WHERE sha = ?", (sha,))
+        conn.execute("DELETE FROM imports WHERE sha = ?", (sha,))
+        conn.executemany("INSERT INTO definitions VALUES (?, ?, ?, ?, ?, ?)", [(sha, *d) for d in definitions])
+        conn.executemany("INSERT INTO refs VALUES (?, ?, ?)", [(sha, name, line) for name, line in refs.items()])
+        conn.executemany("INSERT INTO imports VALUES (?, ?)", [(sha, module) for module in imports])
+
+    def _parse_python(self, source: str, path: str) -> Tuple[List[tuple], Dict[str, int], Set[str]]:
+        try:
+            tree = ast.parse(source, filename=path)
+        except (SyntaxError, ValueError):
+            return self._parse_regex(source, None)
+
+        definitions = []
+        refs: Dict[str, int] = {}
+        imports: Set[str] = set()
+
+        def visit(node, parent):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    kind = "class" if isinstance(child, ast.ClassDef) else ("method" if parent else "function")
+                    start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                    definitions.append((child.name, kind, parent, start, child.end_lineno or child.lineno))
+                    visit(child, f"{parent}.{child.name}" if parent else child.name)
+                    continue
+                if parent is None and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                    targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                    for target in targets:
+                        if isinstance(target, ast.Name):
+                            definitions.append((target.id, "variable", None, child.lineno,
+                                                child.end_lineno or child.lineno))
+                if isinstance(child, ast.Name):
+                    refs.setdefault(child.id, child.lineno)
+                elif isinstance(child, ast.Attribute):
+                    refs.setdefault(child.attr, child.lineno)
+                elif isinstance(child, ast.Import):
+                    imports.update(alias.name for alias in child.names)
+                elif isinstance(child, ast.ImportFrom):
+                    module = "." * child.level + (child.module or "")
+                    imports.add(module)
+                    for alias in child.names:
+                        refs.setdefault(alias.name, child.lineno)
+                visit(child, parent)
+
+        try:
+            visit(tree, None)
+        except RecursionError:
+            logger.debug(f"{path} is nested too deeply to index")
+            return [], {}, set()
+        return definitions, refs, imports
+
+    def _parse_regex(self, source: str, language: Optional[str]) -> Tuple[List[tuple], Dict[str, int], Set[str]]:
+        lines = source.splitlines()
+        found = []
+        imports: Set[str] = set()
+        refs: Dict[str, int] = {}
+
+        for number, line in enumerate(lines, 1):
+            for kind, pattern in DEFINITION_PATTERNS.get(language, []):
+                match = pattern.match(line)
+                if match and match.group(1) not in KEYWORDS:
+                    found.append((match.group(1), kind, number))
+                    break
+            for pattern in IMPORT_PATTERNS.get(language, []):
+                imports.update(pattern.findall(line))
+            for name in IDENTIFIER.findall(line):
+                if name not in KEYWORDS:
+                    refs.setdefault(name, number)
+
+        definitions = []
+        for i, (name, kind, line) in enumerate(found):
+            next_line = found[i + 1][2] - 1 if i + 1 < len(found) else len(lines)
+            definitions.append((name, kind, None, line, min(next_line, line + MAX_DEFINITION_LINES)))
+        return definitions, refs, imports
+
+    # Storage
+
+    @contextmanager
+    def _connect(self):
+        """Connection committed on success and always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop blobs no indexed tree has contained for a while"""
+        stale = [row[0] for row in conn.execute("SELECT sha FROM blobs WHERE seen < ?", (now - BLOB_TTL_SECONDS,))]
+        for table in ("definitions", "refs", "imports", "blobs"):
+            conn.executemany(f"DELETE FROM {table} WHERE sha = ?", [(sha,) for sha in stale])
+
+    def _language(self, path: str) -> Optional[str]:
+        return LANGUAGE_BY_EXTENSION.get(Path(path).suffix.lower())
+
+    def _blob_sha(self, content: bytes) -> str:
+        """Same SHA git assigns to a blob with this content"""
+        return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+    def _git(self, repo_path: str, *args: str) -> Optional[str]:
+        try:
+            result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
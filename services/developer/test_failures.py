@@ -0,0 +1,140 @@
+"""Structured test failures for fix prompts and targeted re-runs."""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+PYTHON_FRAME = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+), in (?P<func>\S+)')
+# pytest --tb=short/long frames: "tests/test_api.py:42: in test_create" or "src/api.py:10: KeyError"
+PYTEST_FRAME = re.compile(r"^(?P<file>[^\s:]+\.py):(?P<line>\d+): (?:in (?P<func>\S+))?", re.MULTILINE)
+JS_FRAME = re.compile(r"at (?:(?P<func>[^\s(]+) \()?(?P<file>[^\s()]+\.[cm]?[jt]sx?):(?P<line>\d+):\d+\)?")
+EXTERNAL_DIRS = {'site-packages', 'dist-packages', 'node_modules', '.venv', 'venv'}
+MAX_FRAMES = 6
+MAX_ASSERTION_LINES = 8
+MAX_FAILURES_IN_PROMPT = 10
+
+
+class TestFailureExtractor:
+    """Reduces runner output to the failing tests, their assertion and repo-only frames.
+
+    Uses the per-test ``failed_tests`` the sharded executor parses from JUnit and
+    jest reports; runs without them become one failure built from the output
+    tail. Frames in the standard library, virtualenvs and ``node_modules`` are
+    dropped, and each remaining frame carries its source line.
+    """
+
+    def extract(self, test_results: Dict[str, Any], repo_path: str) -> List[Dict[str, Any]]:
+        failures = []
+        for command, result in test_results.items():
+            if result.get("status") not in ("failed", "error"):
+                continue
+            runner = result.get("runner", "")
+            failed_tests = result.get("failed_tests") or []
+            if not failed_tests:
+                output = result.get("output", "")
+                failures.append({
+                    "id": command, "runner": runner, "status": result["status"], "run_level": True,
+                    "assertion": self._assertion("", output, tail=True),
+                    "frames": self._frames(output, repo_path),
+                })
+                continue
+            for test in failed_tests:
+                details = test.get("details", "")
+                failures.append({
+                    "id": test["id"], "runner": runner, "status": test.get("status", "failure"),
+                    "assertion": self._assertion(test.get("message", ""), details),
+                    "frames": self._frames(details, repo_path),
+                })
+        return failures
+
+    def regressions(self, before: List[Dict[str, Any]], after: List[Dict[str, Any]]) -> List[str]:
+        """Ids failing in ``after`` but not in ``before``.
+
+        Empty when ``before`` has a run without per-test results, since its
+        failing tests are unknown.
+        """
+        if any(f.get("run_level") for f in before):
+            return []
+        known = {f["id"] for f in before}
+        return sorted({f["id"] for f in after} - known)
+
+    def rerun_targets(self, failures: List[Dict[str, Any]], repo_path: str) -> Optional[List[str]]:
+        """Targets that re-run just these tests, or None when any of them can't be selected.
+
+        Only ids naming an existing test file qualify; collection errors report a
+        dotted module name (and runs without per-test results the command), which
+        the runner would reject as a missing path.
+        """
+        targets = []
+        for failure in failures:
+            if failure["runner"] not in ("pytest", "jest"):
+                return None
+            path, separator, _ = failure["id"].partition("::")
+            if not separator or not (Path(repo_path) / path).is_file():
+                return None
+            targets.append(failure["id"] if failure["runner"] == "pytest" else path)
+        return sorted(set(targets)) or None
+
+    def format(self, failures: List[Dict[str, Any]]) -> str:
+        lines = []
+        for i, failure in enumerate(failures[:MAX_FAILURES_IN_PROMPT], 1):
+            lines.append(f"{i}. {failure['id']} ({failure['status']})")
+            lines.extend(f"   {line}" for line in failure["assertion"].splitlines())
+            for frame in failure["frames"]:
+                where = f"{frame['file']}:{frame['line']}" + (f" in {frame['func']}" if frame["func"] else "")
+                lines.append(f"   at {where}: {frame['code']}" if frame["code"] else f"   at {where}")
+        if len(failures) > MAX_FAILURES_IN_PROMPT:
+            lines.append(f"... and {len(failures) - MAX_FAILURES_IN_PROMPT} more failing tests")
+        return "\n".join(lines)
+
+    def _assertion(self, message: str, details: str, tail: bool = False) -> str:
+        # pytest prints the failing assertion and its introspection on "E " lines
+        error_lines = [line[1:].strip() for line in details.splitlines() if line.startswith("E ")]
+        if error_lines:
+            return "\n".join(error_lines[:MAX_ASSERTION_LINES])
+        if message:
+            return message.strip()[:500]
+        lines = [line for line in details.splitlines() if line.strip()]
+        return "\n".join(lines[-MAX_ASSERTION_LINES:] if tail else lines[:MAX_ASSERTION_LINES])
+
+    def _frames(self, text: str, repo_path: str) -> List[Dict[str, Any]]:
+        frames = []
+        for pattern in (PYTHON_FRAME, PYTEST_FRAME, JS_FRAME):
+            for match in pattern.finditer(text):
+                path = self._repo_relative(match.group("file"), repo_path)
+                if not path:
+                    continue
+                frame = {"file": path, "line": int(match.group("line")), "func": match.group("func") or ""}
+                if not frames or (frames[-1]["file"], frames[-1]["line"]) != (frame["file"], frame["line"]):
+                    frames.append(frame)
+            if frames:
+                break
+        # The frames nearest the error say the most
+        frames = frames[-MAX_FRAMES:]
+        for frame in frames:
+            frame["code"] = self._source_line(repo_path, frame["file"], frame["line"])
+        return frames
+
+    def _repo_relative(self, path: str, repo_path: str) -> Optional[str]:
+        repo = os.path.realpath(repo_path)
+        full = os.path.realpath(path if os.path.isabs(path) else os.path.join(repo, path))
+        if not full.startswith(repo + os.sep) or not os.path.isfile(full):
+            return None
+        relative = os.path.relpath(full, repo)
+        if EXTERNAL_DIRS & set(relative.split(os.sep)):
+            return None
+        return relative
+
+    def _source_line(self, repo_path: str, path: str, line: int) -> str:
+        try:
+            with open(Path(repo_path) / path, errors="ignore") as f:
+                for number, text in enumerate(f, 1):
+                    if number == line:
+                        return text.strip()[:200]
+        except OSError:
+            pass
+        return ""
@@ -0,0 +1,263 @@
+"""Test impact analysis: map changed files to the test modules that depend on them."""
+
+import ast
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+SKIP_DIRS = {'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist', 'target', 'site-packages'}
+JS_EXTENSIONS = {'.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx'}
+# Changes to these never affect test outcomes
+INERT_EXTENSIONS = {'.md', '.rst', '.txt', '.png', '.jpg', '.jpeg', '.gif', '.svg'}
+
+
+class TestImpactSelector:
+    """Selects the tests affected by a set of changed files.
+
+    Python repos use the import graph (reverse dependencies of the changed
+    modules), jest repos use test naming conventions. A coverage map cached per
+    commit, when available, adds tests that exercised the changed files.
+    ``select`` returns ``None`` whenever the full suite should run instead.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        from config.settings import settings
+
+        self.coverage_dir = Path(cache_path or settings.cache_path) / "coverage"
+        # repo_path -> {relative file: (mtime, imported module names)}
+        self._import_cache: Dict[str, Dict[str, Any]] = {}
+
+    def select(self, repo_path: str, changed_files: List[str], runner_name: Optional[str],
+               commit_sha: Optional[str] = None) -> Optional[List[str]]:
+        """Return test targets affected by ``changed_files`` or ``None`` for the full suite"""
+        changed = [f for f in dict.fromkeys(changed_files) if Path(f).suffix.lower() not in INERT_EXTENSIONS]
+        if not changed:
+            return []
+
+        if runner_name == "pytest":
+            selected = self._select_python(repo_path, changed)
+        elif runner_name == "jest":
+            selected = self._select_js(repo_path, changed)
+        else:
+            # Other runners (e.g. a bare `npm test`) can't be given targets
+            return None
+
+        if selected is None:
+            return None
+
+        coverage_map = self.load_coverage_map(commit_sha) if commit_sha else None
+        if coverage_map:
+            for path in changed:
+                selected.update(coverage_map.get(path, []))
+
+        existing = sorted(t for t in selected if (Path(repo_path) / t).exists())
+        logger.info(f"Test impact: {len(changed)} changed files -> {len(existing)} affected test files")
+        return existing
+
+    # Python import graph
+
+    def _select_python(self, repo_path: str, changed: List[str]) -> Optional[Set[str]]:
+        if any(Path(f).name == "conftest.py" for f in changed):
+            return None
+        if any(Path(f).suffix != ".py" for f in changed):
+            # Data/config changes can affect anything; run everything
+            return None
+
+        imports = self._python_imports(repo_path)
+        modules = self._module_index(imports.keys())
+
+        dependents: Dict[str, Set[str]] = {}
+        for file, (_, imported) in imports.items():
+            for name in imported:
+                target = self._resolve_module(name, modules)
+                if target and target != file:
+                    dependents.setdefault(target, set()).add(file)
+
+        affected: Set[str] = set()
+        queue = deque(changed)
+        while queue:
+            file = queue.popleft()
+            if file in affected:
+                continue
+            affected.add(file)
+            queue.extend(dependents.get(file, ()))
+
+        selected = {f for f in affected if self._is_python_test(f)}
+        # Naming convention catches tests that import via fixtures or plugins
+        stems = {Path(f).stem for f in changed}
+        selected.update(f for f in imports if self._is_python_test(f) and self._test_subject(f) in stems)
+        return selected
+
+    def _python_imports(self, repo_path: str) -> Dict[str, Any]:
+        """Parse imports for every Python file, reusing results for unchanged files"""
+        cache = self._import_cache.setdefault(repo_path, {})
+        seen = set()
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+            for name in files:
+                if not name.endswith(".py"):
+                    continue
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, repo_path)
+                seen.add(rel_path)
+                mtime = os.path.getmtime(full_path)
+                if rel_path in cache and cache[rel_path][0] == mtime:
+                    continue
+                cache[rel_path] = (mtime, self._parse_imports(full_path, rel_path))
+        for stale in set(cache) - seen:
+            del cache[stale]
+        return cache
+
+    def _parse_imports(self, full_path: str, rel_path: str) -> Set[str]:
+        try:
+            with open(full_path, "rb") as f:
+                tree = ast.parse(f.read(), filename=rel_path)
+        except (SyntaxError, ValueError) as e:
+            logger.debug(f"Could not parse {rel_path}: {e}")
+            return set()
+
+        package = Path(rel_path).with_suffix("").parts[:-1]
+        names: Set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = list(package[:len(package) - node.level + 1])
+                    module = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    module = node.module or ""
+                if module:
+                    names.add(module)
+                # "from pkg import mod" may import a submodule
+                names.update(f"{module}.{alias.name}" if module else alias.name for alias in node.names)
+        return names
+
+    def _module_index(self, files) -> Dict[str, str]:
+        """Map dotted module names (with and without a src/ prefix) to files"""
+        modules = {}
+        for file in files:
+            parts = list(Path(file).with_suffix("").parts)
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if not parts:
+                continue
+            modules[".".join(parts)] = file
+            if parts[0] in ("src", "lib") and len(parts) > 1:
+                modules.setdefault(".".join(parts[1:]), file)
+        return modules
+
+    def _resolve_module(self, name: str, modules: Dict[str, str]) -> Optional[str]:
+        parts = name.split(".")
+        while parts:
+            file = modules.get(".".join(parts))
+            if file:
+                return file
+            parts.pop()
+        return None
+
+    def _is_python_test(self, file: str) -> bool:
+        name = Path(file).name
+        return name.startswith("test_") or name.endswith("_test.py")
+
+    def _test_subject(self, file: str) -> str:
+        stem = Path(file).stem
+        return stem[len("test_"):] if stem.startswith("test_") else stem[:-len("_test")]
+
+    # JS/TS naming conventions
+
+    def _select_js(self, repo_path: str, changed: List[str]) -> Optional[Set[str]]:
+        if any(Path(f).suffix.lower() not in JS_EXTENSIONS for f in changed):
+            return None
+
+        test_files = self._js_test_files(repo_path)
+        selected: Set[str] = set()
+        for file in changed:
+            if file in test_files:
+                selected.add(file)
+                continue
+            stem = Path(file).stem
+            for test_file in test_files:
+                if self._js_test_subject(test_file) == stem:
+                    selected.add(test_file)
+        return selected
+
+    def _js_test_files(self, repo_path: str) -> Set[str]:
+        tests = set()
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+            in_tests_dir = os.path.basename(root) == "__tests__"
+            for name in files:
+                if Path(name).suffix.lower() not in JS_EXTENSIONS:
+                    continue
+                if in_tests_dir or ".test." in name or ".spec." in name:
+                    tests.add(os.path.relpath(os.path.join(root, name), repo_path))
+        return tests
+
+    def _js_test_subject(self, test_file: str) -> str:
+        name = Path(test_file).name
+        for marker in (".test.", ".spec."):
+            if marker in name:
+                return name.split(marker)[0]
+        return Path(name).stem
+
+    # Coverage map cached per commit
+
+    def load_coverage_map(self, commit_sha: str) -> Optional[Dict[str, List[str]]]:
+        path = self.coverage_dir / f"{commit_sha}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load coverage map {path}: {e}")
+            return None
+
+    def build_coverage_map(self, sandbox, commit_sha: str) -> Optional[Dict[str, List[str]]]:
+        """Record which test files execute each source file (pytest-cov with test contexts)"""
+        existing = self.load_coverage_map(commit_sha)
+        if existing is not None:
+            return existing
+
+        report = Path(sandbox.sandbox_path) / "test-results" / "coverage.json"
+        report.parent.mkdir(parents=True, exist_ok=True)
+        # Keep the .coverage data file out of the repo, or it would be committed with the PR
+        data_file = report.parent / ".coverage"
+        commands = [
+            f"COVERAGE_FILE='{data_file}' python -m pytest -q -p no:cacheprovider --cov=. --cov-context=test",
+            f"COVERAGE_FILE='{data_file}' python -m coverage json --show-contexts -o '{report}'",
+        ]
+        for command in commands:
+            result = sandbox.run_command(command, timeout=1800)
+            if result.returncode not in (0, 1):
+                logger.info(f"Coverage map unavailable ({command} exited {result.returncode})")
+                return None
+
+        try:
+            with open(report) as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read coverage report: {e}")
+            return None
+
+        coverage_map: Dict[str, List[str]] = {}
+        for source, details in data.get("files", {}).items():
+            tests = set()
+            for contexts in details.get("contexts", {}).values():
+                for context in contexts:
+                    # Contexts look like "tests/test_api.py::test_get|run"
+                    if "::" in context:
+                        tests.add(context.split("::")[0])
+            if tests:
+                coverage_map[source] = sorted(tests)
+
+        self.coverage_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.coverage_dir / f"{commit_sha}.json", "w") as f:
+            json.dump(coverage_map, f)
+        return coverage_map
@@ -26,7 +26,7 @@ async def send_review_results(say, result):
             "text": {
                 "type": "mrkdwn",
                 "text": f"## 🔍 PR Review Complete\n\n"
-                       f"**Quality Score**: {result.code_quality_score}/10\n"
+                       f"**Quality Score**: {result.code_quality_score if result.code_quality_score is not None else 'n/a'}/10\n"
                        f"**Bugs Found**: {len(result.bugs_found)}\n"
                        f"**CI Status**: {result.ci_status}"
             }
@@ -50,6 +50,16 @@ async def send_review_results(say, result):
             }
         })
         
+    if result.resolved_findings:
+        resolved_text = "\n".join(f"• {finding}" for finding in result.resolved_findings[:5])
+        blocks.append({
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"**Resolved since {result.reviewed_since[:7]}**:\n{resolved_text}"
+            }
+        })
+
     if result.recommendations:
         rec_text = "\n".join(f"• {rec}" for rec in result.recommendations[:5])
         blocks.append({
@@ -62,6 +72,38 @@ async def send_review_results(say, result):
         
     await say(blocks=blocks)
 
+def format_bulk_review_result(result, done, total):
+    """One-line progress update for a PR reviewed in bulk"""
+    if result["status"] != "reviewed":
+        return f"❌ [{done}/{total}] <{result['url']}|#{result['number']}> {result['title']}: {result['error']}"
+    score = "n/a" if result["score"] is None else f"{result['score']}/10"
+    return (f"✅ [{done}/{total}] <{result['url']}|#{result['number']}> {result['title']} "
+            f"— score {score}, {result['bugs']} bugs, CI {result['ci']} ({result['seconds']}s)")
+
+async def send_bulk_review_results(say, result, table, thread_ts):
+    """Send the bulk review summary table to the Slack thread"""
+    blocks = [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"## 📚 Bulk Review Complete: {result.repo}\n\n"
+                       f"**Reviewed**: {result.reviewed} | **Failed**: {result.failed}\n"
+                       f"**Wall time**: {result.wall_seconds}s | **Throughput**: {result.prs_per_hour} PRs/hour"
+            }
+        }
+    ]
+    if result.results:
+        blocks.append({
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"```{table[:2900]}```"
+            }
+        })
+
+    await say(blocks=blocks, text=f"Bulk review of {result.repo} complete", thread_ts=thread_ts)
+
 async def send_creation_results(say, result):
     """Send PR creation results to Slack"""
     status_emoji = "✅" if result.pr_url else "❌"
@@ -91,9 +133,14 @@ async def send_creation_results(say, result):
         })
         
     # Add test results
-    test_status = "✅ Passed" if any(
-        r.get("status") == "passed" for r in result.test_results.values()
+    test_status = "✅ Passed" if result.test_results and all(
+        r.get("status") in ("passed", "skipped") for r in result.test_results.values()
     ) else "❌ Failed"
+    summaries = [r["summary"] for r in result.test_results.values() if r.get("summary")]
+    if summaries:
+        summary = summaries[0]
+        test_status += (f" ({summary['tests']} tests, {summary['failures'] + summary['errors']} failing, "
+                        f"{summary['shards']} shards, {summary['duration']}s)")
     
     blocks.append({
         "type": "section",